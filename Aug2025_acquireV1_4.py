@@ -4,16 +4,18 @@ import os
 import json
 from PyQt6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QPushButton, QGridLayout, QHBoxLayout, QLabel,QFileDialog,
                             QFrame, QSizePolicy, QLineEdit, QComboBox, QToolBar, QDialog, QFormLayout, QDoubleSpinBox,
-                            QListWidget, QListWidgetItem, QMessageBox, QInputDialog, QSpinBox, QTextEdit)
+                            QListWidget, QListWidgetItem, QMessageBox, QInputDialog, QSpinBox, QTextEdit, QCheckBox)
 from PyQt6.QtGui import QPainter, QColor, QPen, QFont, QPixmap, QAction, QRegion
 from PyQt6.QtCore import Qt, QRect, QPoint, QTimer, QThread, pyqtSignal
 from FreeMoveDESI_5 import *
 import subprocess
-import csv
 #os.chdir(libpath)
 import WatersIMGReader as wat 
 from ctypes import *
-import numpy as np
+from conversion_pipeline import RunConverter, DEFAULT_PROCESSING_SETTINGS, run_paths, load_run_info
+from csv_export import write_spectrum_csv
+from stage_timer import format_timings
+from live_watch import LiveRunWatcher, write_well_progress
 reader = cdll.LoadLibrary("C:/Users/Emrys/watersimgreader.dll") # This will need to change 
 mainPath='C:/HDI/lib/'
 from time import sleep
@@ -487,6 +489,12 @@ class ProcessingProgressDialog(QDialog):
         self.details_text.setStyleSheet("font-family: Consolas, monospace; font-size: 10px;")
         layout.addWidget(self.details_text)
         
+        # Time spent in each processing stage so far
+        self.timing_label = QLabel("")
+        self.timing_label.setWordWrap(True)
+        self.timing_label.setStyleSheet("font-family: Consolas, monospace; font-size: 10px;")
+        layout.addWidget(self.timing_label)
+        
         # Cancel/Close button
         self.cancel_btn = QPushButton("Cancel")
         self.cancel_btn.clicked.connect(self.reject)
@@ -499,6 +507,10 @@ class ProcessingProgressDialog(QDialog):
         """Update the main status message"""
         self.status_label.setText(message)
         
+    def update_timings(self, timings, n_wells):
+        """Show the stage timings reported by the processing thread"""
+        self.timing_label.setText(format_timings(timings, n_wells))
+    
     def add_detail(self, detail):
         """Add a detail line to the progress log"""
         self.details_text.append(detail)
@@ -519,9 +531,10 @@ class ProcessingThread(QThread):
     # Signals for communication with main thread
     status_update = pyqtSignal(str)
     detail_update = pyqtSignal(str)
+    timing_update = pyqtSignal(dict, int)  # stage timings, wells converted
     finished_signal = pyqtSignal(bool, str)  # success, message
     
-    def __init__(self, parent, folder_name, fulldata, WellList, fulloutdata, fulloutCSVdata):
+    def __init__(self, parent, folder_name, fulldata, WellList, fulloutdata, fulloutCSVdata, force=False):
         super().__init__()
         self.parent = parent
         self.folder_name = folder_name
@@ -529,115 +542,28 @@ class ProcessingThread(QThread):
         self.WellList = WellList
         self.fulloutdata = fulloutdata
         self.fulloutCSVdata = fulloutCSVdata
+        self.force = force  # Reprocess wells even if their outputs are up to date
         self.cancelled = False
+        self.converter = None
     
     def run(self):
         """Main processing function running in separate thread"""
         try:
-            self.status_update.emit("Loading data file...")
-            self.detail_update.emit(f"Processing raw data file: {self.folder_name}")
-            
-            # Initialize reader
-            import WatersIMGReader as wat
-            reader = wat.WatersIMGReader(self.fulldata, 1)
-            
-            # Get basic information
-            scans = reader.getTotalScans()
-            self.detail_update.emit(f"Data contains: {scans} scans")
-            
-            massRange = reader.getMassRange()
-            self.detail_update.emit(f"Mass range: {massRange[0]} to {massRange[1]}")
-            
-            # Get coordinates
-            self.status_update.emit("Analyzing well positions...")
-            X, Y, points = reader.getXYCoordinates()
-            Ynp = np.array(Y)
-            ScanR = np.arange(scans) + 1
-            Number_of_wells = len(np.unique(Ynp))
-            
-            self.detail_update.emit(f"Number of unique Y positions: {Number_of_wells}")
-            
-            # Handle array length mismatch
-            len1, len2 = len(ScanR), len(Ynp)
-            if len2 < len1:
-                padding = np.full(len1-len2, Ynp[-1])
-                Ynp2 = np.concatenate([Ynp, padding])
-            else:
-                Ynp2 = Ynp
-            
-            # Initialize processing summary
-            processing_summary = {
-                'processed_wells': [],
-                'processing_timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
-                'total_scans': scans,
-                'mass_range': massRange
-            }
-            
-            # Check for run info
             global run_info_data
-            if 'run_info_data' in globals() and run_info_data:
-                processing_summary['original_run_info'] = run_info_data
-                self.detail_update.emit(f"Processing data from {run_info_data['plate_type']} plate")
+            self.converter = RunConverter(
+                self.fulldata, self.WellList, self.fulloutdata, self.fulloutCSVdata,
+                settings=self.parent.processing_settings,
+                run_info=run_info_data if 'run_info_data' in globals() else None,
+                force=self.force,
+                log=self.detail_update.emit,
+                status=self.status_update.emit,
+                timing=self.timing_update.emit
+            )
+            if self.cancelled or not self.converter.run():
+                self.finished_signal.emit(False, "Processing cancelled by user")
+                return
             
-            # Process each well
-            for x in range(Number_of_wells):
-                if self.cancelled:
-                    self.finished_signal.emit(False, "Processing cancelled by user")
-                    return
-                
-                # Update progress
-                self.status_update.emit(f"Processing well {x+1} of {Number_of_wells}...")
-                
-                if x < len(self.WellList):
-                    Rwell = self.WellList[x+2]
-                    self.detail_update.emit(f"Processing well {Rwell} ({x+1}/{Number_of_wells})")
-                    
-                    # Get data for this well
-                    Data = np.column_stack((ScanR, Ynp2))
-                    Output = Data[np.where(Data[:,1]==x), 0]
-                    
-                    if len(Output[0]) > 0:
-                        start = int(Output[0,0])
-                        end = int(Output[0,-1])
-                        
-                        self.detail_update.emit(f"  Creating series file for scans {start} to {end}")
-                        self.parent.create_series_file(start, end)
-                        
-                        self.detail_update.emit("  Running maldichrom process")
-                        self.parent.create96_well_process(Rwell)
-                        time.sleep(1)  # Small delay between processes
-                        
-                        self.detail_update.emit("  Converting to CSV format")
-                        raw_out = f'{self.fulloutdata}_{Rwell}.raw'
-                        csv_out = f'{self.fulloutCSVdata}_{Rwell}.csv'
-                        self.parent.raw_to_csv(raw_out, csv_out)
-                        self.detail_update.emit(f"  Well {Rwell} processing complete")
-                        
-                        # Add to processing summary
-                        processing_summary['processed_wells'].append({
-                            'well_id': Rwell,
-                            'scan_range': {'start': start, 'end': end},
-                            'output_files': {
-                                'raw': f'{self.fulloutdata}_{Rwell}.raw',
-                                'csv': f'{self.fulloutCSVdata}_{Rwell}.csv'
-                            }
-                        })
-                    else:
-                        self.detail_update.emit(f"  No data found for well {Rwell}")
-                else:
-                    self.detail_update.emit(f"Warning: More Y positions than well IDs. Skipping position {x}")
-            
-            if not self.cancelled:
-                # Save processing summary
-                self.status_update.emit("Saving processing summary...")
-                outdata = self.folder_name[0:-4]
-                outdir = os.path.dirname(self.fulloutdata)
-                summary_file = os.path.join(outdir, f'{outdata}_processing_summary.json')
-                with open(summary_file, 'w') as f:
-                    json.dump(processing_summary, f, indent=2)
-                self.detail_update.emit(f"Processing summary saved to: {summary_file}")
-                
-                self.finished_signal.emit(True, "Processing completed successfully!")
+            self.finished_signal.emit(True, "Processing completed successfully!")
         
         except Exception as e:
             self.finished_signal.emit(False, f"Error during processing: {str(e)}")
@@ -645,9 +571,33 @@ class ProcessingThread(QThread):
     def cancel(self):
         """Cancel the processing"""
         self.cancelled = True
+        if self.converter is not None:
+            self.converter.cancel()
 
 
-
+class LiveConversionThread(QThread):
+    """Converts wells from the growing .raw file while the plate is still being acquired"""
+    
+    detail_update = pyqtSignal(str)
+    finished_signal = pyqtSignal(bool, str)  # success, message
+    
+    def __init__(self, raw_path, WellList, settings, run_info=None):
+        super().__init__()
+        self.watcher = LiveRunWatcher(raw_path, WellList, settings=settings, run_info=run_info,
+                                      log=self.detail_update.emit)
+    
+    def run(self):
+        try:
+            summary_file = self.watcher.run()
+            if summary_file:
+                self.finished_signal.emit(True, f"Live conversion complete: {summary_file}")
+            else:
+                self.finished_signal.emit(False, "Live conversion stopped")
+        except Exception as e:
+            self.finished_signal.emit(False, f"Error during live conversion: {str(e)}")
+    
+    def cancel(self):
+        self.watcher.cancel()
 
 
 class WellPlateApp(QWidget):
@@ -666,6 +616,9 @@ class WellPlateApp(QWidget):
         self.custom_plate_config = None
         self.custom_wells = []
 
+        # Data processing configuration
+        self.processing_settings = dict(DEFAULT_PROCESSING_SETTINGS)
+
         # Load settings on startup
         self.load_settings()
 
@@ -742,6 +695,9 @@ class WellPlateApp(QWidget):
         self.start_times = {}
         self.end_times = {}
         self.run_start_time = 0
+        self.completed_well_log = []  # Finished wells, written to well_progress.json for live conversion
+        self.live_thread = None
+        self.live_converting = False  # Live conversion was on when the current run started
 
         self.movement_time = 0.1  # Average time in seconds for stage movement
         self.dwell_time = 0.5    # Time spent at each point
@@ -758,6 +714,8 @@ class WellPlateApp(QWidget):
                         self.offsets.update(settings['offsets'])
                     if 'custom_plate_config' in settings:
                         self.custom_plate_config = settings['custom_plate_config']
+                    if 'processing_settings' in settings:
+                        self.processing_settings.update(settings['processing_settings'])
         except Exception as e:
             print(f"Error loading settings: {e}")
 
@@ -766,7 +724,8 @@ class WellPlateApp(QWidget):
         try:
             settings = {
                 'offsets': self.offsets,
-                'custom_plate_config': self.custom_plate_config
+                'custom_plate_config': self.custom_plate_config,
+                'processing_settings': self.processing_settings
             }
             with open('app_settings.json', 'w') as f:
                 json.dump(settings, f, indent=2)
@@ -972,15 +931,21 @@ class WellPlateApp(QWidget):
         self.stop_btn = QPushButton('Stop')
         self.stop_btn.clicked.connect(self.stopRunProcess)
         self.stop_btn.setEnabled(False)
+        self.live_convert_checkbox = QCheckBox("Live convert")
+        self.live_convert_checkbox.setToolTip("Convert each well while the plate is still being acquired")
 
         select_folder_button = QPushButton("Process Data")
         select_folder_button.clicked.connect(self.select_folder_with_progress)
+        self.force_reprocess_checkbox = QCheckBox("Reprocess all")
+        self.force_reprocess_checkbox.setToolTip("Reprocess every well, even ones already converted")
         
         button_layout.addWidget(select_all_btn)
         button_layout.addWidget(deselect_all_btn)
         button_layout.addWidget(self.run_btn)
         button_layout.addWidget(self.stop_btn)
+        button_layout.addWidget(self.live_convert_checkbox)
         button_layout.addWidget(select_folder_button)
+        button_layout.addWidget(self.force_reprocess_checkbox)
         
         left_panel.addLayout(button_layout)
 
@@ -1089,73 +1054,30 @@ class WellPlateApp(QWidget):
         
         global fulldata, fulloutdata, fulloutCSVdata, WellList, run_info_data
         
-        # Setup output paths
-        outdata = folder_name[0:-4]
-        outdir = os.path.join(folder_path, 'outputs')
-        csvoutdir = os.path.join(folder_path, 'CSVoutputs')
-        fulldata = os.path.join(folder_path)
-        fulloutdata = os.path.join(outdir, outdata)
-        fulloutCSVdata = os.path.join(csvoutdir, outdata)
-    
-        # Create output directories
-        os.makedirs(outdir, exist_ok=True)
-        os.makedirs(csvoutdir, exist_ok=True)
-        
-        # Try to load the new JSON format first, fall back to legacy format
-        run_info_file = os.path.join(fulldata, 'run_info.json')
-        legacy_wells_file = os.path.join(fulldata, 'selected_wells.txt')
-        
-        run_info_data = None
+        # Setup output paths and create output directories
+        fulldata, fulloutdata, fulloutCSVdata = run_paths(folder_path)
         
-        if os.path.exists(run_info_file):
-            try:
-                with open(run_info_file, 'r') as f:
-                    run_info_data = json.load(f)
-                WellList = ['Selected', 'Wells:'] + run_info_data['selected_wells']  # Maintain legacy format
-                print(f"Loaded run info: {run_info_data['plate_type']} plate with {run_info_data['total_wells']} wells")
-                
-                # Save plate configuration to output directory for the processing app
-                config_output_file = os.path.join(outdir, f'{outdata}_plate_config.json')
-                with open(config_output_file, 'w') as f:
-                    json.dump(run_info_data, f, indent=2)
-                print(f"Plate configuration saved to: {config_output_file}")
-                    
-            except Exception as e:
-                print(f"Error loading run_info.json: {e}, falling back to legacy format")
-                run_info_data = None
-        
-        if run_info_data is None and os.path.exists(legacy_wells_file):
-            WellList = open(legacy_wells_file).read().split()
-            print("Using legacy selected_wells.txt format")
-        elif run_info_data is None:
-            raise FileNotFoundError("Neither run_info.json nor selected_wells.txt found in data directory")
-
-    def create_series_file(self,start, end, filename="C:/HDI/lib/outputScans.txt"):
-        """Create a file containing scan series information"""
-        with open(filename, "w") as file:
-            for i in range(start, end + 1):
-                file.write(f"1\t{i}\n")
-
-    def create96_well_process(self,Rwell):
-        prog = 'C:/HDI/lib/maldichrom.exe'
-        raw_in = fulldata
-        raw_out = f'{fulloutdata}_{Rwell}.raw'
-        scans = 'C:/HDI/lib/outputScans.txt'
-        command = f'{prog} -d "{raw_in}" -p "{scans}" -w "{raw_out}"'
-        subprocess.Popen(command,cwd=mainPath,shell=True)
+        # run_info.json first, falling back to the legacy selected_wells.txt
+        WellList, run_info_data = load_run_info(fulldata, fulloutdata)
 
     def raw_to_csv(self,input_raw, output_csv):
         """Convert raw data to CSV format"""
         try:
             reader = wat.WatersIMGReader(input_raw, 1)
             masses, intens, npoints = reader.getCombinedScans(1, 1, 0, 0)
-            with open(output_csv, 'w', newline='') as csvfile:
-                writer = csv.writer(csvfile)
-                for i in range(len(masses)):
-                    writer.writerow([masses[i], intens[i]])
+            self.spectrum_to_csv(masses, intens, output_csv)
         except Exception as e:
             print(f"Error converting raw to CSV: {str(e)}")
 
+    def spectrum_to_csv(self, masses, intens, output_csv):
+        """Write a mass/intensity spectrum as a two-column CSV, returning the path written"""
+        return write_spectrum_csv(
+            output_csv, masses, intens,
+            precision=self.processing_settings.get('csv_precision'),
+            drop_zeros=self.processing_settings.get('csv_drop_zeros', False),
+            compress=self.processing_settings.get('csv_gzip', False)
+        )
+
     def update_method_file_settings(self, method_file_path, time_per_well):
         """
         Updates the method file settings based on scan time and well timing calculations.
@@ -1228,97 +1150,13 @@ class WellPlateApp(QWidget):
         try:
             print(f"Processing raw data file: {folder_name}")
             
-            # Initialize reader
-            import WatersIMGReader as wat
-            reader = wat.WatersIMGReader(fulldata, 1)
-            
-            # Get basic information about the data
-            scans = reader.getTotalScans()
-            print(f"Data contains: {scans} scans")
-            
-            massRange = reader.getMassRange()
-            print(f"Mass range: {massRange[0]} to {massRange[1]}")
-            
-            # Get X,Y coordinates
-            X, Y, points = reader.getXYCoordinates()
-            Ynp = np.array(Y)
-            ScanR = np.arange(scans) + 1
-            Number_of_wells = len(np.unique(Ynp))
-            
-            print(f"Number of unique Y positions: {Number_of_wells}")
-            
-            # Handle array length mismatch
-            len1, len2 = len(ScanR), len(Ynp)
-            if len2 < len1:
-                padding = np.full(len1-len2, Ynp[-1])
-                Ynp2 = np.concatenate([Ynp, padding])
-            else:
-                Ynp2 = Ynp
-            
-            # Check if we have run_info_data with custom plate information
             global run_info_data
-            processing_summary = {
-                'processed_wells': [],
-                'processing_timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
-                'total_scans': scans,
-                'mass_range': massRange
-            }
-            
-            if 'run_info_data' in globals() and run_info_data:
-                processing_summary['original_run_info'] = run_info_data
-                print(f"Processing data from {run_info_data['plate_type']} plate")
-            
-            # Process each well
-            for x in range(Number_of_wells):
-                if x < len(WellList):
-                    Rwell = WellList[x+2]
-                    print(f"Processing well {Rwell} ({x+1}/{Number_of_wells})")
-                    
-                    # Get data for this well
-                    Data = np.column_stack((ScanR, Ynp2))
-                    Output = Data[np.where(Data[:,1]==x), 0]
-                    
-                    if len(Output[0]) > 0:
-                        start = int(Output[0,0])
-                        end = int(Output[0,-1])
-                        
-                        print(f"  Creating series file for scans {start} to {end}")
-                        self.create_series_file(start, end)
-                        
-                        print("  Running maldichrom process")
-                        prog_path = 'C:/HDI/lib/maldichrom.exe'
-                        scans_path = 'C:/HDI/lib/outputScans.txt'
-                        raw_out = f'{fulloutdata}_{Rwell}.raw'
-                        self.create96_well_process(Rwell)
-                        sleep(1)  # Small delay between processes
-                        
-                        print("  Converting to CSV format")
-                        csv_out = f'{fulloutCSVdata}_{Rwell}.csv'
-                        self.raw_to_csv(raw_out, csv_out)
-                        print(raw_out)
-                        print(f"  Well {Rwell} processing complete")
-                        
-                        # Add to processing summary
-                        processing_summary['processed_wells'].append({
-                            'well_id': Rwell,
-                            'scan_range': {'start': start, 'end': end},
-                            'output_files': {
-                                'raw': f'{fulloutdata}_{Rwell}.raw',
-                                'csv': f'{fulloutCSVdata}_{Rwell}.csv'
-                            }
-                        })
-                    else:
-                        print(f"  No data found for well {Rwell}")
-                else:
-                    print(f"Warning: More Y positions than well IDs. Skipping position {x}")
-            
-            # Save processing summary
-            outdata = folder_name[0:-4]
-            outdir = os.path.dirname(fulloutdata)
-            summary_file = os.path.join(outdir, f'{outdata}_processing_summary.json')
-            with open(summary_file, 'w') as f:
-                json.dump(processing_summary, f, indent=2)
-            print(f"Processing summary saved to: {summary_file}")
+            converter = RunConverter(
+                fulldata, WellList, fulloutdata, fulloutCSVdata,
+                settings=self.processing_settings,
+                run_info=run_info_data if 'run_info_data' in globals() else None
+            )
+            converter.run()
             
             print("\nProcessing complete!")
         
@@ -1573,6 +1411,11 @@ class WellPlateApp(QWidget):
         with open(f'C:/MassLynx/AutoLynxQueue/{filename}.raw.txt', 'w') as file:    
             file.write(f'INDEX\tFILE_NAME\tFILE_TEXT\tMS_FILE\tMS_TUNE_FILE\tPROCESS\tPROCESS_PARAMS\n')
             file.write(f'1\t"{self.base_directory}{filename}.raw"\t"HT-DESI"\t"{self.method_file}"\t""\t""\t""\n')
+        
+        self.completed_well_log = []
+        self.live_converting = self.live_convert_checkbox.isChecked()
+        if self.live_converting:
+            self.start_live_conversion(filename)
             
         print('going to sleep')
         
@@ -1597,6 +1440,7 @@ class WellPlateApp(QWidget):
         self.run_btn.setEnabled(True)
         self.stop_btn.setEnabled(False)
         print("Process stopped.")
+        self.write_well_progress(finished=True)
         GoHome()
         sleep(2)
         self.StopMS()
@@ -1655,18 +1499,7 @@ class WellPlateApp(QWidget):
             wells_output = []
             for well in selected_wells:  # Use selected_wells instead of self.selected_wells
                 try:
-                    if self.plate_type == "custom":
-                        if self.custom_plate_config:
-                            spot_number = well.row * self.custom_plate_config['num_columns'] + well.col + 1
-                            well_id = f"Spot_{spot_number}"
-                        else:
-                            well_id = f"Spot_{well.row * 6 + well.col + 1}"  # Fallback
-                    elif hasattr(well, 'slide') and well.slide:
-                        row_offset = 4 if well.slide == 'B' else 0
-                        well_id = f"{chr(65 + well.row + row_offset)}{str(well.col + 1).zfill(2)}"
-                    else:
-                        well_id = f"{chr(65 + well.row)}{str(well.col + 1).zfill(2)}"
-                    wells_output.append(well_id)
+                    wells_output.append(self.get_well_id(well))
                 except Exception as e:
                     print(f"Error processing well: {e}")
                     wells_output.append(f"Unknown_{len(wells_output)}")
@@ -1720,6 +1553,8 @@ class WellPlateApp(QWidget):
             except Exception as e:
                 print(f"Error creating run information files: {e}")
             
+            # Written after run_info.json so the live converter picks up the final well list
+            self.write_well_progress(finished=True)
             return
             
         well = selected_wells[self.current_well_index]
@@ -1792,6 +1627,9 @@ class WellPlateApp(QWidget):
             well.completed = True
             well.update()
             self.end_times[f"{chr(65 + well.row)}{well.col + 1}"] = time.time() - self.run_start_time
+            self.completed_well_log.append({'well_id': self.get_well_id(well),
+                                            'end_time': self.end_times[f"{chr(65 + well.row)}{well.col + 1}"]})
+            self.write_well_progress()
             self.current_well_index += 1
             QTimer.singleShot(1000, self.processNextWell)  # 1 second delay before next well
             return
@@ -1803,6 +1641,49 @@ class WellPlateApp(QWidget):
         self.current_coord_index += 1
         QTimer.singleShot(100, self.processNextCoordinate)  # Small delay between coordinates
 
+    def get_well_id(self, well):
+        """Well ID as written to run_info.json, e.g. 'A01' or 'Spot_12'"""
+        if self.plate_type == "custom":
+            if self.custom_plate_config:
+                spot_number = well.row * self.custom_plate_config['num_columns'] + well.col + 1
+                return f"Spot_{spot_number}"
+            return f"Spot_{well.row * 6 + well.col + 1}"  # Fallback
+        elif hasattr(well, 'slide') and well.slide:
+            row_offset = 4 if well.slide == 'B' else 0
+            return f"{chr(65 + well.row + row_offset)}{str(well.col + 1).zfill(2)}"
+        return f"{chr(65 + well.row)}{str(well.col + 1).zfill(2)}"
+
+    def write_well_progress(self, finished=False):
+        """Log finished wells next to the data so the live converter knows what it can convert"""
+        if not self.live_converting:
+            return
+        filename = self.filename_input.text()
+        write_well_progress(f'{self.base_directory}{filename}.raw', self.completed_well_log, finished)
+
+    def start_live_conversion(self, filename):
+        """Convert wells from the growing .raw file while the rest of the plate is acquired"""
+        if self.live_thread is not None and self.live_thread.isRunning():
+            self.live_thread.cancel()
+            self.live_thread.wait()
+        
+        wells_output = [self.get_well_id(well) for well in self.selected_wells]
+        run_info = {
+            'plate_type': self.plate_type,
+            'selected_wells': wells_output,
+            'filename': filename,
+            'total_wells': len(wells_output)
+        }
+        self.live_thread = LiveConversionThread(
+            f'{self.base_directory}{filename}.raw',
+            ['Selected', 'Wells:'] + wells_output,
+            self.processing_settings,
+            run_info
+        )
+        self.live_thread.detail_update.connect(print)
+        self.live_thread.finished_signal.connect(lambda success, msg: print(msg))
+        self.live_thread.start()
+        print(f"Live conversion watching {self.base_directory}{filename}.raw")
+
     def resetWellColors(self):
         if self.plate_type == "96-well":
             for well in self.wells:
@@ -1823,6 +1704,9 @@ class WellPlateApp(QWidget):
     def closeEvent(self, event):
         """Save settings when the application is closed"""
         self.save_settings()
+        if self.live_thread is not None and self.live_thread.isRunning():
+            self.live_thread.cancel()
+            self.live_thread.wait()
         event.accept()
 
     def select_folder_with_progress(self):
@@ -1842,12 +1726,14 @@ class WellPlateApp(QWidget):
                 
                 # Create worker thread
                 self.processing_thread = ProcessingThread(
-                    self, folder_name, fulldata, WellList, fulloutdata, fulloutCSVdata
+                    self, folder_name, fulldata, WellList, fulloutdata, fulloutCSVdata,
+                    force=self.force_reprocess_checkbox.isChecked()
                 )
                 
                 # Connect signals
                 self.processing_thread.status_update.connect(progress_dialog.update_status)
                 self.processing_thread.detail_update.connect(progress_dialog.add_detail)
+                self.processing_thread.timing_update.connect(progress_dialog.update_timings)
                 self.processing_thread.finished_signal.connect(
                     lambda success, msg: self.on_processing_finished(progress_dialog, success, msg)
                 )
@@ -3,22 +3,37 @@ import os
 import pandas as pd
 import numpy as np
 import json
+import threading
+from collections import OrderedDict
 from typing import Dict, List, Optional, Tuple
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QFileDialog, QVBoxLayout, 
                            QHBoxLayout, QWidget, QPushButton, QSizePolicy, 
-                           QComboBox, QLabel, QGridLayout, QMessageBox)
-from PyQt6.QtCore import Qt, pyqtSignal, QSize
+                           QComboBox, QLabel, QMessageBox, QProgressDialog, QCheckBox,
+                           QDoubleSpinBox, QSpinBox)
+from PyQt6.QtCore import Qt, QThread, QTimer, pyqtSignal, QSize
 from PyQt6.QtGui import QColor
 from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas, NavigationToolbar2QT as NavigationToolbar
 from matplotlib.figure import Figure
 from matplotlib.widgets import SpanSelector
 import matplotlib.pyplot as plt
-from matplotlib.colors import Normalize, rgb2hex
 from matplotlib.path import Path
 from matplotlib.patches import PathPatch
 from matplotlib.cm import ScalarMappable
-from sklearn.decomposition import PCA
-from sklearn.preprocessing import StandardScaler
+from plate_cube import find_plate_cube, load_plate_cube, PLATE_CUBE_SUFFIX
+from spectrum_loader import CSV_EXTENSIONS, find_spectrum_files, load_spectra
+from viewer_cache import load_viewer_cache, save_viewer_cache
+from lazy_spectra import open_lazy_csv_folder, open_lazy_plate_cube
+from spectrum_engine import SpectrumEngine, ENGINE_BIN_WIDTH
+from normalization import NORMALIZATION_MODES, normalization_scale
+from pca_engine import randomized_pca, PCACancelled, DEFAULT_COMPONENTS
+from spectrum_lod import MinMaxPyramid, LODLine
+from well_barchart import WellBarChart, colormap_lut, lut_indices
+from plate_widget import PlateCanvas, STANDARD_STYLE, CUSTOM_STYLE
+from targeted_extraction import read_target_list, extract_targets, export_target_matrix
+from label_layer import PointLabels
+
+# Span drags are turned into at most one heatmap query per frame
+SPAN_UPDATE_MS = 16
 
 class PlateConfigReader:
     """
@@ -178,64 +193,6 @@ class PlateConfigReader:
         else:
             return self.plate_config.get('selected_wells', [])
 
-class RoundButton(QPushButton):
-    def __init__(self, text, parent=None):
-        super().__init__(text, parent)
-        self.setFixedSize(40, 40)
-        self.setStyleSheet("""
-            QPushButton {
-                border-radius: 20px;
-                border: 2px solid #444444;
-                font-weight: bold;
-                color: white;
-                background-color: #808080;
-            }
-        """)
-        
-    def set_inactive(self):
-        self.setStyleSheet("""
-            QPushButton {
-                border-radius: 20px;
-                border: 2px solid #444444;
-                font-weight: bold;
-                color: white;
-                background-color: #D3D3D3;
-            }
-        """)
-        self.setEnabled(False)
-
-class ScalableButton(QPushButton):
-    def __init__(self, text, size, font_size, parent=None):
-        super().__init__(text, parent)
-        self.setFixedSize(size, size)
-        self.setStyleSheet(f"""
-            QPushButton {{
-                border-radius: {size//2}px;
-                border: 2px solid #444444;
-                font-weight: bold;
-                color: black;
-                background-color: #C0C0C0;
-                font-size: {font_size}px;
-                font-family: Arial, sans-serif;
-            }}
-        """)
-        
-    def set_inactive(self):
-        size = self.size().width()
-        font_size = int(self.styleSheet().split('font-size: ')[1].split('px')[0])
-        self.setStyleSheet(f"""
-            QPushButton {{
-                border-radius: {size//2}px;
-                border: 1px solid #888888;
-                font-weight: bold;
-                color: #666666;
-                background-color: #E8E8E8;
-                font-size: {font_size}px;
-                font-family: Arial, sans-serif;
-            }}
-        """)
-        self.setEnabled(False)
-
 class WellPlate(QWidget):
     well_clicked = pyqtSignal(str)
 
@@ -259,6 +216,20 @@ class WellPlate(QWidget):
         self.layout.addLayout(layout_selector)
 
         self.info_label = QLabel()
+        # Create and set a font for the label
+        font = self.info_label.font()
+        font.setPointSize(12)  # Increase font size (default is usually around 8-9)
+        font.setBold(True)     # Make the text bold
+        self.info_label.setFont(font)
+        
+        # Optional: Add some padding and styling
+        self.info_label.setStyleSheet("""
+            QLabel {
+                padding: 5px;
+                background-color: #f0f0f0;
+                border-radius: 5px;
+            }
+        """)
         self.layout.addWidget(self.info_label)
 
         # Create horizontal layout for plates and barchart
@@ -283,10 +254,22 @@ class WellPlate(QWidget):
         # Add the colormap container to controls layout
         controls_layout.addWidget(colormap_container)
         
-        # Add sum normalize button
-        self.normalize_button = QPushButton("Sum Normalize")
-        self.normalize_button.clicked.connect(self.sum_normalize_data)
-        controls_layout.addWidget(self.normalize_button)
+        # Add normalization mode selection
+        self.normalize_combo = QComboBox()
+        for mode, label in NORMALIZATION_MODES.items():
+            self.normalize_combo.addItem(label, mode)
+        self.normalize_combo.currentIndexChanged.connect(self.apply_normalization)
+        controls_layout.addWidget(QLabel("Normalize:"))
+        controls_layout.addWidget(self.normalize_combo)
+        
+        # m/z of the internal standard, used by that mode only
+        self.standard_mz_spin = QDoubleSpinBox()
+        self.standard_mz_spin.setRange(0, 10000)
+        self.standard_mz_spin.setDecimals(4)
+        self.standard_mz_spin.setPrefix("IS m/z ")
+        self.standard_mz_spin.setEnabled(False)
+        self.standard_mz_spin.editingFinished.connect(self.apply_normalization)
+        controls_layout.addWidget(self.standard_mz_spin)
 
         # Add stretch to push everything to the left
         controls_layout.addStretch()
@@ -294,7 +277,7 @@ class WellPlate(QWidget):
         # Add controls layout to main layout
         self.layout.addLayout(controls_layout)
         
-        self.colormap = plt.get_cmap('viridis')
+        self.set_colormap('viridis')
 
         # Left side: Plates
         left_side = QWidget()
@@ -310,7 +293,7 @@ class WellPlate(QWidget):
 
         # Initialize with 96 well plate
         self.current_layout = "96"
-        self.buttons = {}
+        self.plates = []  # One PlateCanvas per plate or slide shown
         self.active_wells = set()
         self.plate_config_reader = None
         self.custom_well_positions = None
@@ -325,6 +308,7 @@ class WellPlate(QWidget):
         self.barchart_canvas = FigureCanvas(self.barchart_figure)
         self.barchart_canvas.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
         right_layout.addWidget(self.barchart_canvas)
+        self.barchart = WellBarChart(self.barchart_figure, self.barchart_canvas)
         
         plate_and_chart.addWidget(right_side)
         
@@ -332,62 +316,32 @@ class WellPlate(QWidget):
         plate_and_chart.setStretch(0, 1)  # Plate layout
         plate_and_chart.setStretch(1, 1)  # Barchart
 
-    def sum_normalize_data(self):
-        print("Starting normalization...")
-        
-        if not hasattr(self.analyzer, 'data') or not self.analyzer.data:
-            print("No data found in analyzer")
+    def apply_normalization(self):
+        """Scale every well by the selected mode's per-well divisor, applied at query time without copying data"""
+        mode = self.normalize_combo.currentData()
+        self.standard_mz_spin.setEnabled(mode == 'internal_standard')
+        if self.analyzer.engine is None:
+            return
+        if mode == 'internal_standard' and self.standard_mz_spin.value() <= 0:
+            # Wait for a standard m/z to be entered
             return
-        print(f"Found data with {len(self.analyzer.data)} wells")
-        
-        print(f"Current normalized state: {self.normalized}")
-        self.normalized = not self.normalized
-        print(f"New normalized state: {self.normalized}")
         
-        if self.normalized:
-            print("Setting button text to 'Raw Data'")
-            self.normalize_button.setText("Raw Data")
-            
-            # Store original data if not already stored
-            if not hasattr(self.analyzer, 'original_data'):
-                print("Creating backup of original data")
-                self.analyzer.original_data = {
-                    well: df.copy() for well, df in self.analyzer.data.items()
-                }
-                print(f"Backed up {len(self.analyzer.original_data)} wells")
-            
-            # Normalize each spectrum by its own sum
-            print("Starting normalization of spectra")
-            for well in self.analyzer.data.keys():
-                try:
-                    spectrum_sum = self.analyzer.data[well]['intensity'].sum()
-                    print(f"Well {well} sum: {spectrum_sum}")
-                    if spectrum_sum > 0:  # Avoid division by zero
-                        self.analyzer.data[well]['intensity'] = (
-                            self.analyzer.data[well]['intensity'] / spectrum_sum
-                        )
-                        # Verify normalization
-                        new_sum = self.analyzer.data[well]['intensity'].sum()
-                        print(f"Well {well} new sum: {new_sum}")  # Should be close to 1.0
-                except Exception as e:
-                    print(f"Error processing well {well}: {str(e)}")
-        else:
-            print("Setting button text to 'Sum Normalize'")
-            self.normalize_button.setText("Sum Normalize")
-            # Restore original data
-            if hasattr(self.analyzer, 'original_data'):
-                print("Restoring original data")
-                self.analyzer.data = {
-                    well: df.copy() for well, df in self.analyzer.original_data.items()
-                }
+        try:
+            scale = self.analyzer.normalization_scale(mode, self.standard_mz_spin.value())
+        except Exception as e:
+            print(f"Error computing {mode} normalization: {e}")
+            return
+        self.analyzer.engine.set_row_scale(scale)
+        self.normalized = scale is not None
+        common_mz, average_intensities = self.analyzer.engine.average_spectrum()
+        self.analyzer.average_spectrum = pd.Series(data=average_intensities, index=common_mz)
         
         # Update current view
-        print("Updating view...")
         if hasattr(self.analyzer, 'current_spectrum'):
             try:
                 if self.analyzer.current_spectrum == 'average':
                     self.analyzer.plot_average_spectrum()
-                else:
+                elif self.analyzer.current_spectrum is not None:
                     self.analyzer.update_well_spectrum(self.analyzer.current_spectrum)
             except Exception as e:
                 print(f"Error updating spectrum view: {str(e)}")
@@ -395,12 +349,9 @@ class WellPlate(QWidget):
         # Update heatmap if a range is selected
         if hasattr(self.analyzer, 'last_selected_range') and self.analyzer.last_selected_range:
             try:
-                print("Updating heatmap")
                 self.analyzer.update_heatmap(self.analyzer.last_selected_range)
             except Exception as e:
                 print(f"Error updating heatmap: {str(e)}")
-        
-        print("Normalization process complete")
 
     def load_custom_plate_config(self):
         """Load custom plate configuration from JSON file"""
@@ -410,7 +361,7 @@ class WellPlate(QWidget):
             csv_files = []
             
             # Check main folder first
-            main_csvs = [f for f in os.listdir(folder) if f.endswith(('.csv', '.CSV'))]
+            main_csvs = [f for f in os.listdir(folder) if f.endswith(CSV_EXTENSIONS)]
             if main_csvs:
                 csv_files = main_csvs
                 csv_folder = folder
@@ -419,7 +370,7 @@ class WellPlate(QWidget):
             # If no CSVs in main folder, check CSVOutputs subfolder
             csvoutputs_path = os.path.join(folder, 'CSVOutputs')
             if not csv_files and os.path.exists(csvoutputs_path):
-                csvoutputs_csvs = [f for f in os.listdir(csvoutputs_path) if f.endswith(('.csv', '.CSV'))]
+                csvoutputs_csvs = [f for f in os.listdir(csvoutputs_path) if f.endswith(CSV_EXTENSIONS)]
                 if csvoutputs_csvs:
                     csv_files = csvoutputs_csvs
                     csv_folder = csvoutputs_path
@@ -428,22 +379,35 @@ class WellPlate(QWidget):
             # Also check CSVoutputs (lowercase) subfolder
             csvoutputs_lower_path = os.path.join(folder, 'CSVoutputs')
             if not csv_files and os.path.exists(csvoutputs_lower_path):
-                csvoutputs_csvs = [f for f in os.listdir(csvoutputs_lower_path) if f.endswith(('.csv', '.CSV'))]
+                csvoutputs_csvs = [f for f in os.listdir(csvoutputs_lower_path) if f.endswith(CSV_EXTENSIONS)]
                 if csvoutputs_csvs:
                     csv_files = csvoutputs_csvs
                     csv_folder = csvoutputs_lower_path
                     print(f"Found {len(csv_files)} CSV files in CSVoutputs folder")
             
+            # A plate cube can stand in for the per-well CSVs
+            cube_file = None
             if not csv_files:
+                for cube_folder in (folder, csvoutputs_path, csvoutputs_lower_path):
+                    cube_file = find_plate_cube(cube_folder)
+                    if cube_file:
+                        csv_folder = cube_folder
+                        print(f"Found plate cube: {cube_file}")
+                        break
+            
+            if not csv_files and not cube_file:
                 QMessageBox.warning(self, "Warning", 
                                   "No CSV files found in selected folder or CSVOutputs subfolder")
                 return False
             
             # Extract experiment name from first CSV file (handle both naming conventions)
-            first_csv = csv_files[0]
+            first_csv = csv_files[0] if csv_files else None
             print(f"First CSV file: {first_csv}")
             
-            if '_Spot_' in first_csv:
+            if cube_file:
+                # Plate cube naming: "August17_003_plate_cube.npz" -> "August17_003"
+                experiment_name = os.path.basename(cube_file)[:-len(PLATE_CUBE_SUFFIX)]
+            elif '_Spot_' in first_csv:
                 # Custom plate naming: "August17_003_Spot_38.csv" -> "August17_003"
                 experiment_name = first_csv.split('_Spot_')[0]
             else:
@@ -488,88 +452,6 @@ class WellPlate(QWidget):
                 return False
         return False
 
-    def calculate_button_size_and_spacing(self, num_rows, num_columns, plate_width_mm, plate_height_mm):
-        """
-        Calculate optimal button size and spacing based on plate dimensions and number of wells
-        """
-        # Get much more space for the plate - this was too conservative before
-        available_width = 1000   # Much larger available width
-        available_height = 800   # Much larger available height
-        
-        # Minimal margin for title and info
-        margin = 60
-        usable_width = available_width - margin
-        usable_height = available_height - margin
-        
-        print(f"Available space: {usable_width} x {usable_height} for {num_rows}x{num_columns} grid")
-        
-        # Calculate spacing based on actual plate dimensions
-        if plate_width_mm and plate_height_mm:
-            # Use real plate proportions
-            aspect_ratio = plate_width_mm / plate_height_mm
-            print(f"Plate aspect ratio: {aspect_ratio:.2f} ({plate_width_mm}x{plate_height_mm}mm)")
-            
-            if usable_width / usable_height > aspect_ratio:
-                # Height is limiting factor
-                widget_height = usable_height
-                widget_width = int(widget_height * aspect_ratio)
-            else:
-                # Width is limiting factor
-                widget_width = usable_width
-                widget_height = int(widget_width / aspect_ratio)
-        else:
-            # Fallback to using full space
-            widget_width = usable_width
-            widget_height = usable_height
-        
-        print(f"Widget space allocated: {widget_width} x {widget_height}")
-        
-        # Calculate button size based on available space and number of wells
-        # Reserve minimal space for gaps between buttons
-        gap_factor = 0.05  # Only 5% of space for gaps (was 10%)
-        
-        cell_width = widget_width / num_columns
-        cell_height = widget_height / num_rows
-        
-        print(f"Cell size: {cell_width:.1f} x {cell_height:.1f}")
-        
-        # Button should be most of the cell size, leaving small gaps
-        button_size = int(min(cell_width, cell_height) * (1 - gap_factor))
-        
-        print(f"Calculated button size before limits: {button_size}")
-        
-        # Set reasonable minimum and maximum button sizes - much higher minimum
-        button_size = max(25, min(button_size, 100))  # Minimum 25px, max 100px
-        
-        # More aggressive font sizing - prioritize readability
-        if button_size >= 80:
-            font_size = 16
-        elif button_size >= 70:
-            font_size = 15
-        elif button_size >= 60:
-            font_size = 14
-        elif button_size >= 50:
-            font_size = 13
-        elif button_size >= 45:
-            font_size = 12
-        elif button_size >= 40:
-            font_size = 11
-        elif button_size >= 35:
-            font_size = 10
-        elif button_size >= 30:
-            font_size = 9
-        elif button_size >= 25:
-            font_size = 8
-        else:
-            font_size = 7  # Minimum readable size
-        
-        # Calculate minimal spacing (just enough to see separation)
-        spacing = max(2, int(button_size * 0.03))  # 3% of button size, minimum 2px
-        
-        print(f"Final: button_size={button_size}px, font_size={font_size}px, spacing={spacing}px")
-        
-        return button_size, font_size, spacing, spacing
-
     def setup_custom_plate(self, active_wells):
         """Setup custom plate layout based on well positions"""
         print(f"Setting up custom plate with {len(active_wells)} active wells")
@@ -591,14 +473,6 @@ class WellPlate(QWidget):
         print(f"Full plate grid size: {num_rows} rows x {num_columns} columns")
         print(f"Plate dimensions: {plate_width_mm} x {plate_height_mm} mm")
         
-        # Calculate optimal button size and spacing
-        button_size, font_size, spacing_x, spacing_y = self.calculate_button_size_and_spacing(
-            num_rows, num_columns, plate_width_mm, plate_height_mm
-        )
-        
-        print(f"Button size: {button_size}px, Font size: {font_size}px")
-        print(f"Spacing: {spacing_x}x{spacing_y}px")
-        
         # Add title first
         title_label = QLabel("Custom Plate Layout")
         font = title_label.font()
@@ -619,126 +493,56 @@ class WellPlate(QWidget):
         info_label.setFont(info_font)
         self.plates_layout.addWidget(info_label)
         
-        # Create a container widget for the plate with fixed size to control layout
-        plate_container = QWidget()
-        plate_container.setMinimumSize(600, 400)  # Ensure minimum size
-        plate_container.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
-        
-        # Create the plate layout with minimal spacing
-        plate_layout = QGridLayout(plate_container)
-        plate_layout.setSpacing(spacing_x)  # Minimal spacing
-        plate_layout.setContentsMargins(10, 10, 10, 10)  # Small margins
-        
-        self.plates_layout.addWidget(plate_container, 1)  # Give it stretch factor
-        
-        self.buttons = {}
-        
-        # Create mapping from (row, col) to actual spot numbers
-        spot_positions = {}
-        if hasattr(self, 'custom_well_positions') and self.custom_well_positions:
-            for pos in self.custom_well_positions:
-                spot_id = pos['id']
-                row = pos['row']
-                col = pos['col']
-                # Extract just the number from spot ID (e.g., "Spot_38" -> "38")
-                if 'Spot_' in spot_id:
-                    spot_number = spot_id.split('_')[1]
-                else:
-                    spot_number = spot_id
-                spot_positions[(row, col)] = (spot_id, spot_number)
-        
-        # Create all possible well positions
-        for row in range(num_rows):
-            for col in range(num_columns):
-                if (row, col) in spot_positions:
-                    # This position has actual data
-                    spot_id, spot_number = spot_positions[(row, col)]
-                    button = ScalableButton(spot_number, button_size, font_size)
-                    button.clicked.connect(lambda _, w=spot_id: self.on_well_clicked(w))
-                    self.buttons[spot_id] = button
-                    
-                    print(f"Created active well {spot_id} (#{spot_number}) at position ({row}, {col})")
-                    
-                    # Set as inactive if not in active wells (but keep the actual ID)
-                    if spot_id not in self.active_wells:
-                        button.set_inactive()
-                else:
-                    # Empty position - create a much more subtle placeholder
-                    placeholder = ScalableButton("", button_size, font_size)
-                    placeholder.setStyleSheet(f"""
-                        QPushButton {{
-                            border-radius: {button_size//2}px;
-                            border: 1px solid #F0F0F0;
-                            background-color: #FAFAFA;
-                            font-size: {font_size}px;
-                        }}
-                        QPushButton:hover {{
-                            background-color: #FAFAFA;
-                        }}
-                    """)
-                    placeholder.setEnabled(False)  # Make sure it's not clickable
-                    self.buttons[f"empty_{row}_{col}"] = placeholder
-                
-                plate_layout.addWidget(self.buttons[list(self.buttons.keys())[-1]], row, col)
+        # Wells at their grid positions, labelled with the spot number (e.g. "Spot_38" -> "38")
+        wells = []
+        for pos in self.custom_well_positions or []:
+            spot_id = pos['id']
+            spot_number = spot_id.split('_')[1] if 'Spot_' in spot_id else spot_id
+            wells.append((spot_id, pos['row'], pos['col'], spot_number))
         
-        active_count = len([k for k in self.buttons.keys() if not k.startswith('empty_')])
-        print(f"Custom plate setup complete. Total positions: {num_rows * num_columns}, Active wells: {active_count}")
+        # The whole grid is painted by one widget, empty positions as faint placeholders
+        plate = PlateCanvas(wells, num_rows, num_columns, style=CUSTOM_STYLE, show_empty=True, min_cell=1)
+        plate.setMinimumSize(600, 400)  # Ensure minimum size
+        self.add_plate(plate, stretch=1)
         
-        # Force a repaint
-        self.plates_widget.update()
-        self.update()
+        print(f"Custom plate setup complete. Total positions: {num_rows * num_columns}, Active wells: {len(wells)}")
         
     def setup_96_well_plate(self):
         self.clear_plates()
-        plate_layout = QGridLayout()
-        self.plates_layout.addLayout(plate_layout)
-        
-        self.buttons = {}
-        for i in range(8):  # A-H
-            for j in range(12):  # 1-12
-                well = f"{chr(65+i)}{j+1:02d}"
-                button = RoundButton(well)  # Keep using RoundButton for standard plates
-                button.clicked.connect(lambda _, w=well: self.on_well_clicked(w))
-                plate_layout.addWidget(button, i, j)
-                self.buttons[well] = button
-                if well not in self.active_wells:
-                    button.set_inactive()
+        wells = [(f"{chr(65+i)}{j+1:02d}", i, j, f"{chr(65+i)}{j+1:02d}") for i in range(8) for j in range(12)]  # A-H, 1-12
+        self.add_plate(PlateCanvas(wells, 8, 12, style=STANDARD_STYLE, min_cell=40))
 
     def setup_44_well_plates(self):
         self.clear_plates()
         
         # Create two plate layouts
         for plate_num in range(2):
-            plate_layout = QGridLayout()
             plate_label = QLabel(f"Slide {plate_num + 1}")
             # Set the font size for plate labels
             font = plate_label.font()
             font.setPointSize(20)  # You can adjust this number to make it bigger or smaller
             font.setBold(True)     # Optional: make it bold
             plate_label.setFont(font)
-            
             self.plates_layout.addWidget(plate_label)
-            self.plates_layout.addLayout(plate_layout)
             
-            # 44 well plate is 4x11
-            for i in range(4):  # A-D
-                for j in range(11):  # 1-11
-                    well = f"{chr(65+i)}{j+1:02d}"
-                    if plate_num == 1:
-                        # For second plate, use wells E-H
-                        well = f"{chr(69+i)}{j+1:02d}"  # E-H, 1-11
-                    button = RoundButton(well)  # Keep using RoundButton for standard plates
-                    button.clicked.connect(lambda _, w=well: self.on_well_clicked(w))
-                    plate_layout.addWidget(button, i, j)
-                    self.buttons[well] = button
-                    if well not in self.active_wells:
-                        button.set_inactive()
+            # 44 well plate is 4x11, A-D on the first slide and E-H on the second
+            first_row = 65 if plate_num == 0 else 69
+            wells = [(f"{chr(first_row+i)}{j+1:02d}", i, j, f"{chr(first_row+i)}{j+1:02d}")
+                     for i in range(4) for j in range(11)]
+            self.add_plate(PlateCanvas(wells, 4, 11, style=STANDARD_STYLE, min_cell=40))
             
             if plate_num == 0:
                 self.plates_layout.addSpacing(20)  # Add space between plates
 
+    def add_plate(self, plate, stretch=0):
+        plate.well_clicked.connect(self.on_well_clicked)
+        plate.set_active_wells(self.active_wells)
+        self.plates_layout.addWidget(plate, stretch)
+        self.plates.append(plate)
+
     def clear_plates(self):
         # Clear existing plate layouts
+        self.plates = []
         while self.plates_layout.count():
             item = self.plates_layout.takeAt(0)
             if item.widget():
@@ -790,85 +594,30 @@ class WellPlate(QWidget):
         if well in self.active_wells and well in self.analyzer.data:
             self.well_clicked.emit(well)
 
-    def change_colormap(self, colormap_name):
+    def set_colormap(self, colormap_name):
+        """Sample the colormap into the LUT used for well and bar colors"""
         self.colormap = plt.get_cmap(colormap_name)
+        self.lut = colormap_lut(self.colormap)
+
+    def change_colormap(self, colormap_name):
+        self.set_colormap(colormap_name)
         if hasattr(self, 'last_values'):
             self.update_heatmap(self.last_values)
 
     def update_heatmap(self, values):
-        if not values or not self.buttons:
+        if not values or not self.plates:
             return
                 
         self.last_values = values
-        norm = Normalize(vmin=min(values), vmax=max(values))
         
         # Create list of active wells in same order as data dictionary
-        ordered_wells = sorted(self.active_wells)
-        
-        # Create dictionary of well:value pairs
-        value_dict = {well: value for well, value in zip(ordered_wells, values)}
-        
-        # Update button colors
-        for well, button in self.buttons.items():
-            if well in self.active_wells:
-                value = value_dict[well]
-                color = self.colormap(norm(value))
-                hex_color = rgb2hex(color)
-                button.setStyleSheet(f"""
-                    QPushButton {{
-                        background-color: {hex_color};
-                        color: white;
-                        border-radius: 20px;
-                        border: 2px solid #444444;
-                        font-weight: bold;
-                    }}
-                """)
-                button.setEnabled(True)
-        
-        # Update bar chart with properly ordered data
-        self.barchart_figure.clear()
-        self.barchart_figure.patch.set_facecolor('#f0f0f0')
-
-        ax = self.barchart_figure.add_subplot(111)
-        ax.set_facecolor('white') 
-        
-        y_pos = np.arange(len(ordered_wells))
-        wells = list(ordered_wells)
-        values_ordered = [value_dict[well] for well in ordered_wells]
-        colors = [self.colormap(norm(value)) for value in values_ordered]
-        
-        # Calculate dynamic font size based on number of bars
-        # More bars = smaller font
-        num_wells = len(wells)
-        if num_wells <= 20:
-            font_size = 8
-        elif num_wells <= 40:
-            font_size = 6
-        elif num_wells <= 60:
-            font_size = 4
-        else:
-            font_size = 3
-        
-        # Create bars with drop shadow
-        bars = ax.barh(y_pos, values_ordered, align='center', color=colors, 
-                      edgecolor='dimgrey', linewidth=1)
+        ordered_wells = sorted(self.active_wells)[:len(values)]
+        colors = self.lut[lut_indices(values[:len(ordered_wells)])]
+        for plate in self.plates:
+            plate.set_colors(ordered_wells, colors)
         
-        ax.set_yticks(y_pos)
-        ax.set_yticklabels(wells, fontsize=font_size)
-        ax.invert_yaxis()
-        ax.set_xlabel('Intensity', fontsize=10)
-        ax.set_title('Intensity by Well', fontsize=12)
-    
-        # Add mean and std dev lines
-        mean_value = np.mean(values)
-        std_dev = np.std(values)
-        ax.axvline(mean_value, color='blue', linestyle=':', label='Mean', zorder=3)
-        ax.axvline(mean_value + std_dev, color='red', linestyle=':', label='+1 Std Dev', zorder=3)
-        ax.axvline(mean_value - std_dev, color='red', linestyle=':', label='-1 Std Dev', zorder=3)
-        ax.legend(fontsize='x-small')
-    
-        self.barchart_figure.tight_layout()
-        self.barchart_canvas.draw()
+        # Update bar chart in place
+        self.barchart.update(ordered_wells, values[:len(ordered_wells)], colors)
 
     def set_info_label(self, mass_range, mean, std_dev):
         # Create and set the text
@@ -878,52 +627,17 @@ class WellPlate(QWidget):
         else:
             info_text = f"Mass Range: {mass_range[0]:.2f} - {mass_range[1]:.2f}, Mean: {mean:.2f}, Std Dev: {std_dev:.2f}"
         self.info_label.setText(info_text)
-        
-        # Create and set a font for the label
-        font = self.info_label.font()
-        font.setPointSize(12)  # Increase font size (default is usually around 8-9)
-        font.setBold(True)     # Make the text bold
-        self.info_label.setFont(font)
-        
-        # Optional: Add some padding and styling
-        self.info_label.setStyleSheet("""
-            QLabel {
-                padding: 5px;
-                background-color: #f0f0f0;
-                border-radius: 5px;
-            }
-        """)
 
     def update_rgb_colors(self, color_dict):
         """
         Update well colors using direct RGB values
         color_dict: Dictionary mapping well names to hex color strings
         """
-        # First grey out all active wells
-        for well, button in self.buttons.items():
-            if well in self.active_wells:
-                button.setStyleSheet("""
-                    QPushButton {
-                        background-color: #D3D3D3;
-                        color: white;
-                        border-radius: 20px;
-                        border: 2px solid #444444;
-                        font-weight: bold;
-                    }
-                """)
-        
-        # Then color the selected wells
-        for well, color in color_dict.items():
-            if well in self.buttons:
-                self.buttons[well].setStyleSheet(f"""
-                    QPushButton {{
-                        background-color: {color};
-                        color: white;
-                        border-radius: 20px;
-                        border: 2px solid #444444;
-                        font-weight: bold;
-                }}
-            """)
+        active_wells = list(self.active_wells)
+        for plate in self.plates:
+            # First grey out all active wells, then color the selected wells
+            plate.set_colors(active_wells, ['#D3D3D3'] * len(active_wells))
+            plate.set_colors(list(color_dict), list(color_dict.values()))
     
     def reset_colors(self):
         """Reset to last heatmap state"""
@@ -987,6 +701,11 @@ class MassSpectrumAnalyzer(QMainWindow):
         self.select_folder_button.clicked.connect(self.select_folder)
         button_layout.addWidget(self.select_folder_button)
 
+        self.lazy_checkbox = QCheckBox("Lazy loading")
+        self.lazy_checkbox.setToolTip("Keep only a summary of each well in memory and load full spectra "
+                                      "when a well is clicked (for very large plates)")
+        button_layout.addWidget(self.lazy_checkbox)
+
         self.average_spectrum_button = QPushButton("Show Average Spectrum")
         self.average_spectrum_button.clicked.connect(self.plot_average_spectrum)
         button_layout.addWidget(self.average_spectrum_button)
@@ -995,14 +714,45 @@ class MassSpectrumAnalyzer(QMainWindow):
         self.export_csv_button.clicked.connect(self.export_to_csv)
         button_layout.addWidget(self.export_csv_button)
 
+        self.target_button = QPushButton("Extract Target List")
+        self.target_button.setToolTip("Export the intensity of every well in each m/z window of a target list")
+        self.target_button.clicked.connect(self.extract_target_list)
+        button_layout.addWidget(self.target_button)
+
         self.pca_button = QPushButton("Perform PCA")
         self.pca_button.clicked.connect(self.perform_pca)
         button_layout.addWidget(self.pca_button)
+        
+        self.pca_components_spin = QSpinBox()
+        self.pca_components_spin.setRange(2, 20)
+        self.pca_components_spin.setValue(DEFAULT_COMPONENTS)
+        self.pca_components_spin.setPrefix("PCs: ")
+        button_layout.addWidget(self.pca_components_spin)
 
         self.layout.addLayout(button_layout)
 
         self.data = {}
         self.average_spectrum = None
+        self.sparse_average = False  # Keep only occupied m/z bins in the average spectrum
+        self.engine = None  # Wells x m/z matrix over self.data for heatmap, export and PCA
+        self.engine_bin_width = ENGINE_BIN_WIDTH
+        self.engine_dense = False  # Dense float32 matrix instead of CSR
+        self.scale_cache = {}  # Normalization scales computed for the current engine
+        self.pca_thread = None
+        
+        # Span selections are answered on a worker; only the newest result is shown
+        self.range_generation = 0
+        self.range_thread = RangeQueryThread()
+        self.range_thread.result_ready.connect(self.apply_range_result)
+        self.range_thread.start()
+        self.span_timer = QTimer(self)
+        self.span_timer.setSingleShot(True)
+        self.span_timer.setInterval(SPAN_UPDATE_MS)
+        self.span_timer.timeout.connect(self.submit_range_query)
+        self.lod_line = None  # Level-of-detail line of the spectrum on screen
+        self.average_pyramid = None  # (average spectrum Series, its MinMaxPyramid)
+        self.well_pyramids = OrderedDict()  # Recently viewed wells' pyramids
+        self.max_well_pyramids = 8
         self.current_spectrum = None
         self.span = None
         self.last_selected_range = None
@@ -1017,31 +767,49 @@ class MassSpectrumAnalyzer(QMainWindow):
             self.plot_average_spectrum()
 
     def load_data(self, folder):
+        # Replies still on their way for the previous folder are dropped
+        self.range_generation += 1
+        self.range_thread.clear()
         self.data = {}
-        self.original_data = {}  # Store original data for normalization resets
-        active_wells = []
-        
-        for file in os.listdir(folder):
-            if file.endswith(('.csv', '.CSV')):
-                # Handle different naming conventions
-                if '_Spot_' in file:
-                    # Extract spot ID for custom plates (e.g., "August17_003_Spot_38.csv" -> "Spot_38")
-                    well = file.split('_Spot_')[1].replace('.csv', '').replace('.CSV', '')
-                    well = f"Spot_{well}"
-                else:
-                    # Original well ID extraction for standard plates (e.g., "experiment_A01.csv" -> "A01")
-                    well = file[-7:-4]  # Extract well ID from filename
-                
-                file_path = os.path.join(folder, file)
+        self.engine = None
+        self.scale_cache = {}
+        self.well_pyramids.clear()
+        
+        # A plate cube holds every well in one file, so prefer it over per-well CSVs
+        cube_file = find_plate_cube(folder)
+        csv_files = [] if cube_file else find_spectrum_files(folder)
+        sources = [cube_file] if cube_file else [path for well, path in csv_files]
+        
+        # Reuse the consolidated cache from the last time this folder was opened:
+        # spectra and engine are memory-mapped, nothing is rebuilt
+        cache = load_viewer_cache(folder, sources, self.engine_bin_width, self.sparse_average) if sources else None
+        if cache is not None:
+            self.data = cache.spectra()
+            self.engine = cache.engine(self.engine_dense) if self.data else None
+            print(f"Loaded {len(self.data)} wells from viewer cache")
+        elif self.lazy_checkbox.isChecked():
+            self.load_lazy_data(cube_file, csv_files)
+        else:
+            spectra = {}
+            expected_wells = len(csv_files)
+            if cube_file:
                 try:
-                    df = pd.read_csv(file_path, names=["mass_to_charge", "intensity"])
-                    df = df.groupby('mass_to_charge')['intensity'].mean().reset_index()
-                    self.data[well] = df
-                    self.original_data[well] = df.copy()  # Store a copy of original data
-                    active_wells.append(well)
-                    print(f"Loaded data for well: {well}")
+                    cube = load_plate_cube(cube_file)
+                    spectra = {well: cube.spectrum(well) for well in cube.well_ids}
+                    expected_wells = len(cube.well_ids)
+                    print(f"Loaded {len(spectra)} wells from plate cube: {cube_file}")
                 except Exception as e:
-                    print(f"Error loading {file}: {e}")
+                    print(f"Error loading plate cube {cube_file}: {e}")
+            else:
+                spectra = self.load_csv_spectra(csv_files)
+            
+            # Build the aligned matrix and the average spectrum in one pass
+            self.engine = self.build_engine(spectra) if spectra else None
+            # Only cache complete loads, not cancelled or partly failed ones
+            if spectra and len(spectra) == expected_wells:
+                save_viewer_cache(folder, spectra, self.engine, sources)
+            self.data = spectra
+        active_wells = list(self.data.keys())
     
         print(f"Total wells loaded: {len(active_wells)}")
         print(f"Well IDs: {active_wells}")
@@ -1050,45 +818,82 @@ class MassSpectrumAnalyzer(QMainWindow):
         if self.well_plate.current_layout != "custom":
             self.well_plate.set_active_wells(active_wells)
     
-        if not self.data:
+        if not self.data or self.engine is None:
             print("No data loaded!")
             return
             
-        # Create average spectrum
-        min_mz = min(df['mass_to_charge'].min() for df in self.data.values())
-        max_mz = max(df['mass_to_charge'].max() for df in self.data.values())
-        
-        step = 0.01
-        common_mz = np.arange(min_mz, max_mz + step, step)
-        
-        aligned_intensities = []
-        for df in self.data.values():
-            interpolated = np.interp(
-                common_mz,
-                df['mass_to_charge'],
-                df['intensity'],
-                left=0,
-                right=0
-            )
-            aligned_intensities.append(interpolated)
-        
-        average_intensities = np.mean(aligned_intensities, axis=0)
-        self.average_spectrum = pd.Series(
-            data=average_intensities,
-            index=common_mz
-        )
+        common_mz, average_intensities = self.engine.average_spectrum()
+        self.average_spectrum = pd.Series(data=np.asarray(average_intensities), index=np.asarray(common_mz))
+        # Keep the selected normalization mode for the new data
+        self.well_plate.apply_normalization()
+
+    def load_lazy_data(self, cube_file, csv_files):
+        """Open a folder keeping only per-well summaries in memory"""
+        try:
+            if cube_file:
+                self.data = open_lazy_plate_cube(cube_file)
+            else:
+                self.data = self.load_csv_spectra(csv_files, lazy=True)
+        except Exception as e:
+            print(f"Error opening data lazily: {e}")
+            self.data = {}
+        if self.data:
+            self.engine = SpectrumEngine.from_lazy(self.data, dense=self.engine_dense)
+
+    def range_means(self, mass_range, wells):
+        """Mean intensity of each well's points within mass_range, from the engine's prefix-sum index"""
+        return self.engine.range_means(mass_range, wells).tolist()
+
+    def normalization_scale(self, mode, standard_mz=None):
+        """Per-well divisor for a normalization mode, computed once per loaded folder"""
+        key = (mode, standard_mz if mode == 'internal_standard' else None)
+        if key not in self.scale_cache:
+            self.scale_cache[key] = normalization_scale(self.engine, mode, standard_mz)
+        return self.scale_cache[key]
+
+    def build_engine(self, spectra):
+        """Align all spectra into one wells x m/z matrix, also accumulating the average spectrum"""
+        return SpectrumEngine.from_spectra(spectra, bin_width=self.engine_bin_width, dense=self.engine_dense,
+                                           sparse_average=self.sparse_average)
+
+    def load_csv_spectra(self, files, lazy=False):
+        """
+        Parse the per-well CSVs on a worker pool, showing progress without blocking the window.
+        With lazy set, only summaries are kept and a LazySpectra is returned.
+        """
+        if not files:
+            return {}
+        progress_dialog = QProgressDialog("Loading spectra...", "Cancel", 0, len(files), self)
+        progress_dialog.setWindowTitle("Loading Data")
+        progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        progress_dialog.setMinimumDuration(500)
+        
+        def update_progress(n_done, n_total, well):
+            progress_dialog.setValue(n_done)
+            progress_dialog.setLabelText(f"Loaded well {well} ({n_done} of {n_total})")
+            QApplication.processEvents()
+        
+        if lazy:
+            spectra = open_lazy_csv_folder(files, progress=update_progress, is_cancelled=progress_dialog.wasCanceled)
+        else:
+            spectra = load_spectra(files, progress=update_progress, is_cancelled=progress_dialog.wasCanceled)
+        progress_dialog.close()
+        return spectra
 
     def plot_average_spectrum(self):
         self.figure.clear()
         ax = self.figure.add_subplot(111)
         ax.set_facecolor('white')  # Keep plot area white
-        ax.plot(self.average_spectrum.index, self.average_spectrum.values)
+        if self.average_pyramid is None or self.average_pyramid[0] is not self.average_spectrum:
+            self.average_pyramid = (self.average_spectrum, MinMaxPyramid(self.average_spectrum.index,
+                                                                         self.average_spectrum.values))
+        self.lod_line = LODLine(ax, self.average_pyramid[1])
         ax.set_xlabel('Mass to Charge')
         ax.set_ylabel('Intensity')
         ax.set_title('Average Mass Spectrum')
         
         self.span = SpanSelector(ax, self.on_select, 'horizontal', useblit=True, 
-                                 props=dict(alpha=0.5, facecolor='red'))
+                                 props=dict(alpha=0.5, facecolor='red'), onmove_callback=self.on_select)
         self.canvas.draw()
         self.current_spectrum = 'average'
 
@@ -1101,33 +906,58 @@ class MassSpectrumAnalyzer(QMainWindow):
         self.figure.clear()
         ax = self.figure.add_subplot(111)
         ax.set_facecolor('white')  # Keep plot area white
-        spectrum = self.data[well]
-        ax.plot(spectrum['mass_to_charge'], spectrum['intensity'])
+        scale = self.engine.scale_of(well) if self.engine is not None else 1.0
+        self.lod_line = LODLine(ax, self.well_pyramid(well), scale)
         ax.set_xlabel('Mass to Charge')
         ax.set_ylabel('Intensity')
         ax.set_title(f'Mass Spectrum for Well {well}')
         
         self.span = SpanSelector(ax, self.on_select, 'horizontal', useblit=True, 
-                                 props=dict(alpha=0.5, facecolor='red'))
+                                 props=dict(alpha=0.5, facecolor='red'), onmove_callback=self.on_select)
         self.canvas.draw()
         self.current_spectrum = well
     
         if self.last_selected_range:
             self.update_heatmap(self.last_selected_range)
     
+    def well_pyramid(self, well):
+        """Decimation pyramid of a well's raw spectrum, kept for the last few wells viewed"""
+        if well in self.well_pyramids:
+            self.well_pyramids.move_to_end(well)
+        else:
+            mz, intensity = self.data[well]
+            self.well_pyramids[well] = MinMaxPyramid(mz, intensity)
+            while len(self.well_pyramids) > self.max_well_pyramids:
+                self.well_pyramids.popitem(last=False)
+        return self.well_pyramids[well]
+
     def on_select(self, xmin, xmax):
+        # Coalesce drag events: query the latest range at most once per frame
         self.last_selected_range = (xmin, xmax)
-        self.update_heatmap((xmin, xmax))
+        if not self.span_timer.isActive():
+            self.span_timer.start()
+    
+    def submit_range_query(self):
+        if self.engine is None or not self.last_selected_range:
+            return
+        self.range_generation += 1
+        # set_row_scale swaps in a new array, so this reference is a stable snapshot
+        self.range_thread.submit(self.range_generation, self.engine, self.last_selected_range,
+                                 sorted(self.data.keys()), self.engine.row_scale)
+    
+    def apply_range_result(self, generation, mass_range, values):
+        if generation != self.range_generation:
+            return  # A newer range was requested since
+        self.show_heatmap(mass_range, values)
     
     def update_heatmap(self, mass_range):
+        """Recompute the heatmap now, superseding any query still on the worker"""
+        self.range_generation += 1
         ordered_wells = sorted(self.data.keys())
-        values = []
-        for well in ordered_wells:
-            spectrum = self.data[well]
-            mask = (spectrum['mass_to_charge'] >= mass_range[0]) & (spectrum['mass_to_charge'] <= mass_range[1])
-            mean_intensity = spectrum.loc[mask, 'intensity'].mean()
-            values.append(mean_intensity)
-        
+        values = self.range_means(mass_range, ordered_wells)
+        self.show_heatmap(mass_range, values)
+    
+    def show_heatmap(self, mass_range, values):
         self.well_plate.update_heatmap(values)
         
         mean_value = np.mean(values)
@@ -1141,9 +971,8 @@ class MassSpectrumAnalyzer(QMainWindow):
         file_name, _ = QFileDialog.getSaveFileName(self, "Save CSV", "", "CSV Files (*.csv)")
         if file_name:
             data = []
-            for well, spectrum in self.data.items():
-                mask = (spectrum['mass_to_charge'] >= self.last_selected_range[0]) & (spectrum['mass_to_charge'] <= self.last_selected_range[1])
-                mean_intensity = spectrum.loc[mask, 'intensity'].mean()
+            wells = list(self.data.keys())
+            for well, mean_intensity in zip(wells, self.range_means(self.last_selected_range, wells)):
                 data.append({
                     'Well': well,
                     'Mass Range': f"{self.last_selected_range[0]:.2f} - {self.last_selected_range[1]:.2f}",
@@ -1153,47 +982,72 @@ class MassSpectrumAnalyzer(QMainWindow):
             df = pd.DataFrame(data)
             df.to_csv(file_name, index=False)
 
+    def extract_target_list(self):
+        """Wells x targets intensities for a file of m/z values and tolerances, exported as one CSV"""
+        if self.engine is None:
+            return
+        target_file, _ = QFileDialog.getOpenFileName(self, "Open Target List", "",
+                                                     "Target Lists (*.csv *.tsv *.txt)")
+        if not target_file:
+            return
+        try:
+            targets = read_target_list(target_file)
+        except Exception as e:
+            QMessageBox.warning(self, "Warning", f"Could not read target list: {e}")
+            return
+        
+        wells = list(self.data.keys())
+        matrix = extract_targets(self.engine, targets, wells)
+        print(f"Extracted {len(targets)} targets from {len(wells)} wells")
+        
+        file_name, _ = QFileDialog.getSaveFileName(self, "Save Target Intensities", "", "CSV Files (*.csv)")
+        if file_name:
+            export_target_matrix(file_name, wells, targets, matrix)
+
     def perform_pca(self):
-        if not self.data or not self.last_selected_range:
+        if not self.data or not self.last_selected_range or self.engine is None:
+            return
+        if self.pca_thread is not None and self.pca_thread.isRunning():
             return
     
-        # Create a common mass-to-charge axis within the selected range
-        step = 0.01  # Adjust based on your data resolution
-        common_mz = np.arange(
-            self.last_selected_range[0],
-            self.last_selected_range[1] + step,
-            step
-        )
-        
-        # Prepare aligned data for PCA
-        X = []
-        wells = []
-        for well, spectrum in self.data.items():
-            # Interpolate this spectrum onto the common axis
-            interpolated = np.interp(
-                common_mz,
-                spectrum['mass_to_charge'],
-                spectrum['intensity'],
-                left=0,
-                right=0
-            )
-            X.append(interpolated)
-            wells.append(well)
-    
-        X = np.array(X)
-    
-        # Standardize the data
-        scaler = StandardScaler()
-        X_scaled = scaler.fit_transform(X)
+        # Wells x bins over the selected range, straight from the aligned matrix (kept sparse)
+        wells = list(self.engine.well_ids)
+        common_mz, X = self.engine.slice(self.last_selected_range, dense=False)
+        if X.shape[1] == 0:
+            print("No data in the selected range")
+            return
+        
+        # Run on a worker thread so the window stays responsive
+        self.pca_button.setEnabled(False)
+        self.pca_progress = QProgressDialog("Running PCA...", "Cancel", 0, 1, self)
+        self.pca_progress.setWindowTitle("PCA")
+        self.pca_progress.setMinimumDuration(500)
+        self.pca_thread = PCAThread(X, wells, self.pca_components_spin.value())
+        self.pca_thread.progress_update.connect(self.update_pca_progress)
+        self.pca_thread.finished_signal.connect(self.show_pca)
+        self.pca_progress.canceled.connect(self.pca_thread.cancel)
+        self.pca_thread.start()
     
-        # Perform PCA
-        pca = PCA(n_components=2)
-        pca_result = pca.fit_transform(X_scaled)
+    def update_pca_progress(self, step, n_steps, message):
+        self.pca_progress.setMaximum(n_steps)
+        self.pca_progress.setValue(step)
+        self.pca_progress.setLabelText(message)
     
+    def show_pca(self, result, message):
+        self.pca_progress.close()
+        self.pca_button.setEnabled(True)
+        if result is None:
+            print(message)
+            return
         # Create and show PCA window, passing self as parent
-        self.pca_window = PCAWindow(pca_result, wells, parent=self)
+        self.pca_window = PCAWindow(result.scores, result.wells, parent=self,
+                                    explained_variance_ratio=result.explained_variance_ratio)
         self.pca_window.show()
         
+    def closeEvent(self, event):
+        self.range_thread.stop()
+        super().closeEvent(event)
+    
     def on_mouse_press(self, event):
         if event.button == 3:  # Right mouse button
             self.zoom_start = (event.xdata, event.ydata)
@@ -1214,13 +1068,93 @@ class MassSpectrumAnalyzer(QMainWindow):
         self.canvas.draw()
     
     def reset_zoom(self):
-        ax = self.figure.gca()
-        ax.relim()
-        ax.autoscale_view()
+        if self.lod_line is not None:
+            # The line only holds the visible window, so relim would keep the zoom
+            self.lod_line.reset_view()
+        else:
+            ax = self.figure.gca()
+            ax.relim()
+            ax.autoscale_view()
         self.canvas.draw()
 
+class RangeQueryThread(QThread):
+    """
+    Computes heatmap range means off the GUI thread. Only the newest request
+    is kept: one submitted while another is running replaces any still waiting.
+    Each request carries the normalization scale in force when it was made,
+    so the worker never reads the engine's scale while the GUI changes it.
+    """
+    
+    result_ready = pyqtSignal(int, object, object)  # generation, mass range, values
+    
+    def __init__(self):
+        super().__init__()
+        self.condition = threading.Condition()
+        self.pending = None
+        self.stopped = False
+    
+    def submit(self, generation, engine, mass_range, wells, row_scale):
+        with self.condition:
+            self.pending = (generation, engine, mass_range, wells, row_scale)
+            self.condition.notify()
+    
+    def clear(self):
+        """Drop the request still waiting, if any"""
+        with self.condition:
+            self.pending = None
+    
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        self.wait()
+    
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                request, self.pending = self.pending, None
+            generation, engine, mass_range, wells, row_scale = request
+            try:
+                values = engine.range_means(mass_range, wells, raw=row_scale is None, row_scale=row_scale).tolist()
+            except Exception as e:
+                print(f"Error computing range {mass_range}: {e}")
+                continue
+            self.result_ready.emit(generation, mass_range, values)
+
+
+class PCAThread(QThread):
+    """Runs randomized PCA on a wells x bins matrix off the GUI thread"""
+    
+    progress_update = pyqtSignal(int, int, str)  # step, total steps, message
+    finished_signal = pyqtSignal(object, str)  # PCAResult or None, message
+    
+    def __init__(self, X, wells, n_components):
+        super().__init__()
+        self.X = X
+        self.wells = wells
+        self.n_components = n_components
+        self.cancelled = False
+    
+    def run(self):
+        try:
+            result = randomized_pca(self.X, self.n_components, wells=self.wells,
+                                    progress=self.progress_update.emit, is_cancelled=lambda: self.cancelled)
+            self.finished_signal.emit(result, "PCA complete")
+        except PCACancelled:
+            self.finished_signal.emit(None, "PCA cancelled")
+        except Exception as e:
+            self.finished_signal.emit(None, f"Error during PCA: {str(e)}")
+    
+    def cancel(self):
+        self.cancelled = True
+
+
 class PCAWindow(QMainWindow):
-    def __init__(self, pca_result, wells, parent=None):
+    def __init__(self, pca_result, wells, parent=None, explained_variance_ratio=None):
         super().__init__(parent)
         self.setWindowTitle("PCA Analysis")
         self.setGeometry(200, 200, 800, 600)
@@ -1229,13 +1163,17 @@ class PCAWindow(QMainWindow):
         self.pca_result = pca_result
         self.wells = wells
         self.parent = parent
+        self.explained_variance_ratio = explained_variance_ratio
+        self.x_component, self.y_component = 0, 1
         
         # Initialize drawing variables and storage
         self.drawing = False
         self.draw_mode = False
         self.path = []
-        self.drawn_line = None
-        self.regions = []  # List of (path, color) tuples
+        self.lasso_line = None  # Animated line of the lasso being drawn
+        self.point_labels = None  # Labels of the points that fit at the current zoom
+        self.background = None  # Axes pixels saved when the lasso started, for blitting
+        self.regions = []  # List of (path, color, (x component, y component)) tuples
         self.selected_wells = {}  # Dictionary of {color: set of wells}
         
         # Define colors
@@ -1263,6 +1201,18 @@ class PCAWindow(QMainWindow):
         # Create button layout
         button_layout = QHBoxLayout()
         
+        # Components shown on each axis
+        self.x_combo = QComboBox()
+        self.y_combo = QComboBox()
+        for combo, component in ((self.x_combo, self.x_component), (self.y_combo, self.y_component)):
+            combo.addItems([f"PC{i + 1}" for i in range(self.pca_result.shape[1])])
+            combo.setCurrentIndex(component)
+            combo.currentIndexChanged.connect(self.change_axes)
+        button_layout.addWidget(QLabel("X:"))
+        button_layout.addWidget(self.x_combo)
+        button_layout.addWidget(QLabel("Y:"))
+        button_layout.addWidget(self.y_combo)
+        
         # Button for toggling draw mode
         self.draw_button = QPushButton("Toggle Draw Mode")
         self.draw_button.setCheckable(True)
@@ -1311,28 +1261,48 @@ class PCAWindow(QMainWindow):
     def clear_regions(self):
         self.regions = []
         self.selected_wells = {}
-        self.plot_pca()
+        for patch in self.ax.patches[:]:
+            patch.remove()
+        self.canvas.draw_idle()
         self.update_well_plate_colors()
         
+    def change_axes(self):
+        self.x_component = self.x_combo.currentIndex()
+        self.y_component = self.y_combo.currentIndex()
+        self.plot_pca()
+    
+    def axis_label(self, component):
+        if self.explained_variance_ratio is None:
+            return f'PC{component + 1}'
+        return f'PC{component + 1} ({100 * self.explained_variance_ratio[component]:.1f}%)'
+    
+    def current_points(self):
+        return self.pca_result[:, [self.x_component, self.y_component]]
+        
     def plot_pca(self):
+        if self.point_labels is not None:
+            self.point_labels.remove()
         self.ax.clear()
-        self.ax.scatter(self.pca_result[:, 0], self.pca_result[:, 1], c='black', alpha=0.6)
-        
-        # Add well labels
-        for i, well in enumerate(self.wells):
-            self.ax.annotate(well, (self.pca_result[i, 0], self.pca_result[i, 1]), 
-                            xytext=(5, 5), textcoords='offset points', fontsize=8)
+        points = self.current_points()
+        self.ax.scatter(points[:, 0], points[:, 1], c='black', alpha=0.6)
         
-        # Draw existing regions
-        for path_array, color in self.regions:
-            polygon = PathPatch(Path(path_array), facecolor=self.colors[color][0], 
-                              alpha=0.2, edgecolor=self.colors[color][0])
-            self.ax.add_patch(polygon)
+        # Draw existing regions drawn on these axes
+        for path_array, color, axes in self.regions:
+            if axes != (self.x_component, self.y_component):
+                continue
+            self.add_region_patch(path_array, color)
         
-        self.ax.set_xlabel('PC1')
-        self.ax.set_ylabel('PC2')
+        self.ax.set_xlabel(self.axis_label(self.x_component))
+        self.ax.set_ylabel(self.axis_label(self.y_component))
         self.ax.set_title('PCA Results')
         self.figure.tight_layout()
+        
+        # Well labels that fit at the current zoom, outlying points first
+        spread = np.nanstd(points, axis=0)
+        spread[~(spread > 0)] = 1.0
+        distance = np.hypot(*((points - np.nanmean(points, axis=0)) / spread).T)
+        self.point_labels = PointLabels(self.ax, points[:, 0], points[:, 1], self.wells,
+                                        priority=distance, fontsize=8)
         self.canvas.draw()
         
     def toggle_draw_mode(self):
@@ -1342,48 +1312,60 @@ class PCAWindow(QMainWindow):
         else:
             self.toolbar.setEnabled(True)
             
+    def add_region_patch(self, path_array, color):
+        polygon = PathPatch(Path(path_array), facecolor=self.colors[color][0], 
+                          alpha=0.2, edgecolor=self.colors[color][0])
+        self.ax.add_patch(polygon)
+            
     def on_mouse_press(self, event):
         if not self.draw_mode or event.inaxes != self.ax:
             return
         self.drawing = True
         self.path = [(event.xdata, event.ydata)]
         
+        # Save the axes as drawn; the lasso is then blitted over it on every move
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.lasso_line, = self.ax.plot([], [], c=self.colors[self.current_color][0], animated=True)
+        
     def on_mouse_move(self, event):
         if not self.drawing or not self.draw_mode or event.inaxes != self.ax:
             return
         self.path.append((event.xdata, event.ydata))
         
-        # Remove previous line if it exists
-        if self.drawn_line:
-            self.drawn_line.pop(0).remove()
-        
-        # Draw the current path
+        # Draw the current path over the saved background
         path_array = np.array(self.path)
-        self.drawn_line = self.ax.plot(path_array[:, 0], path_array[:, 1], 
-                                     c=self.colors[self.current_color][0])
-        self.canvas.draw_idle()
+        self.lasso_line.set_data(path_array[:, 0], path_array[:, 1])
+        self.canvas.restore_region(self.background)
+        self.ax.draw_artist(self.lasso_line)
+        self.canvas.blit(self.ax.bbox)
         
     def on_mouse_release(self, event):
         if not self.drawing or not self.draw_mode:
             return
         self.drawing = False
+        if self.lasso_line is not None:
+            self.lasso_line.remove()
+            self.lasso_line = None
+        self.background = None
         
         # Convert path to polygon
         path_array = np.array(self.path)
         if len(path_array) < 3:  # Need at least 3 points for a polygon
+            self.canvas.draw_idle()
             return
             
-        # Add the region to our list
-        self.regions.append((path_array, self.current_color))
-        
-        # Update the plot with all regions
-        self.plot_pca()
+        # Add the region to our list and only its patch to the plot
+        self.regions.append((path_array, self.current_color, (self.x_component, self.y_component)))
+        self.add_region_patch(path_array, self.current_color)
+        self.canvas.draw_idle()
         
-        # Update selected wells for this color
-        polygon = Path(path_array)
-        points = self.pca_result[:, :2]
-        mask = polygon.contains_points(points)
-        self.selected_wells[self.current_color] = set([self.wells[i] for i in range(len(self.wells)) if mask[i]])
+        # Update selected wells for this color: only points inside the lasso's
+        # bounding box go through the point-in-polygon test
+        points = self.current_points()
+        low, high = path_array.min(axis=0), path_array.max(axis=0)
+        candidates = np.flatnonzero(np.all((points >= low) & (points <= high), axis=1))
+        inside = candidates[Path(path_array).contains_points(points[candidates])] if len(candidates) else candidates
+        self.selected_wells[self.current_color] = set(np.asarray(self.wells, dtype=object)[inside])
         
         # Update well plate colors
         self.update_well_plate_colors()
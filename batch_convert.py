@@ -0,0 +1,234 @@
+"""
+Convert HT-DESI runs without the acquisition GUI.
+
+Every .raw folder given on the command line (or found inside a given
+folder) is added to a persistent job queue and converted with
+RunConverter, several runs at a time. Re-running the same command picks up
+where an interrupted batch stopped.
+
+Example:
+    python batch_convert.py D:/Data/week32 D:/Data/week33 --workers 4 --mode direct
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from conversion_pipeline import RunConverter, DEFAULT_PROCESSING_SETTINGS, run_paths, load_run_info
+
+DEFAULT_QUEUE_FILE = 'batch_queue.json'
+DEFAULT_REPORT_FILE = 'batch_report.json'
+
+
+def find_raw_folders(paths):
+    """Expand the given paths into .raw folders, looking one level inside non-.raw folders"""
+    raw_folders = []
+    for path in paths:
+        path = os.path.normpath(os.path.abspath(path))
+        if path.lower().endswith('.raw'):
+            raw_folders.append(path)
+        elif os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith('.raw') and os.path.isdir(os.path.join(path, name)):
+                    raw_folders.append(os.path.join(path, name))
+        else:
+            print(f"Skipping {path}: not a .raw folder")
+    return raw_folders
+
+
+def load_settings(settings_file=None):
+    """Processing settings, optionally taken from the acquisition app's app_settings.json"""
+    settings = dict(DEFAULT_PROCESSING_SETTINGS)
+    if settings_file:
+        with open(settings_file, 'r') as f:
+            data = json.load(f)
+        settings.update(data.get('processing_settings', data))
+    return settings
+
+
+class JobQueue:
+    """
+    Batch queue stored as JSON, one entry per .raw folder.
+
+    Jobs move from 'pending' to 'running' to 'done' or 'failed'. The file is
+    saved after every change, so a batch that is killed can be resumed; jobs
+    left 'running' are put back to 'pending' when the queue is loaded.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.jobs = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.jobs = json.load(f).get('jobs', {})
+            for job in self.jobs.values():
+                if job['status'] == 'running':
+                    job['status'] = 'pending'
+
+    def save(self):
+        data = {'updated': time.strftime('%Y-%m-%d %H:%M:%S'), 'jobs': self.jobs}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def add(self, raw_path, force=False):
+        job = self.jobs.get(raw_path)
+        if job is None or force or job['status'] == 'failed':
+            self.jobs[raw_path] = {'raw_path': raw_path, 'status': 'pending'}
+
+    def pending(self):
+        return [path for path, job in self.jobs.items() if job['status'] == 'pending']
+
+    def update(self, raw_path, **fields):
+        self.jobs[raw_path].update(fields)
+        self.save()
+
+
+def convert_run(raw_path, settings, force=False):
+    """
+    Convert one run in a worker process.
+
+    Returns:
+        dict: Result fields for the queue entry
+    """
+    started = time.time()
+    try:
+        fulldata, fulloutdata, fulloutCSVdata = run_paths(raw_path)
+        WellList, run_info = load_run_info(fulldata, fulloutdata)
+        log_file = f'{fulloutdata}_batch_log.txt'
+        with open(log_file, 'w') as log:
+            def write_log(message):
+                log.write(f'{message}\n')
+                log.flush()
+            converter = RunConverter(fulldata, WellList, fulloutdata, fulloutCSVdata,
+                                     settings=settings, run_info=run_info, force=force,
+                                     log=write_log, status=lambda message: None)
+            converter.run()
+        summary_file = converter.summary_file
+        wells = converter.processing_summary['processed_wells']
+        return {
+            'status': 'done',
+            'summary': summary_file,
+            'log': log_file,
+            'n_wells': len(wells),
+            'n_reused': sum(1 for well in wells if well.get('reused')),
+            'n_expected': len(WellList) - 2,
+            'timings': converter.processing_summary.get('timings'),
+            'elapsed': round(time.time() - started, 1)
+        }
+    except Exception as e:
+        return {'status': 'failed', 'error': str(e), 'elapsed': round(time.time() - started, 1)}
+
+
+def write_report(queue, report_file):
+    """Overall report of every run in the queue"""
+    jobs = list(queue.jobs.values())
+    report = {
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'n_runs': len(jobs),
+        'n_done': sum(1 for job in jobs if job['status'] == 'done'),
+        'n_failed': sum(1 for job in jobs if job['status'] == 'failed'),
+        'n_wells': sum(job.get('n_wells', 0) for job in jobs),
+        'total_elapsed': round(sum(job.get('elapsed', 0) for job in jobs), 1),
+        'runs': jobs
+    }
+    with open(report_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def run_batch(queue, pending, settings, workers, force=False):
+    """
+    Convert the pending runs on a pool of worker processes.
+
+    Only as many runs as there are workers are submitted at a time, so a run
+    is marked 'running' (with its start time) when it really starts. A run
+    whose worker raises or dies is marked 'failed' with the error, and a
+    broken pool is replaced so the rest of the batch still runs.
+    """
+    pending = list(pending)
+    running = {}
+    executor = ProcessPoolExecutor(max_workers=workers)
+
+    def submit_next():
+        nonlocal executor
+        if not pending:
+            return
+        raw_path = pending.pop(0)
+        queue.update(raw_path, status='running', started=time.strftime('%Y-%m-%d %H:%M:%S'))
+        try:
+            future = executor.submit(convert_run, raw_path, settings, force)
+        except BrokenProcessPool:
+            executor.shutdown(wait=False)
+            executor = ProcessPoolExecutor(max_workers=workers)
+            future = executor.submit(convert_run, raw_path, settings, force)
+        running[future] = raw_path
+
+    try:
+        for _ in range(workers):
+            submit_next()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                raw_path = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'status': 'failed', 'error': f"{type(e).__name__}: {e}"}
+                queue.update(raw_path, finished=time.strftime('%Y-%m-%d %H:%M:%S'), **result)
+                if result['status'] == 'done':
+                    print(f"{os.path.basename(raw_path)}: {result['n_wells']} wells in {result['elapsed']} s")
+                else:
+                    print(f"{os.path.basename(raw_path)}: FAILED ({result['error']})")
+                submit_next()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert HT-DESI .raw runs without the GUI")
+    parser.add_argument('paths', nargs='*', help=".raw folders, or folders containing .raw folders")
+    parser.add_argument('--workers', type=int, default=1, help="Runs converted in parallel")
+    parser.add_argument('--extraction-workers', type=int,
+                        help="maldichrom processes per run (default: split the CPUs between runs)")
+    parser.add_argument('--mode', choices=['maldichrom', 'direct'], help="Extraction mode")
+    parser.add_argument('--output-format', choices=['csv', 'cube', 'both'], help="Outputs to write")
+    parser.add_argument('--bin-width', type=float, help="m/z bin width for direct extraction and the cube")
+    parser.add_argument('--settings', help="JSON settings file, e.g. the acquisition app's app_settings.json")
+    parser.add_argument('--queue', default=DEFAULT_QUEUE_FILE, help="Persistent job queue file")
+    parser.add_argument('--report', default=DEFAULT_REPORT_FILE, help="Overall report file")
+    parser.add_argument('--force', action='store_true', help="Reconvert every run and every well")
+    args = parser.parse_args(argv)
+
+    settings = load_settings(args.settings)
+    if args.mode:
+        settings['extraction_mode'] = args.mode
+    if args.output_format:
+        settings['output_format'] = args.output_format
+    if args.bin_width:
+        settings['bin_width'] = args.bin_width
+    if args.extraction_workers:
+        settings['extraction_workers'] = args.extraction_workers
+    else:
+        settings['extraction_workers'] = max(1, settings['extraction_workers'] // max(1, args.workers))
+
+    queue = JobQueue(args.queue)
+    for raw_path in find_raw_folders(args.paths):
+        queue.add(raw_path, force=args.force)
+    queue.save()
+
+    pending = queue.pending()
+    print(f"{len(pending)} runs to convert, {args.workers} at a time")
+    run_batch(queue, pending, settings, args.workers, args.force)
+
+    report = write_report(queue, args.report)
+    print(f"{report['n_done']} of {report['n_runs']} runs converted, {report['n_failed']} failed")
+    print(f"Report saved to: {args.report}")
+    return 1 if report['n_failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,459 @@
+import os
+import json
+import time
+import numpy as np
+from well_segmentation import segment_wells, load_scan_index, save_scan_index
+from maldichrom_pool import (MaldichromPool, ExtractionJob, default_worker_count,
+                             DEFAULT_MALDICHROM_COMMAND, DEFAULT_MALDICHROM_CWD, DEFAULT_EXTRACTION_TIMEOUT)
+from spectrum_extractor import CombinedSpectrumExtractor, WatersScanSource
+from plate_cube import PlateCubeWriter, plate_cube_path, load_plate_cube
+from csv_export import write_spectrum_csv
+from processing_manifest import ProcessingManifest, manifest_path
+from stage_timer import StageTimer
+
+DEFAULT_PROCESSING_SETTINGS = {
+    'maldichrom_command': DEFAULT_MALDICHROM_COMMAND,
+    'maldichrom_cwd': DEFAULT_MALDICHROM_CWD,
+    'extraction_workers': default_worker_count(),
+    'extraction_timeout': DEFAULT_EXTRACTION_TIMEOUT,  # seconds per well, None to wait indefinitely
+    'extraction_mode': 'maldichrom',  # or 'direct' to sum scans in-process
+    'bin_width': 0.01,  # m/z bin width for direct extraction and the plate cube
+    'output_format': 'csv',  # 'csv', 'cube' or 'both'
+    'csv_precision': None,  # decimal places, None for full precision
+    'csv_drop_zeros': False,
+    'csv_gzip': False
+}
+
+# Settings that change the content of the outputs; changing any of them
+# invalidates previously converted wells
+OUTPUT_SETTINGS = ('extraction_mode', 'bin_width', 'csv_precision', 'csv_drop_zeros', 'csv_gzip')
+
+
+def open_reader(raw_path):
+    """Open a Waters .raw folder with the imaging reader"""
+    import WatersIMGReader as wat
+    return wat.WatersIMGReader(raw_path, 1)
+
+
+def close_reader(reader):
+    """Release a reader's file handle, for readers that can be closed explicitly"""
+    close = getattr(reader, 'close', None)
+    if callable(close):
+        try:
+            close()
+        except Exception as e:
+            print(f"Error closing reader: {e}")
+
+
+def run_paths(folder_path):
+    """
+    Output locations for a .raw folder, creating the output directories.
+
+    Returns:
+        (fulldata, fulloutdata, fulloutCSVdata): the raw data path and the
+        prefixes used for per-well .raw and CSV outputs
+    """
+    outdata = os.path.basename(os.path.normpath(folder_path))[0:-4]
+    outdir = os.path.join(folder_path, 'outputs')
+    csvoutdir = os.path.join(folder_path, 'CSVoutputs')
+    os.makedirs(outdir, exist_ok=True)
+    os.makedirs(csvoutdir, exist_ok=True)
+    return os.path.join(folder_path), os.path.join(outdir, outdata), os.path.join(csvoutdir, outdata)
+
+
+def load_run_info(folder_path, fulloutdata=None):
+    """
+    Read the well list written by the acquisition app.
+
+    Tries run_info.json first and falls back to the legacy selected_wells.txt.
+    If fulloutdata is given the plate configuration is copied next to the
+    outputs for the viewer.
+
+    Returns:
+        (WellList, run_info_data): WellList keeps the legacy
+        ['Selected', 'Wells:', ...] layout; run_info_data is None for legacy runs
+    """
+    run_info_file = os.path.join(folder_path, 'run_info.json')
+    legacy_wells_file = os.path.join(folder_path, 'selected_wells.txt')
+
+    if os.path.exists(run_info_file):
+        try:
+            with open(run_info_file, 'r') as f:
+                run_info_data = json.load(f)
+            WellList = ['Selected', 'Wells:'] + run_info_data['selected_wells']  # Maintain legacy format
+            print(f"Loaded run info: {run_info_data['plate_type']} plate with {run_info_data['total_wells']} wells")
+
+            if fulloutdata is not None:
+                # Save plate configuration to output directory for the processing app
+                config_output_file = f'{fulloutdata}_plate_config.json'
+                with open(config_output_file, 'w') as f:
+                    json.dump(run_info_data, f, indent=2)
+                print(f"Plate configuration saved to: {config_output_file}")
+            return WellList, run_info_data
+        except Exception as e:
+            print(f"Error loading run_info.json: {e}, falling back to legacy format")
+
+    if os.path.exists(legacy_wells_file):
+        WellList = open(legacy_wells_file).read().split()
+        print("Using legacy selected_wells.txt format")
+        return WellList, None
+
+    raise FileNotFoundError("Neither run_info.json nor selected_wells.txt found in data directory")
+
+
+def create_extraction_pool(settings, max_workers=None):
+    """Create a maldichrom worker pool from processing settings"""
+    return MaldichromPool(
+        max_workers=max_workers or settings.get('extraction_workers'),
+        command=settings.get('maldichrom_command'),
+        cwd=settings.get('maldichrom_cwd'),
+        timeout=settings.get('extraction_timeout', DEFAULT_EXTRACTION_TIMEOUT)
+    )
+
+
+class RunConverter:
+    """
+    Convert one HT-DESI run into per-well CSVs and/or a plate cube, without any GUI.
+
+    The conversion can be driven in one go with run(), or incrementally
+    (start, process for each batch of finished wells, finish) while the run
+    is still acquiring.
+
+    Args:
+        fulldata: Path of the .raw folder
+        WellList: Well IDs in acquisition order, in the legacy
+            ['Selected', 'Wells:', ...] layout
+        fulloutdata: Prefix for per-well .raw outputs and run-level files
+        fulloutCSVdata: Prefix for per-well CSVs and the plate cube
+        settings: Processing settings, see DEFAULT_PROCESSING_SETTINGS
+        run_info: Contents of run_info.json, stored in the summary and cube
+        force: Reprocess wells even if their outputs are up to date
+        log: Called with detail messages
+        status: Called with short status messages
+        timing: Called with (stage timings, wells converted) after each well
+    """
+
+    def __init__(self, fulldata, WellList, fulloutdata, fulloutCSVdata, settings=None,
+                 run_info=None, force=False, log=print, status=None, timing=None):
+        self.fulldata = fulldata
+        self.WellList = WellList
+        self.fulloutdata = fulloutdata
+        self.fulloutCSVdata = fulloutCSVdata
+        self.settings = dict(DEFAULT_PROCESSING_SETTINGS)
+        self.settings.update(settings or {})
+        self.run_info = run_info
+        self.force = force
+        self.log = log
+        self.status = status or log
+        self.timing = timing
+        self.timer = StageTimer()
+        self.cancelled = False
+        self.pool = None
+        self.previous_cube = None
+        self.outdata = os.path.basename(fulloutdata)
+        self.outdir = os.path.dirname(fulloutdata)
+        self.completed = {}
+        self.scan_counts = {}
+        self.handled_positions = set()
+        self.scan_ranges = {}  # Y position -> (start, end) it was converted from
+        self.summary_file = None
+
+    def cancel(self):
+        self.cancelled = True
+        if self.pool is not None:
+            self.pool.cancel()
+
+    def run(self):
+        """
+        Convert the whole run.
+
+        Returns:
+            bool: False if the conversion was cancelled
+        """
+        self.status("Loading data file...")
+        self.log(f"Processing raw data file: {os.path.basename(self.fulldata)}")
+        with self.timer.stage('reader_open'):
+            reader = open_reader(self.fulldata)
+        self.start(reader)
+
+        self.status("Analyzing well positions...")
+        segmentation = self.segment(reader)
+        self.process(self.build_jobs(segmentation), reader)
+        if self.cancelled:
+            return False
+        self.finish()
+        return True
+
+    def start(self, reader):
+        """Read the run header and set up the manifest and outputs"""
+        with self.timer.stage('reader_open'):
+            scans = reader.getTotalScans()
+            self.massRange = reader.getMassRange()
+        self.log(f"Data contains: {scans} scans")
+        self.log(f"Mass range: {self.massRange[0]} to {self.massRange[1]}")
+
+        # Initialize processing summary
+        self.processing_summary = {
+            'processed_wells': [],
+            'processing_timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'total_scans': scans,
+            'mass_range': self.massRange
+        }
+        if self.run_info:
+            self.processing_summary['original_run_info'] = self.run_info
+            self.log(f"Processing data from {self.run_info['plate_type']} plate")
+
+        # Per-well CSVs and/or one binary plate cube for the whole run
+        output_format = self.settings.get('output_format', 'csv')
+        self.write_csv = output_format in ('csv', 'both')
+        self.cube_writer = None
+        if output_format in ('cube', 'both'):
+            cube_metadata = {'run_name': self.outdata, 'mass_range': list(self.massRange)}
+            if self.run_info:
+                cube_metadata['run_info'] = self.run_info
+            self.cube_writer = PlateCubeWriter(self.massRange, bin_width=self.settings.get('bin_width', 0.01),
+                                               metadata=cube_metadata)
+
+        # Wells already converted with the same settings are skipped unless forced
+        self.manifest = ProcessingManifest(manifest_path(self.outdir, self.outdata),
+                                           settings={key: self.settings.get(key) for key in OUTPUT_SETTINGS})
+        if self.force:
+            self.log("Reprocessing all wells")
+            self.manifest.reset()
+        self.required_outputs = ['csv'] if self.write_csv else ['cube']
+
+    def segment(self, reader, use_index=True):
+        """Get well scan ranges, reusing the cached scan index if the raw files haven't changed"""
+        with self.timer.stage('segmentation'):
+            index = load_scan_index(self.fulldata) if use_index else None
+        if index is not None:
+            self.log("Using cached scan index")
+            segmentation = index.segmentation
+        else:
+            with self.timer.stage('coordinate_fetch'):
+                scans = reader.getTotalScans()
+                X, Y, points = reader.getXYCoordinates()
+            with self.timer.stage('segmentation'):
+                segmentation = segment_wells(Y, scans)
+                if use_index:
+                    save_scan_index(self.fulldata, X, Y, segmentation)
+        self.processing_summary['total_scans'] = segmentation.total_scans
+        self.log(f"Number of unique Y positions: {len(segmentation)}")
+        return segmentation
+
+    def build_jobs(self, segmentation, positions=None):
+        """
+        Create extraction jobs for Y positions 0, 1, 2... (or only the given
+        positions), mapping each position to its well ID.
+        """
+        if positions is None:
+            positions = range(len(segmentation))
+        jobs = []
+        for x in positions:
+            self.handled_positions.add(x)
+            if x + 2 < len(self.WellList):
+                Rwell = self.WellList[x+2]
+
+                # Get scan range for this well
+                well_scans = segmentation.get(x)
+
+                if well_scans is not None:
+                    start, end, n_scans = well_scans
+                    self.scan_counts[Rwell] = n_scans
+                    self.scan_ranges[x] = (start, end)
+                    jobs.append(ExtractionJob(
+                        Rwell, start, end, self.fulldata,
+                        f'{self.fulloutdata}_{Rwell}.raw',
+                        f'{self.fulloutdata}_{Rwell}_scans.txt'
+                    ))
+                else:
+                    self.log(f"  No data found for well {Rwell}")
+            else:
+                self.log(f"Warning: More Y positions than well IDs. Skipping position {x}")
+        return jobs
+
+    def outdated_positions(self, segmentation, positions):
+        """
+        Positions that have not been converted yet, or were converted from a
+        scan range that has since changed (a well logged as finished before
+        its last scans reached the file).
+        """
+        outdated = []
+        for x in positions:
+            if x not in self.handled_positions:
+                outdated.append(x)
+            elif x in self.scan_ranges:
+                well_scans = segmentation.get(x)
+                if well_scans is not None and well_scans[:2] != self.scan_ranges[x]:
+                    outdated.append(x)
+        return outdated
+
+    def process(self, jobs, reader):
+        """Extract and write the given wells, skipping ones that are already up to date"""
+        reused = []
+        pending = []
+        for job in jobs:
+            if self.manifest.is_complete(job.well_id, job.start, job.end, self.required_outputs):
+                reused.append(job)
+            else:
+                pending.append(job)
+        if reused:
+            self.log(f"Skipping {len(reused)} wells with up-to-date outputs")
+        for job in reused:
+            output_files = {kind: self.manifest.output_path(job.well_id, kind) for kind in self.required_outputs}
+            if self.cube_writer is not None:
+                with self.timer.stage('reuse'):
+                    masses, intens = self.load_previous_spectrum(job.well_id)
+                    self.cube_writer.add_well(job.well_id, masses, intens)
+                output_files['cube'] = plate_cube_path(self.fulloutCSVdata)
+            self.add_completed(job, output_files, reused=True)
+
+        if self.settings.get('extraction_mode') == 'direct':
+            extracted = self.extract_direct(reader, pending)
+        else:
+            extracted = self.extract_with_maldichrom(pending)
+
+        # Time spent waiting on the extraction generator counts as extraction;
+        # with parallel maldichrom workers this is less than the summed per-well times
+        waiting = time.perf_counter()
+        for n_done, (job, masses, intens) in enumerate(extracted, 1):
+            self.timer.add('extraction', time.perf_counter() - waiting)
+            if self.cancelled:
+                return
+            self.status(f"Processed {n_done} of {len(pending)} wells...")
+            if masses is None:
+                waiting = time.perf_counter()
+                continue
+
+            output_files = {}
+            write_started = time.perf_counter()
+            if self.write_csv:
+                self.log(f"Converting well {job.well_id} (scans {job.start} to {job.end}) to CSV format")
+                csv_out = self.spectrum_to_csv(masses, intens, f'{self.fulloutCSVdata}_{job.well_id}.csv')
+                output_files['csv'] = csv_out
+                self.manifest.record(job.well_id, job.start, job.end, self.scan_counts[job.well_id],
+                                     {'csv': csv_out})
+            if self.cube_writer is not None:
+                self.cube_writer.add_well(job.well_id, masses, intens)
+                output_files['cube'] = plate_cube_path(self.fulloutCSVdata)
+            finished = time.perf_counter()
+            self.timer.add('write', finished - write_started)
+            self.log(f"  Well {job.well_id} processing complete")
+
+            if job.raw_out is not None:
+                output_files['raw'] = job.raw_out
+            self.add_completed(job, output_files, timings={
+                'extraction': round(job.elapsed, 4),
+                'write': round(finished - write_started, 4),
+                'wall': round(finished - job.started, 4)
+            })
+            if self.timing is not None:
+                self.timing(self.timer.to_dict(), len(self.completed))
+            waiting = time.perf_counter()
+
+    def add_completed(self, job, output_files, reused=False, timings=None):
+        entry = {
+            'well_id': job.well_id,
+            'scan_range': {'start': job.start, 'end': job.end, 'n_scans': self.scan_counts[job.well_id]},
+            'output_files': output_files
+        }
+        if reused:
+            entry['reused'] = True
+        if timings:
+            entry['timings'] = timings
+        self.completed[job.well_id] = (job, entry)
+
+    def finish(self):
+        """Write the plate cube and processing summary, returning the summary path"""
+        # Add to processing summary in plate order
+        finished = sorted(self.completed.values(), key=lambda item: item[0].start)
+        self.processing_summary['processed_wells'] = [entry for job, entry in finished]
+
+        if self.cube_writer is not None:
+            self.status("Saving plate cube...")
+            with self.timer.stage('cube_save'):
+                cube_file = self.cube_writer.save(plate_cube_path(self.fulloutCSVdata))
+            self.processing_summary['plate_cube'] = cube_file
+            self.log(f"Plate cube saved to: {cube_file}")
+            self.manifest.record_shared_output(
+                {job.well_id: (job.start, job.end, self.scan_counts[job.well_id]) for job, entry in finished},
+                'cube', cube_file
+            )
+
+        # Save processing summary
+        self.status("Saving processing summary...")
+        self.processing_summary['timings'] = self.timer.to_dict()
+        if self.timing is not None:
+            self.timing(self.processing_summary['timings'], len(self.completed))
+        self.log(f"Stage timings (s): {self.processing_summary['timings']}")
+        summary_file = os.path.join(self.outdir, f'{self.outdata}_processing_summary.json')
+        with open(summary_file, 'w') as f:
+            json.dump(self.processing_summary, f, indent=2)
+        self.log(f"Processing summary saved to: {summary_file}")
+        self.summary_file = summary_file
+        return summary_file
+
+    def spectrum_to_csv(self, masses, intens, output_csv):
+        """Write a mass/intensity spectrum as a two-column CSV, returning the path written"""
+        return write_spectrum_csv(
+            output_csv, masses, intens,
+            precision=self.settings.get('csv_precision'),
+            drop_zeros=self.settings.get('csv_drop_zeros', False),
+            compress=self.settings.get('csv_gzip', False)
+        )
+
+    def load_previous_spectrum(self, well_id):
+        """Read back a skipped well's spectrum from its CSV, or from the previous plate cube"""
+        csv_file = self.manifest.output_path(well_id, 'csv')
+        if csv_file:
+            data = np.loadtxt(csv_file, delimiter=',', ndmin=2)
+            return data[:, 0], data[:, 1]
+        if self.previous_cube is None:
+            self.previous_cube = load_plate_cube(self.manifest.output_path(well_id, 'cube'))
+        return self.previous_cube.spectrum(well_id)
+
+    def extract_with_maldichrom(self, jobs):
+        """
+        Write each well to its own .raw with maldichrom and read the combined
+        spectrum back, yielding (job, masses, intensities) as wells finish.
+        """
+        if not jobs:
+            return
+        self.pool = create_extraction_pool(self.settings)
+        self.log(f"Running {len(jobs)} maldichrom extractions, {self.pool.max_workers} at a time")
+        for job in self.pool.run(jobs):
+            if not job.succeeded:
+                self.log(f"  Well {job.well_id} extraction failed: {job.error}")
+                yield job, None, None
+                continue
+            try:
+                readback_started = time.perf_counter()
+                well_reader = open_reader(job.raw_out)
+                masses, intens, npoints = well_reader.getCombinedScans(1, 1, 0, 0)
+                job.elapsed += time.perf_counter() - readback_started
+            except Exception as e:
+                self.log(f"  Error reading {job.raw_out}: {str(e)}")
+                yield job, None, None
+                continue
+            yield job, masses, intens
+
+    def extract_direct(self, reader, jobs):
+        """
+        Sum each well's scans from the already open reader into a binned
+        spectrum, skipping the intermediate .raw files. Zero bins are dropped.
+        """
+        if not jobs:
+            return
+        bin_width = self.settings.get('bin_width', 0.01)
+        extractor = CombinedSpectrumExtractor(WatersScanSource(reader), bin_width=bin_width,
+                                              mass_range=self.massRange)
+        self.log(f"Extracting {len(jobs)} wells in-process ({bin_width} m/z bins)")
+        for job in jobs:
+            job.raw_out = None
+        started = time.perf_counter()
+        for job, binned in extractor.extract_wells(jobs, lambda: self.cancelled):
+            nonzero = np.flatnonzero(binned)
+            job.started = started
+            job.elapsed = time.perf_counter() - started
+            yield job, extractor.mz_axis[nonzero], binned[nonzero]
+            started = time.perf_counter()
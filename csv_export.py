@@ -0,0 +1,64 @@
+import gzip
+import numpy as np
+
+ROWS_PER_BLOCK = 200000
+
+
+def format_column(values, precision=None):
+    """
+    Format a numeric column as a list of strings.
+
+    Args:
+        values: Array of numbers
+        precision: Decimal places to write, or None to keep full precision
+    """
+    values = np.asarray(values)
+    if precision is not None:
+        return list(map(f'{{:.{int(precision)}f}}'.format, values.tolist()))
+    if values.dtype == np.float32:
+        # Shortest repr that round-trips as float32, same as str(np.float32)
+        return values.astype(str).tolist()
+    return list(map(str, values.tolist()))
+
+
+def write_spectrum_csv(output_csv, masses, intens, precision=None, drop_zeros=False, compress=False):
+    """
+    Write a mass/intensity spectrum as a two-column CSV in one buffered write.
+
+    The output matches the per-row csv.writer format (no header, full float
+    precision by default) but the formatting is done on whole arrays.
+
+    Args:
+        output_csv: Output path; '.gz' is appended when compress is True
+        masses: m/z values
+        intens: Intensities, same length as masses
+        precision: Decimal places for both columns, or None for full precision
+        drop_zeros: Leave out points with zero intensity
+        compress: Write gzip-compressed output
+
+    Returns:
+        str: Path of the file written
+    """
+    masses = np.asarray(masses)
+    intens = np.asarray(intens)
+    if drop_zeros:
+        nonzero = intens != 0
+        masses = masses[nonzero]
+        intens = intens[nonzero]
+
+    if compress:
+        if not output_csv.endswith('.gz'):
+            output_csv += '.gz'
+        csvfile = gzip.open(output_csv, 'wt', newline='')
+    else:
+        csvfile = open(output_csv, 'w', newline='')
+
+    with csvfile:
+        # Format and write in blocks so very long spectra don't build one huge string
+        for first in range(0, len(masses), ROWS_PER_BLOCK):
+            block = slice(first, first + ROWS_PER_BLOCK)
+            rows = map(','.join, zip(format_column(masses[block], precision),
+                                     format_column(intens[block], precision)))
+            # csv.writer terminates every row with \r\n, including the last
+            csvfile.write('\r\n'.join(rows) + '\r\n')
+    return output_csv
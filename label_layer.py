@@ -0,0 +1,166 @@
+import numpy as np
+from matplotlib.ticker import Locator, FuncFormatter
+
+# Label box estimate, in multiples of the font size
+CHAR_WIDTH = 0.65
+LINE_HEIGHT = 1.2
+
+
+def cull_labels(left, bottom, width, height, order=None):
+    """
+    Greedy collision culling: labels are taken in order and kept unless their
+    box overlaps one already kept. Kept boxes are filed in a grid of cells as
+    large as the largest box, so each box touches at most 4 cells and only
+    the boxes in those cells are tested.
+
+    Args:
+        left, bottom, width, height: Label boxes, in pixels
+        order: Indices in priority order, defaults to input order
+
+    Returns:
+        Indices of the kept labels
+    """
+    left = np.asarray(left, dtype=np.float64)
+    bottom = np.asarray(bottom, dtype=np.float64)
+    right = left + np.asarray(width, dtype=np.float64)
+    top = bottom + np.asarray(height, dtype=np.float64)
+    if not len(left):
+        return np.empty(0, dtype=np.int64)
+    cell_w = max(float(np.max(right - left)), 1.0)
+    cell_h = max(float(np.max(top - bottom)), 1.0)
+    col0 = np.floor(left / cell_w).astype(np.int64).tolist()
+    col1 = np.floor(right / cell_w).astype(np.int64).tolist()
+    row0 = np.floor(bottom / cell_h).astype(np.int64).tolist()
+    row1 = np.floor(top / cell_h).astype(np.int64).tolist()
+    left, right, bottom, top = left.tolist(), right.tolist(), bottom.tolist(), top.tolist()
+
+    grid = {}
+    kept = []
+    for i in (range(len(left)) if order is None else order):
+        cells = [(col, row) for col in range(col0[i], col1[i] + 1) for row in range(row0[i], row1[i] + 1)]
+        if any(left[i] < right[j] and left[j] < right[i] and bottom[i] < top[j] and bottom[j] < top[i]
+               for cell in cells for j in grid.get(cell, ())):
+            continue
+        for cell in cells:
+            grid.setdefault(cell, []).append(i)
+        kept.append(i)
+    return np.array(kept, dtype=np.int64)
+
+
+class PointLabels:
+    """
+    Text labels next to scatter points, drawn only where they fit.
+
+    On every change of the view (zoom, pan, resize) the points inside the axes
+    are ranked by priority and culled with cull_labels, and only the survivors
+    get a text artist. The number of labels drawn is bounded by the axes area,
+    not the number of points, and zooming in reveals the labels hidden at the
+    wider view.
+
+    Args:
+        ax: Axes holding the points
+        x, y: Point positions in data coordinates
+        labels: One string per point
+        priority: Higher is labelled first, defaults to input order
+        fontsize: Label size in points
+        offset: Label offset from its point, in points
+    """
+
+    def __init__(self, ax, x, y, labels, priority=None, fontsize=8, offset=(5, 5), **text_kwargs):
+        self.ax = ax
+        self.xy = np.column_stack([np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)])
+        self.labels = [str(label) for label in labels]
+        self.order = (np.arange(len(self.labels)) if priority is None
+                      else np.argsort(-np.asarray(priority, dtype=np.float64), kind='stable'))
+        self.fontsize = fontsize
+        self.offset = offset
+        self.text_kwargs = text_kwargs
+        self.texts = []
+        self._view = None
+        self._axes_callbacks = [ax.callbacks.connect('xlim_changed', self.refresh),
+                                ax.callbacks.connect('ylim_changed', self.refresh)]
+        self._resize_callback = ax.figure.canvas.mpl_connect('resize_event', self.refresh)
+        self.refresh()
+
+    def refresh(self, *args):
+        view = (self.ax.get_xlim(), self.ax.get_ylim(), tuple(self.ax.bbox.bounds))
+        if view == self._view:
+            return
+        self._view = view
+        for text in self.texts:
+            text.remove()
+        self.texts = []
+        if not len(self.labels):
+            return
+
+        # Boxes in pixels, estimated from the character count
+        to_pixels = self.ax.figure.dpi / 72
+        display = self.ax.transData.transform(self.xy)
+        x0, y0, width, height = self.ax.bbox.bounds
+        order = self.order[np.isfinite(display[self.order]).all(axis=1)]
+        px, py = display[order, 0], display[order, 1]
+        order = order[(px >= x0) & (px <= x0 + width) & (py >= y0) & (py <= y0 + height)]
+        lengths = np.array([len(self.labels[i]) for i in order], dtype=np.float64)
+        box_w = lengths * CHAR_WIDTH * self.fontsize * to_pixels
+        box_h = np.full(len(order), LINE_HEIGHT * self.fontsize * to_pixels)
+        kept = cull_labels(display[order, 0] + self.offset[0] * to_pixels,
+                           display[order, 1] + self.offset[1] * to_pixels, box_w, box_h)
+
+        for i in order[kept]:
+            self.texts.append(self.ax.annotate(self.labels[i], self.xy[i], xytext=self.offset,
+                                               textcoords='offset points', fontsize=self.fontsize,
+                                               **self.text_kwargs))
+        self.ax.figure.canvas.draw_idle()
+
+    def remove(self):
+        """Remove the labels and stop following the view"""
+        for callback in self._axes_callbacks:
+            self.ax.callbacks.disconnect(callback)
+        self.ax.figure.canvas.mpl_disconnect(self._resize_callback)
+        for text in self.texts:
+            text.remove()
+        self.texts = []
+
+
+class IndexLabelLocator(Locator):
+    """
+    Ticks at integer positions 0..n-1 (one per bar), thinned to the ones whose
+    labels fit: the visible axis is split into cells one label high and a tick
+    is kept every so many positions that each label gets its own cell. As a
+    Locator it is re-run on every zoom, so zooming in brings labels back.
+
+    Args:
+        n: Number of positions
+        fontsize: Tick label size in points
+    """
+
+    def __init__(self, n, fontsize):
+        self.n = n
+        self.fontsize = fontsize
+
+    def __call__(self):
+        vmin, vmax = sorted(self.axis.get_view_interval())
+        return self.tick_values(vmin, vmax)
+
+    def tick_values(self, vmin, vmax):
+        first = max(int(np.ceil(vmin)), 0)
+        last = min(int(np.floor(vmax)), self.n - 1)
+        if last < first:
+            return np.empty(0)
+        axes = self.axis.axes
+        length = axes.bbox.height if self.axis.axis_name == 'y' else axes.bbox.width
+        per_position = length / max(vmax - vmin, 1e-12)
+        label = LINE_HEIGHT * self.fontsize * axes.figure.dpi / 72
+        stride = max(1, int(np.ceil(label / max(per_position, 1e-12))))
+        # Multiples of the stride, so ticks don't shift while panning
+        return np.arange(int(np.ceil(first / stride)) * stride, last + 1, stride, dtype=np.float64)
+
+
+def index_label_formatter(labels):
+    """Tick formatter showing labels[i] at position i"""
+    labels = [str(label) for label in labels]
+
+    def format_label(value, pos=None):
+        i = int(round(value))
+        return labels[i] if abs(value - i) < 1e-6 and 0 <= i < len(labels) else ''
+    return FuncFormatter(format_label)
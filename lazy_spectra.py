@@ -0,0 +1,144 @@
+from collections import OrderedDict
+import numpy as np
+from spectrum_loader import read_spectrum_csv, load_spectra
+from plate_cube import load_plate_cube_header, PlateCubeRows, WELLS_PER_CHUNK
+from range_index import RangeIndex
+
+# Full-resolution spectra kept in memory at once
+DEFAULT_MAX_CACHED_WELLS = 32
+# Resolution of the average spectrum and the range index
+SUMMARY_BIN_WIDTH = 0.01
+
+
+def summarize_spectrum(mz, intensity, bin_width=SUMMARY_BIN_WIDTH):
+    """
+    Reduce a spectrum to occupied m/z bins.
+
+    Returns:
+        (keys, sums, counts): bin number floor(mz / bin_width) of every
+        occupied bin, with the summed intensity and number of points in it
+    """
+    mz = np.asarray(mz, dtype=np.float64)
+    intensity = np.asarray(intensity, dtype=np.float64)
+    bins = np.floor(mz / bin_width).astype(np.int64)
+    keys, inverse = np.unique(bins, return_inverse=True)
+    sums = np.bincount(inverse, weights=intensity, minlength=len(keys))
+    counts = np.bincount(inverse, minlength=len(keys))
+    return keys, sums, counts
+
+
+def read_spectrum_summary(path, bin_width=SUMMARY_BIN_WIDTH):
+    """Parse a CSV and return only its summary, so worker pools don't ship full spectra back"""
+    return summarize_spectrum(*read_spectrum_csv(path), bin_width=bin_width)
+
+
+class LazySpectra:
+    """
+    Well spectra for very large plates, loaded on demand.
+
+    Opening keeps only a compact summary per well: the bins it occupies at
+    SUMMARY_BIN_WIDTH with prefix sums of intensity and point counts, from
+    which SpectrumEngine.from_lazy builds the engine. Full-resolution spectra
+    are read when a well is accessed and held in an LRU cache of
+    max_cached_wells wells.
+
+    Behaves like the viewer's dictionary of (mz, intensity) spectra (keys, in,
+    [], items), so code that iterates over every well still works, one well
+    at a time.
+
+    Args:
+        well_ids: Wells in display order
+        loader: Called with a well ID, returns (mz, intensity)
+        summaries: Dictionary of well ID to (keys, sums, counts)
+        max_cached_wells: Size of the full-spectrum LRU cache
+    """
+
+    def __init__(self, well_ids, loader, summaries, max_cached_wells=DEFAULT_MAX_CACHED_WELLS,
+                 bin_width=SUMMARY_BIN_WIDTH):
+        self.well_ids = [well for well in well_ids if well in summaries]
+        self.loader = loader
+        self.bin_width = bin_width
+        self.max_cached_wells = max_cached_wells
+        self._cache = OrderedDict()
+
+        # Prefix index over the bins, each placed at its lower edge
+        self.index = RangeIndex(self.well_ids, [
+            (np.asarray(summaries[well][0]) * bin_width, summaries[well][1], summaries[well][2])
+            for well in self.well_ids
+        ])
+        # Integer bin numbers for the average, well i spans index.offsets[i]:index.offsets[i+1]
+        self.bin_keys = (np.concatenate([np.asarray(summaries[well][0], dtype=np.int32) for well in self.well_ids])
+                         if self.well_ids else np.zeros(0, dtype=np.int32))
+        self._rows = {well: i for i, well in enumerate(self.well_ids)}
+
+    # Mapping interface
+
+    def keys(self):
+        return list(self.well_ids)
+
+    def __len__(self):
+        return len(self.well_ids)
+
+    def __iter__(self):
+        return iter(self.well_ids)
+
+    def __contains__(self, well):
+        return well in self._rows
+
+    def __bool__(self):
+        return bool(self.well_ids)
+
+    def __getitem__(self, well):
+        """Full-resolution (mz, intensity), read on demand"""
+        if well not in self._rows:
+            raise KeyError(well)
+        if well in self._cache:
+            self._cache.move_to_end(well)
+            mz, intensity = self._cache[well]
+        else:
+            mz, intensity = self.loader(well)
+            mz = np.asarray(mz, dtype=np.float64)
+            intensity = np.asarray(intensity, dtype=np.float64)
+            self._cache[well] = (mz, intensity)
+            while len(self._cache) > self.max_cached_wells:
+                self._cache.popitem(last=False)
+        return mz, intensity
+
+    def items(self):
+        for well in self.well_ids:
+            yield well, self[well]
+
+    def values(self):
+        for well in self.well_ids:
+            yield self[well]
+
+
+def open_lazy_csv_folder(files, max_cached_wells=DEFAULT_MAX_CACHED_WELLS, progress=None, is_cancelled=None):
+    """
+    Summarize per-well CSVs on a worker pool and return a LazySpectra that
+    re-reads a CSV when its well is opened.
+
+    Args:
+        files: List of (well_id, path) as from find_spectrum_files
+    """
+    paths = dict(files)
+    summaries = load_spectra(files, reader=read_spectrum_summary, progress=progress, is_cancelled=is_cancelled)
+    return LazySpectra([well for well, path in files], lambda well: read_spectrum_csv(paths[well]),
+                       summaries, max_cached_wells)
+
+
+def open_lazy_plate_cube(path, max_cached_wells=DEFAULT_MAX_CACHED_WELLS):
+    """LazySpectra over a plate cube, inflating one chunk of wells at a time"""
+    mz, well_ids, metadata = load_plate_cube_header(path)
+    wells_per_chunk = metadata.get('wells_per_chunk', WELLS_PER_CHUNK)
+    rows = {well: i for i, well in enumerate(well_ids)}
+    reader = PlateCubeRows(path, wells_per_chunk)
+
+    def load_well(well):
+        row = reader.row(rows[well])
+        nonzero = np.flatnonzero(row)
+        return mz[nonzero], row[nonzero]
+
+    # Rows in order, so the reader inflates each chunk once
+    summaries = {well: summarize_spectrum(*load_well(well)) for well in well_ids}
+    return LazySpectra(well_ids, load_well, summaries, max_cached_wells)
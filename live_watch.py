@@ -0,0 +1,224 @@
+import os
+import json
+import time
+from well_segmentation import extend_segmentation
+from conversion_pipeline import RunConverter, open_reader, close_reader, run_paths, load_run_info
+
+WELL_PROGRESS_FILE = 'well_progress.json'
+
+
+def write_well_progress(raw_path, completed_wells, finished=False):
+    """
+    Record which wells the stage has finished, for the live converter.
+
+    Only written once MassLynx has created the .raw folder, so the folder is
+    never created ahead of the acquisition.
+
+    Args:
+        raw_path: .raw folder being acquired
+        completed_wells: List of {'well_id': ..., 'end_time': ...} in acquisition order
+        finished: True once the run has ended or been stopped
+    """
+    if not os.path.isdir(raw_path):
+        return
+    try:
+        progress = {'completed_wells': completed_wells, 'finished': finished,
+                    'updated': time.strftime('%Y-%m-%d %H:%M:%S')}
+        tmp_path = os.path.join(raw_path, WELL_PROGRESS_FILE + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(progress, f, indent=2)
+        os.replace(tmp_path, os.path.join(raw_path, WELL_PROGRESS_FILE))
+    except Exception as e:
+        print(f"Error writing well progress: {e}")
+
+
+def read_well_progress(raw_path):
+    """Return the acquisition progress, or an empty record if there is none yet"""
+    progress_file = os.path.join(raw_path, WELL_PROGRESS_FILE)
+    try:
+        if os.path.exists(progress_file):
+            with open(progress_file, 'r') as f:
+                return json.load(f)
+    except Exception as e:
+        print(f"Error reading well progress: {e}")
+    return {'completed_wells': [], 'finished': False}
+
+
+def finished_positions(segmentation, progress):
+    """
+    Y positions whose wells are completely written to the .raw file.
+
+    A well is finished once a later Y position shows up in the data, or once
+    the acquisition app has logged its end time. Everything is finished when
+    the run has ended. The end-time log can arrive before MassLynx has flushed
+    the well's last scans, so wells finished that way are checked again by
+    RunConverter.outdated_positions.
+    """
+    positions = sorted(int(round(float(p))) for p in segmentation.positions.tolist())
+    if not positions:
+        return set()
+    if progress.get('finished'):
+        return set(positions)
+    n_logged = len(progress.get('completed_wells', []))
+    return {p for i, p in enumerate(positions) if p < positions[-1] or i < n_logged}
+
+
+class LiveRunWatcher:
+    """
+    Follow a .raw file while it is being acquired and convert each well as
+    soon as it is finished.
+
+    Args:
+        raw_path: .raw folder the AutoLynx queue is writing
+        WellList: Selected well IDs in the legacy ['Selected', 'Wells:', ...] layout
+        settings: Processing settings passed to RunConverter
+        run_info: Run information known at the start of the run
+        poll_interval: Seconds between checks of the growing file
+        startup_timeout: Seconds to wait for the .raw folder to appear
+        log: Called with progress messages
+    """
+
+    def __init__(self, raw_path, WellList, settings=None, run_info=None,
+                 poll_interval=5.0, startup_timeout=600, log=print):
+        self.raw_path = raw_path
+        self.WellList = WellList
+        self.settings = settings
+        self.run_info = run_info
+        self.poll_interval = poll_interval
+        self.startup_timeout = startup_timeout
+        self.log = log
+        self.converter = None
+        self.cancelled = False
+        self.reader = None
+        self.total_scans = 0  # Scans seen by the reader at the last poll
+        self.segmentation = None  # Segmentation of the first n_coordinates scans
+        self.n_coordinates = 0
+
+    def cancel(self):
+        self.cancelled = True
+        if self.converter is not None:
+            self.converter.cancel()
+
+    def run(self):
+        """
+        Poll until the acquisition has finished and every well is converted.
+
+        Returns:
+            str: Path of the processing summary, or None if cancelled or timed out
+        """
+        try:
+            return self._run()
+        finally:
+            self.close()
+
+    def _run(self):
+        waited = 0.0
+        run_ended = False
+        while not self.cancelled:
+            progress = read_well_progress(self.raw_path)
+            if progress.get('finished') and not run_ended:
+                # Give MassLynx a moment to flush the last scans before the final pass
+                run_ended = True
+                time.sleep(self.poll_interval)
+                continue
+            reader, scans = self.refresh_reader()
+            if reader is None:
+                if waited >= self.startup_timeout:
+                    self.log(f"Gave up waiting for {self.raw_path}")
+                    return None
+                waited += self.poll_interval
+                time.sleep(self.poll_interval)
+                continue
+
+            if self.converter is None:
+                fulldata, fulloutdata, fulloutCSVdata = run_paths(self.raw_path)
+                self.converter = RunConverter(fulldata, self.WellList, fulloutdata, fulloutCSVdata,
+                                              settings=self.settings, run_info=self.run_info, log=self.log)
+                self.converter.start(reader)
+                self.log(f"Live conversion started for {os.path.basename(self.raw_path)}")
+
+            if scans > self.total_scans:
+                # Positions only change while acquiring, so don't store an index yet.
+                # The reader only returns the coordinates of the whole file; only the
+                # new ones are segmented and merged into the previous segmentation.
+                with self.converter.timer.stage('coordinate_fetch'):
+                    X, Y, points = reader.getXYCoordinates()
+                with self.converter.timer.stage('segmentation'):
+                    self.segmentation = extend_segmentation(self.segmentation, Y[self.n_coordinates:])
+                    self.n_coordinates = max(self.n_coordinates, len(Y))
+                self.total_scans = scans
+
+            if self.segmentation is not None and len(self.segmentation):
+                new_positions = self.converter.outdated_positions(
+                    self.segmentation, sorted(finished_positions(self.segmentation, progress)))
+                if new_positions:
+                    self.log(f"Converting {len(new_positions)} finished wells")
+                    self.converter.process(self.converter.build_jobs(self.segmentation, new_positions), reader)
+
+            if progress.get('finished') and self.segmentation is not None:
+                return self.finish(reader)
+            time.sleep(self.poll_interval)
+        return None
+
+    def refresh_reader(self):
+        """
+        Keep one reader on the growing .raw. It is re-opened (and the old
+        handle closed) only when it shows no scans beyond the last poll, in
+        case it doesn't see data written after it was opened.
+
+        Returns:
+            (reader, total_scans), or (None, 0) if MassLynx hasn't started writing
+        """
+        if self.reader is not None:
+            try:
+                scans = self.reader.getTotalScans()
+                if scans > self.total_scans:
+                    return self.reader, scans
+            except Exception:
+                pass
+            self.close()
+        reader = self.open_when_ready()
+        if reader is None:
+            return None, 0
+        self.reader = reader
+        return reader, reader.getTotalScans()
+
+    def open_when_ready(self):
+        """Open the growing .raw, or return None if MassLynx hasn't started writing it"""
+        if not os.path.isdir(self.raw_path):
+            return None
+        reader = None
+        try:
+            reader = open_reader(self.raw_path)
+            if reader.getTotalScans() > 0:
+                return reader
+        except Exception:
+            pass
+        if reader is not None:
+            close_reader(reader)
+        return None
+
+    def close(self):
+        """Close the reader on the growing .raw"""
+        if self.reader is not None:
+            close_reader(self.reader)
+            self.reader = None
+
+    def finish(self, reader):
+        # The run has ended, so the final plate information and well index can be stored
+        try:
+            self.converter.WellList, run_info = load_run_info(self.raw_path, self.converter.fulloutdata)
+            if run_info:
+                self.converter.run_info = run_info
+                self.converter.processing_summary['original_run_info'] = run_info
+        except FileNotFoundError:
+            pass
+        segmentation = self.converter.segment(reader)
+        # Wells converted while live are redone if more of their scans arrived
+        # after they were logged as finished
+        remaining = self.converter.outdated_positions(segmentation, range(len(segmentation)))
+        if remaining:
+            self.converter.process(self.converter.build_jobs(segmentation, remaining), reader)
+        summary_file = self.converter.finish()
+        self.log("Live conversion complete")
+        return summary_file
@@ -0,0 +1,144 @@
+import os
+import time
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Arguments are formatted with raw_in, scans and raw_out for each job
+DEFAULT_MALDICHROM_COMMAND = ['C:/HDI/lib/maldichrom.exe', '-d', '{raw_in}', '-p', '{scans}', '-w', '{raw_out}']
+DEFAULT_MALDICHROM_CWD = 'C:/HDI/lib/'
+# Seconds one extraction may run before it is killed and the well marked failed
+DEFAULT_EXTRACTION_TIMEOUT = 600
+
+
+def default_worker_count():
+    """Leave a core free for the acquisition software"""
+    return max(1, min(4, (os.cpu_count() or 2) - 1))
+
+
+def write_series_file(filename, start, end):
+    """Write a maldichrom scan series file covering scans start..end"""
+    with open(filename, 'w') as file:
+        file.write(''.join(f"1\t{i}\n" for i in range(start, end + 1)))
+
+
+class ExtractionJob:
+    """One well to be extracted into its own .raw file"""
+
+    def __init__(self, well_id, start, end, raw_in, raw_out, scans_file):
+        self.well_id = well_id
+        self.start = start
+        self.end = end
+        self.raw_in = raw_in
+        self.raw_out = raw_out
+        self.scans_file = scans_file
+        self.returncode = None
+        self.error = None
+        self.started = None  # time.perf_counter() when extraction began
+        self.elapsed = None  # Seconds spent extracting
+
+    @property
+    def succeeded(self):
+        return self.error is None and self.returncode == 0
+
+
+class MaldichromPool:
+    """
+    Run maldichrom extractions concurrently and report each job once its
+    process has actually exited.
+
+    Args:
+        max_workers: Number of extractions to run at the same time
+        command: Argument list (or shell string) with {raw_in}, {scans} and
+            {raw_out} placeholders. Point this at a stub executable to test
+            without maldichrom.
+        cwd: Working directory for the process
+        timeout: Seconds to wait for a single extraction before killing it,
+            None to wait indefinitely
+    """
+
+    def __init__(self, max_workers=None, command=None, cwd=None, timeout=DEFAULT_EXTRACTION_TIMEOUT):
+        self.max_workers = max_workers or default_worker_count()
+        self.command = command or DEFAULT_MALDICHROM_COMMAND
+        self.cwd = cwd if cwd is not None else (DEFAULT_MALDICHROM_CWD if command is None else None)
+        if self.cwd and not os.path.isdir(self.cwd):
+            self.cwd = None
+        self.timeout = timeout
+        self.cancelled = False
+        self._processes = set()
+        self._lock = threading.Lock()
+
+    def build_command(self, job):
+        values = {'raw_in': job.raw_in, 'scans': job.scans_file, 'raw_out': job.raw_out}
+        if isinstance(self.command, str):
+            return self.command.format(**values)
+        return [arg.format(**values) for arg in self.command]
+
+    def _run_job(self, job):
+        if self.cancelled:
+            job.error = "Cancelled"
+            return job
+        job.started = time.perf_counter()
+        try:
+            write_series_file(job.scans_file, job.start, job.end)
+            process = subprocess.Popen(self.build_command(job), cwd=self.cwd,
+                                       shell=isinstance(self.command, str),
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            with self._lock:
+                self._processes.add(process)
+            try:
+                _, stderr = process.communicate(timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                _, stderr = process.communicate()
+                job.error = f"Timed out after {self.timeout}s"
+            finally:
+                with self._lock:
+                    self._processes.discard(process)
+
+            job.returncode = process.returncode
+            if job.error is None and self.cancelled:
+                job.error = "Cancelled"
+            elif job.error is None and job.returncode != 0:
+                message = stderr.decode(errors='replace').strip() if stderr else ''
+                job.error = f"maldichrom exited with code {job.returncode}" + (f": {message}" if message else '')
+            elif job.error is None and not os.path.exists(job.raw_out):
+                job.error = f"maldichrom did not create {job.raw_out}"
+        except Exception as e:
+            job.error = str(e)
+        finally:
+            job.elapsed = time.perf_counter() - job.started
+            try:
+                if os.path.exists(job.scans_file):
+                    os.remove(job.scans_file)
+            except OSError:
+                pass
+        return job
+
+    def run(self, jobs):
+        """
+        Run all jobs, yielding each one as soon as its process has finished.
+        Failed jobs are yielded too, with job.error set.
+        """
+        self.cancelled = False
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self._run_job, job) for job in jobs]
+            try:
+                for future in as_completed(futures):
+                    yield future.result()
+            finally:
+                # Runs when the consumer stops early as well as on completion
+                for future in futures:
+                    future.cancel()
+                if any(not future.done() for future in futures):
+                    self.cancel()
+
+    def cancel(self):
+        """Stop queued jobs and terminate running extractions"""
+        self.cancelled = True
+        with self._lock:
+            for process in list(self._processes):
+                try:
+                    process.terminate()
+                except OSError:
+                    pass
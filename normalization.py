@@ -0,0 +1,117 @@
+import warnings
+import numpy as np
+from scipy import sparse
+
+# Mode key -> label shown in the viewer
+NORMALIZATION_MODES = {
+    'none': 'Raw Data',
+    'tic': 'TIC',
+    'rms': 'RMS',
+    'max_peak': 'Max Peak',
+    'internal_standard': 'Internal Standard',
+    'median_fold_change': 'Median Fold Change',
+}
+# Window around the internal standard m/z
+INTERNAL_STANDARD_PPM = 20
+# Matrix elements densified at once for median fold change
+MEDIAN_BLOCK_ELEMENTS = 8_000_000
+
+
+def _row_nonzero(matrix):
+    if sparse.issparse(matrix):
+        return np.diff(matrix.indptr)
+    return np.count_nonzero(matrix, axis=1)
+
+
+def _row_max(matrix):
+    if sparse.issparse(matrix):
+        return matrix.max(axis=1).toarray().ravel().astype(np.float64)
+    return matrix.max(axis=1).astype(np.float64) if matrix.shape[1] else np.zeros(matrix.shape[0])
+
+
+def _row_sum_squares(matrix):
+    if sparse.issparse(matrix):
+        return np.asarray(matrix.multiply(matrix).sum(axis=1), dtype=np.float64).ravel()
+    return np.einsum('ij,ij->i', matrix, matrix, dtype=np.float64)
+
+
+def _dense(matrix):
+    return matrix.toarray() if sparse.issparse(matrix) else np.asarray(matrix)
+
+
+def median_fold_change(engine):
+    """
+    Probabilistic quotient: each well's median ratio to the median
+    TIC-normalized spectrum, over bins occupied in at least half of the wells
+
+    Returns:
+        Quotient per well, 1 where a well shares no bins with the reference
+    """
+    matrix = engine.matrix
+    n_wells = matrix.shape[0]
+    tic = np.where(engine.tic > 0, engine.tic, 1.0)
+    if sparse.issparse(matrix):
+        column_counts = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    else:
+        column_counts = np.count_nonzero(matrix, axis=0)
+    columns = np.flatnonzero(column_counts * 2 >= n_wells)
+    quotients = np.ones(n_wells)
+    if not len(columns) or not n_wells:
+        return quotients
+
+    with warnings.catch_warnings():
+        # Empty rows and columns give all-NaN slices, handled below
+        warnings.simplefilter('ignore', RuntimeWarning)
+        # Reference spectrum, a block of columns at a time
+        reference = np.empty(len(columns))
+        step = max(1, MEDIAN_BLOCK_ELEMENTS // n_wells)
+        for start in range(0, len(columns), step):
+            block = _dense(matrix[:, columns[start:start + step]]) / tic[:, None]
+            block[block == 0] = np.nan
+            reference[start:start + step] = np.nanmedian(block, axis=0)
+
+        # Median quotient of each well, a block of rows at a time
+        step = max(1, MEDIAN_BLOCK_ELEMENTS // len(columns))
+        for start in range(0, n_wells, step):
+            block = _dense(matrix[start:start + step][:, columns]) / tic[start:start + step, None]
+            block[block == 0] = np.nan
+            quotients[start:start + step] = np.nanmedian(block / reference, axis=1)
+    return np.where(np.isfinite(quotients) & (quotients > 0), quotients, 1.0)
+
+
+def normalization_scale(engine, mode, standard_mz=None, ppm=INTERNAL_STANDARD_PPM):
+    """
+    Per-well divisor for a normalization mode, computed from the engine's raw
+    data. Nothing is copied; the viewer applies it with engine.set_row_scale.
+
+    Args:
+        engine: SpectrumEngine
+        mode: A key of NORMALIZATION_MODES
+        standard_mz: m/z of the internal standard, for 'internal_standard'
+        ppm: Half-width of the internal standard window
+
+    Returns:
+        Array with one scale per well, or None for 'none'. Wells where the
+        scale is zero or undefined are left unscaled.
+    """
+    if mode == 'none':
+        return None
+    if mode == 'tic':
+        return engine.tic.copy()
+    if mode == 'rms':
+        # Over each well's occupied bins
+        return np.sqrt(_row_sum_squares(engine.matrix) / np.maximum(_row_nonzero(engine.matrix), 1))
+    if mode == 'max_peak':
+        return _row_max(engine.matrix)
+    if mode == 'internal_standard':
+        if standard_mz is None:
+            raise ValueError("Internal standard normalization needs a standard m/z")
+        width = standard_mz * ppm * 1e-6
+        scale = engine.range_means((standard_mz - width, standard_mz + width), raw=True)
+        n_missing = int(np.sum(~(scale > 0)))
+        if n_missing:
+            print(f"Internal standard m/z {standard_mz} not found in {n_missing} wells, left unscaled")
+        return scale
+    if mode == 'median_fold_change':
+        return engine.tic * median_fold_change(engine)
+    raise ValueError(f"Unknown normalization mode: {mode}")
@@ -0,0 +1,107 @@
+import numpy as np
+from scipy import sparse
+
+DEFAULT_COMPONENTS = 2
+# Extra random directions and power iterations of the randomized solver
+PCA_OVERSAMPLES = 10
+PCA_POWER_ITERATIONS = 7
+
+
+class PCAResult:
+    """Scores of each well on the leading components, with the variance they explain"""
+
+    def __init__(self, scores, explained_variance, explained_variance_ratio, wells):
+        self.scores = scores
+        self.explained_variance = explained_variance
+        self.explained_variance_ratio = explained_variance_ratio
+        self.wells = wells
+
+    @property
+    def n_components(self):
+        return self.scores.shape[1]
+
+
+class PCACancelled(Exception):
+    pass
+
+
+def column_stats(X):
+    """Mean and standard deviation (ddof 0, like StandardScaler) of each column, without densifying"""
+    n = X.shape[0]
+    if sparse.issparse(X):
+        mean = np.asarray(X.sum(axis=0), dtype=np.float64).ravel() / n
+        mean_square = np.asarray(X.multiply(X).sum(axis=0), dtype=np.float64).ravel() / n
+    else:
+        mean = X.mean(axis=0, dtype=np.float64)
+        mean_square = np.einsum('ij,ij->j', X, X, dtype=np.float64) / n
+    std = np.sqrt(np.maximum(mean_square - mean ** 2, 0))
+    return mean, std
+
+
+def randomized_pca(X, n_components=DEFAULT_COMPONENTS, standardize=True, wells=None,
+                   n_oversamples=PCA_OVERSAMPLES, n_iter=PCA_POWER_ITERATIONS, random_state=0,
+                   progress=None, is_cancelled=None):
+    """
+    PCA of a wells x bins matrix by randomized SVD (Halko et al.).
+
+    Centering and scaling are applied implicitly inside the matrix products,
+    A = (X - mean) / std, so a CSR X stays sparse and only n x k dense blocks
+    are ever formed. Columns with zero variance are left unscaled, as in
+    StandardScaler.
+
+    Args:
+        X: Dense array or scipy sparse matrix, wells x bins
+        n_components: Number of components to keep, capped at the matrix rank
+        standardize: Scale columns to unit variance before the SVD
+        progress: Called as progress(step, n_steps, message)
+        is_cancelled: Returns True to stop; raises PCACancelled
+
+    Returns:
+        PCAResult
+    """
+    n, m = X.shape
+    n_components = max(1, min(n_components, n, m))
+    k = min(n_components + n_oversamples, n, m)
+    n_steps = n_iter + 3
+
+    def step(i, message):
+        if is_cancelled is not None and is_cancelled():
+            raise PCACancelled()
+        if progress is not None:
+            progress(i, n_steps, message)
+
+    step(0, "Computing column statistics")
+    mean, std = column_stats(X)
+    scale = np.where(std > 0, std, 1.0) if standardize else np.ones(m)
+    shift = mean / scale
+
+    def matmul(B):
+        # A @ B for B of shape m x k
+        return np.asarray(X @ (B / scale[:, None])) - shift @ B
+
+    def rmatmul(C):
+        # A.T @ C for C of shape n x k
+        return (np.asarray(X.T @ C) - np.outer(mean, C.sum(axis=0))) / scale[:, None]
+
+    rng = np.random.default_rng(random_state)
+    Q = matmul(rng.standard_normal((m, k)))
+    for i in range(n_iter):
+        step(i + 1, f"Power iteration {i + 1} of {n_iter}")
+        Q, _ = np.linalg.qr(Q)
+        Q = matmul(rmatmul(Q))
+    Q, _ = np.linalg.qr(Q)
+
+    step(n_iter + 1, "Decomposing")
+    U_small, s, Vt = np.linalg.svd(rmatmul(Q).T, full_matrices=False)
+    U = Q @ U_small[:, :n_components]
+    s = s[:n_components]
+    # Deterministic signs: largest loading of each component positive, as svd_flip
+    signs = np.sign(U[np.argmax(np.abs(U), axis=0), np.arange(n_components)])
+    U *= np.where(signs == 0, 1, signs)
+
+    step(n_iter + 2, "Done")
+    ddof = max(n - 1, 1)
+    explained_variance = s ** 2 / ddof
+    total_variance = np.sum(std ** 2 / scale ** 2) * n / ddof
+    ratio = explained_variance / total_variance if total_variance > 0 else np.zeros(n_components)
+    return PCAResult(U * s, explained_variance, ratio, list(wells) if wells is not None else None)
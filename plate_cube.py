@@ -0,0 +1,156 @@
+import os
+import json
+from collections import OrderedDict
+import numpy as np
+from spectrum_extractor import bin_spectrum
+
+PLATE_CUBE_SUFFIX = '_plate_cube.npz'
+WELLS_PER_CHUNK = 32
+# Inflated chunks kept by PlateCubeRows
+CACHED_CHUNKS = 4
+
+
+def plate_cube_path(output_prefix):
+    """Cube file for a run, e.g. CSVoutputs/<run>_plate_cube.npz"""
+    return f'{output_prefix}{PLATE_CUBE_SUFFIX}'
+
+
+def find_plate_cube(folder):
+    """Return the path of the first plate cube in a folder, or None"""
+    try:
+        for file in sorted(os.listdir(folder)):
+            if file.endswith(PLATE_CUBE_SUFFIX):
+                return os.path.join(folder, file)
+    except OSError:
+        pass
+    return None
+
+
+class PlateCube:
+    """
+    All spectra from one run on a shared m/z axis.
+
+    Attributes:
+        mz: Shared m/z axis (bin centres)
+        intensity: float32 matrix, one row per well
+        well_ids: Well ID for each row
+        metadata: Plate metadata (run_info.json contents plus binning)
+    """
+
+    def __init__(self, mz, intensity, well_ids, metadata):
+        self.mz = mz
+        self.intensity = intensity
+        self.well_ids = list(well_ids)
+        self.metadata = metadata
+        self.rows = {well: i for i, well in enumerate(self.well_ids)}
+
+    def spectrum(self, well_id, drop_zeros=True):
+        """Return (masses, intensities) for one well"""
+        row = self.intensity[self.rows[well_id]]
+        if drop_zeros:
+            nonzero = np.flatnonzero(row)
+            return self.mz[nonzero], row[nonzero]
+        return self.mz, row
+
+
+class PlateCubeWriter:
+    """
+    Collect well spectra onto a shared m/z axis and save them as one
+    compressed container.
+
+    Spectra are summed into bins of bin_width, so spectra from maldichrom and
+    from the in-process extractor (which already uses this binning) both fit.
+    Rows are stored in chunks of WELLS_PER_CHUNK wells, so a reader can pull a
+    subset of wells without inflating the whole matrix.
+    """
+
+    def __init__(self, mass_range, bin_width=0.01, metadata=None):
+        self.bin_width = float(bin_width)
+        self.mz_min = float(mass_range[0])
+        self.n_bins = int(np.ceil((float(mass_range[1]) - self.mz_min) / self.bin_width)) + 1
+        self.mz = self.mz_min + (np.arange(self.n_bins) + 0.5) * self.bin_width
+        self.metadata = dict(metadata or {})
+        self.well_ids = []
+        self.rows = []
+        self._row_of = {}
+
+    def add_well(self, well_id, masses, intens):
+        """Add a well's spectrum, replacing it if the well was added before"""
+        row = bin_spectrum(masses, intens, self.mz_min, self.bin_width, self.n_bins)
+        if well_id in self._row_of:
+            self.rows[self._row_of[well_id]] = row
+            return
+        self._row_of[well_id] = len(self.well_ids)
+        self.well_ids.append(well_id)
+        self.rows.append(row)
+
+    def save(self, path):
+        metadata = dict(self.metadata)
+        metadata.update({'bin_width': self.bin_width, 'n_wells': len(self.well_ids),
+                         'wells_per_chunk': WELLS_PER_CHUNK})
+        arrays = {
+            'mz': self.mz,
+            'well_ids': np.array(self.well_ids, dtype=str),
+            'metadata': np.array(json.dumps(metadata))
+        }
+        for chunk, first in enumerate(range(0, len(self.rows), WELLS_PER_CHUNK)):
+            rows = self.rows[first:first + WELLS_PER_CHUNK]
+            arrays[f'intensity_{chunk:04d}'] = np.vstack(rows).astype(np.float32)
+        # Write to a temporary file first so a half-written cube is never picked up
+        tmp_path = path + '.tmp.npz'
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+        return path
+
+
+def load_plate_cube(path):
+    """Read a plate cube written by PlateCubeWriter"""
+    with np.load(path, allow_pickle=False) as cube:
+        mz = cube['mz']
+        well_ids = cube['well_ids'].tolist()
+        metadata = json.loads(str(cube['metadata']))
+        chunks = sorted(name for name in cube.files if name.startswith('intensity_'))
+        if chunks:
+            intensity = np.vstack([cube[name] for name in chunks])
+        else:
+            intensity = np.zeros((0, len(mz)), dtype=np.float32)
+    return PlateCube(mz, intensity, well_ids, metadata)
+
+
+def load_plate_cube_header(path):
+    """Read the m/z axis, well IDs and metadata of a plate cube, without the intensities"""
+    with np.load(path, allow_pickle=False) as cube:
+        return cube['mz'], cube['well_ids'].tolist(), json.loads(str(cube['metadata']))
+
+
+class PlateCubeRows:
+    """
+    Single rows of a plate cube, read through a small LRU cache of inflated
+    chunks, so reading the wells of a chunk one by one inflates it once.
+
+    Args:
+        path: Plate cube file
+        wells_per_chunk: Rows per stored chunk, from the cube metadata
+        cached_chunks: Number of inflated chunks to keep
+    """
+
+    def __init__(self, path, wells_per_chunk=WELLS_PER_CHUNK, cached_chunks=CACHED_CHUNKS):
+        self.path = path
+        self.wells_per_chunk = wells_per_chunk
+        self.cached_chunks = cached_chunks
+        self._chunks = OrderedDict()
+
+    def chunk(self, chunk):
+        if chunk in self._chunks:
+            self._chunks.move_to_end(chunk)
+            return self._chunks[chunk]
+        with np.load(self.path, allow_pickle=False) as cube:
+            rows = cube[f'intensity_{chunk:04d}']
+        self._chunks[chunk] = rows
+        while len(self._chunks) > self.cached_chunks:
+            self._chunks.popitem(last=False)
+        return rows
+
+    def row(self, row):
+        """One well's intensity row"""
+        return self.chunk(row // self.wells_per_chunk)[row % self.wells_per_chunk]
@@ -0,0 +1,183 @@
+import numpy as np
+from PyQt6.QtWidgets import QWidget, QSizePolicy
+from PyQt6.QtCore import Qt, QRectF, QSize, pyqtSignal
+from PyQt6.QtGui import QPainter, QColor, QPen, QFont
+from matplotlib.colors import to_rgba
+
+# Well states
+INACTIVE, ACTIVE, COLORED = 0, 1, 2
+
+
+class PlateStyle:
+    """Colors of a plate's wells in each state, as hex strings"""
+
+    def __init__(self, active_fill, active_text, inactive_fill, inactive_text, inactive_border,
+                 border='#444444', colored_text='white', empty_fill='#FAFAFA', empty_border='#F0F0F0'):
+        self.active_fill = active_fill
+        self.active_text = active_text
+        self.inactive_fill = inactive_fill
+        self.inactive_text = inactive_text
+        self.inactive_border = inactive_border
+        self.border = border
+        self.colored_text = colored_text
+        self.empty_fill = empty_fill
+        self.empty_border = empty_border
+
+
+# Same look as the old round buttons of the standard and custom plates
+STANDARD_STYLE = PlateStyle('#808080', 'white', '#D3D3D3', 'white', '#444444')
+CUSTOM_STYLE = PlateStyle('#C0C0C0', 'black', '#E8E8E8', '#666666', '#888888')
+
+
+class PlateCanvas(QWidget):
+    """
+    One plate drawn as a grid of circles in a single paintEvent.
+
+    Wells sit at (row, col) positions of a rows x cols grid; grid positions
+    without a well can be drawn as faint placeholders. Each well's fill is a
+    row of an RGBA array, and wells sharing a color are painted with one
+    brush. Cells scale with the widget, and a click is mapped to its well by
+    arithmetic on the cell size plus one lookup in a rows x cols index grid,
+    so layouts of thousands of wells cost one widget.
+
+    Args:
+        wells: List of (well_id, row, col, label)
+        rows, cols: Grid size
+        style: PlateStyle
+        show_empty: Draw placeholders at grid positions without a well
+        min_cell: Smallest cell size in pixels, sets the minimum widget size
+    """
+
+    well_clicked = pyqtSignal(str)
+
+    def __init__(self, wells, rows, cols, style=STANDARD_STYLE, show_empty=False, min_cell=30, parent=None):
+        super().__init__(parent)
+        self.well_ids = [well[0] for well in wells]
+        self.labels = [str(well[3]) for well in wells]
+        self.positions = np.array([(well[1], well[2]) for well in wells], dtype=np.int64).reshape(-1, 2)
+        self.rows = rows
+        self.cols = cols
+        self.style = style
+        self.show_empty = show_empty
+        self._index = {well: i for i, well in enumerate(self.well_ids)}
+        # Well number at each grid position, -1 where empty
+        self.grid = np.full((rows, cols), -1, dtype=np.int64)
+        if len(wells):
+            self.grid[self.positions[:, 0], self.positions[:, 1]] = np.arange(len(wells))
+
+        self.state = np.full(len(wells), ACTIVE, dtype=np.int8)
+        self.fill = np.tile(to_rgba(style.active_fill), (len(wells), 1))
+
+        self.setMinimumSize(cols * min_cell, rows * min_cell)
+        self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+
+    def sizeHint(self):
+        return QSize(self.cols * 40, self.rows * 40)
+
+    def rows_for(self, wells):
+        """Index of each well on this plate, -1 for wells not on it"""
+        return np.array([self._index.get(well, -1) for well in wells], dtype=np.int64)
+
+    # Colors
+
+    def set_active_wells(self, active_wells):
+        """Default color for wells in active_wells, inactive grey for the rest"""
+        active = np.array([well in active_wells for well in self.well_ids], dtype=bool)
+        self.state = np.where(active, ACTIVE, INACTIVE).astype(np.int8)
+        self.fill[active] = to_rgba(self.style.active_fill)
+        self.fill[~active] = to_rgba(self.style.inactive_fill)
+        self.update()
+
+    def set_colors(self, wells, colors):
+        """Fill the given wells with RGBA rows (or color strings); other wells keep their color"""
+        rows = self.rows_for(wells)
+        on_plate = rows >= 0
+        if isinstance(colors, np.ndarray):
+            colors = colors[on_plate]
+        else:
+            colors = np.array([to_rgba(color) for color, keep in zip(colors, on_plate) if keep]).reshape(-1, 4)
+        self.fill[rows[on_plate]] = colors
+        self.state[rows[on_plate]] = COLORED
+        self.update()
+
+    # Geometry
+
+    def _cell(self):
+        # Square cells fitted to the widget, with the grid centered
+        cell = min(self.width() / self.cols, self.height() / self.rows)
+        x0 = (self.width() - cell * self.cols) / 2
+        y0 = (self.height() - cell * self.rows) / 2
+        return cell, x0, y0
+
+    def well_at(self, x, y):
+        """Well ID at widget coordinates, or None"""
+        cell, x0, y0 = self._cell()
+        if cell <= 0:
+            return None
+        col = int(np.floor((x - x0) / cell))
+        row = int(np.floor((y - y0) / cell))
+        if not (0 <= row < self.rows and 0 <= col < self.cols) or self.grid[row, col] < 0:
+            return None
+        # Inside the circle, not just the cell
+        dx = x - (x0 + (col + 0.5) * cell)
+        dy = y - (y0 + (row + 0.5) * cell)
+        if dx * dx + dy * dy > (0.5 * cell) ** 2:
+            return None
+        return self.well_ids[self.grid[row, col]]
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            well = self.well_at(event.position().x(), event.position().y())
+            if well is not None and self.state[self._index[well]] != INACTIVE:
+                self.well_clicked.emit(well)
+        super().mousePressEvent(event)
+
+    # Painting
+
+    def paintEvent(self, event):
+        cell, x0, y0 = self._cell()
+        if cell <= 0:
+            return
+        gap = max(1.0, 0.06 * cell)
+        diameter = cell - gap
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing, cell >= 8)
+
+        def circle(row, col):
+            return QRectF(x0 + col * cell + gap / 2, y0 + row * cell + gap / 2, diameter, diameter)
+
+        if self.show_empty:
+            painter.setPen(QPen(QColor(self.style.empty_border), 1))
+            painter.setBrush(QColor(self.style.empty_fill))
+            for row, col in np.argwhere(self.grid < 0):
+                painter.drawEllipse(circle(row, col))
+
+        if len(self.well_ids):
+            # One brush per distinct color
+            border = max(1.0, min(2.0, cell / 20))
+            packed = np.round(self.fill * 255).astype(np.uint32)
+            keys = (packed[:, 0] << 24) | (packed[:, 1] << 16) | (packed[:, 2] << 8) | packed[:, 3]
+            keys = keys.astype(np.uint64) * 3 + self.state.astype(np.uint64)
+            order = np.argsort(keys, kind='stable')
+            boundaries = np.flatnonzero(np.diff(keys[order])) + 1
+            for group in np.split(order, boundaries):
+                first = group[0]
+                inactive = self.state[first] == INACTIVE
+                painter.setPen(QPen(QColor(self.style.inactive_border if inactive else self.style.border),
+                                    1 if inactive else border))
+                painter.setBrush(QColor.fromRgbF(*self.fill[first]))
+                for i in group:
+                    painter.drawEllipse(circle(*self.positions[i]))
+
+            # Labels, once the cells are big enough to read them
+            if cell >= 16:
+                font = QFont('Arial')
+                font.setPixelSize(max(6, int(min(cell * 0.3, 16))))
+                font.setBold(True)
+                painter.setFont(font)
+                text_colors = {INACTIVE: QColor(self.style.inactive_text), ACTIVE: QColor(self.style.active_text),
+                               COLORED: QColor(self.style.colored_text)}
+                for i, label in enumerate(self.labels):
+                    painter.setPen(text_colors[int(self.state[i])])
+                    painter.drawText(circle(*self.positions[i]), Qt.AlignmentFlag.AlignCenter, label)
+        painter.end()
@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import hashlib
+
+MANIFEST_SUFFIX = '_processing_manifest.json'
+
+
+def manifest_path(outdir, outdata):
+    """Manifest lives next to <run>_processing_summary.json"""
+    return os.path.join(outdir, f'{outdata}{MANIFEST_SUFFIX}')
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ProcessingManifest:
+    """
+    Record of wells that have been converted, so an interrupted run can be
+    resumed without redoing finished wells.
+
+    Each entry stores the well's scan range and, for every output file, its
+    path, size and hash. A well counts as done only if all of these still
+    match. If the processing settings change, every entry is treated as stale.
+
+    Args:
+        path: Manifest JSON file
+        settings: Settings that affect the outputs (extraction mode, bin width...)
+    """
+
+    def __init__(self, path, settings=None):
+        self.path = path
+        self.settings = dict(settings or {})
+        self.wells = {}
+        self._digest_cache = {}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if data.get('settings', {}) == json.loads(json.dumps(self.settings)):
+                self.wells = data.get('wells', {})
+            else:
+                print("Processing settings changed, previous outputs will be regenerated")
+        except Exception as e:
+            print(f"Error loading processing manifest: {e}")
+
+    def save(self):
+        data = {
+            'settings': self.settings,
+            'updated': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'wells': self.wells
+        }
+        # Replace atomically so an interrupted save never loses finished wells
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def reset(self):
+        """Forget all wells, e.g. when forcing a full reprocess"""
+        self.wells = {}
+
+    def output_path(self, well_id, kind):
+        entry = self.wells.get(well_id)
+        if entry and kind in entry['outputs']:
+            return entry['outputs'][kind]['path']
+        return None
+
+    def is_complete(self, well_id, start, end, required_outputs):
+        """
+        True if the well was converted from the same scan range and every
+        required output is still on disk with the recorded size and hash.
+        """
+        entry = self.wells.get(well_id)
+        if not entry:
+            return False
+        if entry['scan_range']['start'] != start or entry['scan_range']['end'] != end:
+            return False
+        for kind in required_outputs:
+            output = entry['outputs'].get(kind)
+            if not output or not os.path.exists(output['path']):
+                return False
+            if os.path.getsize(output['path']) != output['size']:
+                return False
+            if self._current_digest(output['path']) != output['sha256']:
+                return False
+        return True
+
+    def _current_digest(self, path):
+        # Shared outputs such as the plate cube are checked for every well,
+        # so only rehash a file when its size or mtime changes
+        stat = os.stat(path)
+        key = (path, stat.st_size, stat.st_mtime_ns)
+        if key not in self._digest_cache:
+            self._digest_cache[key] = file_digest(path)
+        return self._digest_cache[key]
+
+    def record(self, well_id, start, end, n_scans, outputs):
+        """
+        Store a finished well and save the manifest.
+
+        Args:
+            outputs: Dictionary of output kind to file path, e.g. {'csv': path}
+        """
+        self._add_outputs(well_id, start, end, n_scans, outputs, {})
+        self.save()
+
+    def record_shared_output(self, wells, kind, path):
+        """
+        Record one file (e.g. the plate cube) as an output of several wells.
+
+        Args:
+            wells: Dictionary of well ID to (start, end, n_scans)
+        """
+        digests = {}
+        for well_id, (start, end, n_scans) in wells.items():
+            self._add_outputs(well_id, start, end, n_scans, {kind: path}, digests)
+        self.save()
+
+    def _add_outputs(self, well_id, start, end, n_scans, outputs, digests):
+        scan_range = {'start': start, 'end': end, 'n_scans': n_scans}
+        entry = self.wells.get(well_id)
+        if not entry or entry['scan_range'] != scan_range:
+            entry = {'scan_range': scan_range, 'outputs': {}}
+        for kind, path in outputs.items():
+            # Shared outputs are only hashed once
+            if path not in digests:
+                digests[path] = {'path': path, 'size': os.path.getsize(path), 'sha256': file_digest(path)}
+            entry['outputs'][kind] = digests[path]
+        entry['completed'] = time.strftime('%Y-%m-%d %H:%M:%S')
+        self.wells[well_id] = entry
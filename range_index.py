@@ -0,0 +1,138 @@
+import numpy as np
+
+
+class RangeIndex:
+    """
+    Prefix-sum index over many spectra for m/z range queries.
+
+    All wells are stored in one sorted key array, key = well * span + (mz - mz_min),
+    with span larger than the m/z range, so the range of every well can be
+    located with a single searchsorted call. Cumulative intensity (and point
+    count, when points carry a count) restart at zero for each well, so sums
+    stay accurate however many wells precede it.
+
+    Any range sum, count or mean is then two lookups per well, independent of
+    the number of points, and many windows at once are one searchsorted call.
+
+    Args:
+        well_ids: Wells in display order
+        spectra: For each well, (mz, intensity) or (mz, intensity, counts);
+            counts weight each point, e.g. the number of raw points in a bin
+    """
+
+    def __init__(self, well_ids, spectra):
+        self.well_ids = list(well_ids)
+        spectra = [tuple(np.asarray(a) for a in spectrum) for spectrum in spectra]
+        lengths = np.array([len(spectrum[0]) for spectrum in spectra], dtype=np.int64)
+        self.offsets = np.concatenate(([0], np.cumsum(lengths)))
+        self._rows = {well: i for i, well in enumerate(self.well_ids)}
+        weighted = any(len(spectrum) > 2 for spectrum in spectra)
+
+        nonempty = [spectrum[0] for spectrum in spectra if len(spectrum[0])]
+        self.mz_min = min(float(mz.min()) for mz in nonempty) if nonempty else 0.0
+        mz_max = max(float(mz.max()) for mz in nonempty) if nonempty else 0.0
+        self.span = (mz_max - self.mz_min) + 1.0
+
+        n_points = int(self.offsets[-1])
+        self.keys = np.empty(n_points, dtype=np.float64)
+        # Each well's cumulative arrays start with a zero, so well i's
+        # entries sit i places further along than its keys
+        self.cum_intensity = np.zeros(n_points + len(spectra), dtype=np.float64)
+        self.cum_counts = np.zeros(n_points + len(spectra), dtype=np.float64) if weighted else None
+        for i, spectrum in enumerate(spectra):
+            mz, intensity = spectrum[0], spectrum[1]
+            order = np.argsort(mz, kind='stable')
+            first, last = self.offsets[i], self.offsets[i + 1]
+            self.keys[first:last] = i * self.span + (mz[order].astype(np.float64) - self.mz_min)
+            self.cum_intensity[first + i + 1:last + i + 1] = np.cumsum(intensity[order], dtype=np.float64)
+            if weighted:
+                counts = spectrum[2][order] if len(spectrum) > 2 else np.ones(len(mz))
+                self.cum_counts[first + i + 1:last + i + 1] = np.cumsum(counts, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.well_ids)
+
+    def to_arrays(self):
+        """Arrays and scalars needed to rebuild the index with from_arrays"""
+        arrays = {'keys': self.keys, 'cum_intensity': self.cum_intensity, 'offsets': self.offsets}
+        if self.cum_counts is not None:
+            arrays['cum_counts'] = self.cum_counts
+        return arrays, {'mz_min': self.mz_min, 'span': self.span}
+
+    @classmethod
+    def from_arrays(cls, well_ids, arrays, scalars):
+        """Index over arrays saved by to_arrays (memory-mapped arrays are used in place)"""
+        index = cls.__new__(cls)
+        index.well_ids = list(well_ids)
+        index._rows = {well: i for i, well in enumerate(index.well_ids)}
+        index.keys = arrays['keys']
+        index.cum_intensity = arrays['cum_intensity']
+        index.cum_counts = arrays.get('cum_counts')
+        index.offsets = arrays['offsets']
+        index.mz_min = float(scalars['mz_min'])
+        index.span = float(scalars['span'])
+        return index
+
+    def _bounds(self, low, high, rows):
+        # Scalar low/high give one bound per row; arrays of windows give rows x windows
+        if np.ndim(low):
+            rows = rows[:, None]
+        # Same arithmetic as the keys, so a point exactly on a range edge is included
+        starts = rows * self.span
+        lo = np.searchsorted(self.keys, starts + (np.asarray(low, dtype=np.float64) - self.mz_min), side='left')
+        hi = np.searchsorted(self.keys, starts + (np.asarray(high, dtype=np.float64) - self.mz_min), side='right')
+        # Clip to each well's own segment in case the range runs past it
+        lo = np.clip(lo, self.offsets[rows], self.offsets[rows + 1])
+        hi = np.clip(hi, lo, self.offsets[rows + 1])
+        return lo + rows, hi + rows
+
+    def _sums_counts(self, lo, hi):
+        sums = self.cum_intensity[hi] - self.cum_intensity[lo]
+        counts = (hi - lo).astype(np.float64) if self.cum_counts is None else self.cum_counts[hi] - self.cum_counts[lo]
+        return sums, counts
+
+    def rows_for(self, wells):
+        """Row numbers of the given wells, or of every well if wells is None"""
+        if wells is None:
+            return np.arange(len(self.well_ids))
+        return np.array([self._rows[well] for well in wells], dtype=np.int64)
+
+    def range_sums(self, mass_range, wells=None):
+        """Summed intensity of points with mass_range[0] <= m/z <= mass_range[1], per well"""
+        lo, hi = self._bounds(mass_range[0], mass_range[1], self.rows_for(wells))
+        return self.cum_intensity[hi] - self.cum_intensity[lo]
+
+    def range_counts(self, mass_range, wells=None):
+        """Number of points (or summed point counts) in the range, per well"""
+        lo, hi = self._bounds(mass_range[0], mass_range[1], self.rows_for(wells))
+        return self._sums_counts(lo, hi)[1]
+
+    def range_means(self, mass_range, wells=None):
+        """Mean intensity in the range per well, NaN where a well has no points in it"""
+        lo, hi = self._bounds(mass_range[0], mass_range[1], self.rows_for(wells))
+        sums, counts = self._sums_counts(lo, hi)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, sums / counts, np.nan)
+
+    def window_stats(self, lower, upper, wells=None):
+        """
+        Summed intensity and point count of many m/z windows for every well,
+        windows i covering lower[i] <= m/z <= upper[i].
+
+        Returns:
+            (sums, counts): wells x windows arrays
+        """
+        lo, hi = self._bounds(np.asarray(lower), np.asarray(upper), self.rows_for(wells))
+        return self._sums_counts(lo, hi)
+
+    def well_points(self, well):
+        """(mz, intensity, counts) stored for one well, in m/z order"""
+        i = self._rows[well]
+        first, last = self.offsets[i], self.offsets[i + 1]
+        mz = self.keys[first:last] - i * self.span + self.mz_min
+        intensity = np.diff(self.cum_intensity[first + i:last + i + 1])
+        if self.cum_counts is None:
+            counts = np.ones(len(mz))
+        else:
+            counts = np.diff(self.cum_counts[first + i:last + i + 1])
+        return mz, intensity, counts
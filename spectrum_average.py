@@ -0,0 +1,101 @@
+import numpy as np
+
+AVERAGE_BIN_WIDTH = 0.01
+# Pending sparse bins merged into the running total once they exceed this
+SPARSE_MERGE_SIZE = 2_000_000
+
+
+def bin_means(mz, intensity, bin_width=AVERAGE_BIN_WIDTH):
+    """Sorted occupied bins floor(mz / bin_width) of a spectrum and the mean intensity in each"""
+    mz = np.asarray(mz, dtype=np.float64)
+    bins = np.floor(mz / bin_width).astype(np.int64)
+    keys, inverse = np.unique(bins, return_inverse=True)
+    means = (np.bincount(inverse, weights=np.asarray(intensity, dtype=np.float64), minlength=len(keys))
+             / np.bincount(inverse, minlength=len(keys)))
+    return keys, means
+
+
+class StreamingAverage:
+    """
+    Average spectrum built one well at a time.
+
+    Each well arrives binned at bin_width (floor(mz / bin_width), see
+    bin_means); its mean intensity per occupied bin is added to a single
+    float32 accumulator, so no per-well arrays are kept. Wells without points in a bin count as zero.
+
+    Args:
+        bin_width: m/z bin width of the result
+        sparse: Keep only occupied bins instead of a dense array spanning the
+            whole m/z range, so memory follows the data rather than the range
+    """
+
+    def __init__(self, bin_width=AVERAGE_BIN_WIDTH, sparse=False):
+        self.bin_width = bin_width
+        self.sparse = sparse
+        self.n_wells = 0
+        # Dense: totals[i] is bin first_bin + i
+        self.first_bin = None
+        self.totals = np.zeros(0, dtype=np.float32)
+        # Sparse: sorted bin keys with their totals, plus bins not yet merged
+        self.keys = np.zeros(0, dtype=np.int64)
+        self._pending_keys = []
+        self._pending_values = []
+        self._n_pending = 0
+
+    def add_binned(self, keys, means):
+        """Add a well already reduced to sorted bin keys and mean intensity per bin"""
+        self.n_wells += 1
+        if not len(keys):
+            return
+        if self.sparse:
+            self._pending_keys.append(np.asarray(keys, dtype=np.int64))
+            self._pending_values.append(np.asarray(means, dtype=np.float32))
+            self._n_pending += len(keys)
+            if self._n_pending > SPARSE_MERGE_SIZE:
+                self._merge()
+            return
+        self._grow(int(keys[0]), int(keys[-1]))
+        # Keys are unique, so a fancy-indexed add touches each bin once
+        self.totals[keys - self.first_bin] += np.asarray(means, dtype=np.float32)
+
+    def _grow(self, low, high):
+        # Extend the dense accumulator to cover bins low..high
+        if self.first_bin is None:
+            self.first_bin = low
+            self.totals = np.zeros(high - low + 1, dtype=np.float32)
+            return
+        last_bin = self.first_bin + len(self.totals) - 1
+        if low >= self.first_bin and high <= last_bin:
+            return
+        new_first = min(low, self.first_bin)
+        totals = np.zeros(max(high, last_bin) - new_first + 1, dtype=np.float32)
+        totals[self.first_bin - new_first:self.first_bin - new_first + len(self.totals)] = self.totals
+        self.first_bin = new_first
+        self.totals = totals
+
+    def _merge(self):
+        if not self._pending_keys:
+            return
+        keys = np.concatenate([self.keys] + self._pending_keys)
+        values = np.concatenate([self.totals] + self._pending_values)
+        self.keys, inverse = np.unique(keys, return_inverse=True)
+        self.totals = np.bincount(inverse, weights=values, minlength=len(self.keys)).astype(np.float32)
+        self._pending_keys = []
+        self._pending_values = []
+        self._n_pending = 0
+
+    def result(self):
+        """
+        Returns:
+            (mz, intensity): bin centres and mean intensity over all added
+            wells; only occupied bins when sparse
+        """
+        if self.sparse:
+            self._merge()
+            bins = self.keys
+        elif self.first_bin is None:
+            bins = np.zeros(0, dtype=np.int64)
+        else:
+            bins = self.first_bin + np.arange(len(self.totals))
+        mz = (bins + 0.5) * self.bin_width
+        return mz, self.totals / max(self.n_wells, 1)
@@ -0,0 +1,236 @@
+import numpy as np
+from scipy import sparse
+from spectrum_average import StreamingAverage, bin_means
+from range_index import RangeIndex
+
+# Column width of the aligned matrix
+ENGINE_BIN_WIDTH = 0.01
+
+
+class SpectrumEngine:
+    """
+    All wells aligned on one m/z grid, built once after loading.
+
+    Rows are wells, columns are bins of bin_width, values are the mean
+    intensity of a well's points in a bin (float32). Storage is CSR by
+    default, which only holds occupied bins, or a dense array. A prefix-sum
+    RangeIndex over the same data answers range means for the heatmap and
+    export, and the average spectrum is accumulated while the matrix is
+    built. to_arrays and from_arrays save and restore a built engine, so a
+    saved one can be reopened from memory-mapped arrays without rebuilding.
+
+    Args:
+        well_ids: Wells in display order
+        matrix: CSR (or dense) wells x bins float32 matrix
+        first_bin: Bin number floor(mz / bin_width) of the first column
+        range_index: RangeIndex over the same wells
+        average: (mz, intensity) average spectrum
+        bin_width: m/z width of a column
+        dense: Store a dense matrix instead of CSR
+        sparse_average: The average keeps only occupied bins
+        index_bin_width: Set when range_index holds bins at their lower edge
+            rather than raw points; range queries then take whole bins
+    """
+
+    def __init__(self, well_ids, matrix, first_bin, range_index, average, bin_width=ENGINE_BIN_WIDTH,
+                 dense=False, sparse_average=False, index_bin_width=None):
+        self.well_ids = list(well_ids)
+        self.bin_width = bin_width
+        self.range_index = range_index
+        self.index_bin_width = index_bin_width
+        self.sparse_average = sparse_average
+        self.row_scale = None
+        self.first_bin = int(first_bin)
+        self.mz = (self.first_bin + np.arange(matrix.shape[1]) + 0.5) * bin_width
+        self.matrix = matrix.toarray() if dense and sparse.issparse(matrix) else matrix
+        self._average = average
+        # Summed intensity of each well: the last prefix sum of its segment
+        self.tic = range_index.cum_intensity[range_index.offsets[1:] + np.arange(len(self.well_ids))]
+
+    @classmethod
+    def from_binned(cls, well_ids, binned, range_index, bin_width=ENGINE_BIN_WIDTH, dense=False,
+                    sparse_average=False, index_bin_width=None):
+        """
+        Build from each well's (bin numbers, mean intensity per bin), streaming
+        the wells into the CSR parts and the average in one pass
+        """
+        well_ids = list(well_ids)
+        average = StreamingAverage(bin_width, sparse=sparse_average)
+        indices, data, indptr = [], [], [0]
+        for keys, means in binned:
+            keys = np.asarray(keys, dtype=np.int64)
+            average.add_binned(keys, means)
+            indices.append(keys)
+            data.append(np.asarray(means, dtype=np.float32))
+            indptr.append(indptr[-1] + len(keys))
+
+        all_keys = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64)
+        first_bin = int(all_keys.min()) if len(all_keys) else 0
+        n_bins = int(all_keys.max()) - first_bin + 1 if len(all_keys) else 0
+        matrix = sparse.csr_matrix(
+            (np.concatenate(data) if data else np.zeros(0, dtype=np.float32),
+             (all_keys - first_bin).astype(np.int32), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(well_ids), n_bins), dtype=np.float32
+        )
+        return cls(well_ids, matrix, first_bin, range_index, average.result(), bin_width, dense,
+                   sparse_average, index_bin_width)
+
+    @classmethod
+    def from_spectra(cls, spectra, bin_width=ENGINE_BIN_WIDTH, dense=False, sparse_average=False):
+        """
+        Build from full-resolution spectra.
+
+        Args:
+            spectra: Dictionary of well ID to (mz, intensity)
+        """
+        well_ids = list(spectra)
+        range_index = RangeIndex(well_ids, spectra.values())
+        binned = (bin_means(mz, intensity, bin_width) for mz, intensity in spectra.values())
+        return cls.from_binned(well_ids, binned, range_index, bin_width, dense, sparse_average)
+
+    @classmethod
+    def from_lazy(cls, lazy, dense=False, sparse_average=True):
+        """Build from the per-well bin summaries of a LazySpectra, without reading any spectra"""
+        index = lazy.index
+
+        def binned():
+            for i, well in enumerate(lazy.well_ids):
+                mz, sums, counts = index.well_points(well)
+                yield lazy.bin_keys[index.offsets[i]:index.offsets[i + 1]].astype(np.int64), sums / counts
+
+        return cls.from_binned(lazy.well_ids, binned(), index, lazy.bin_width, dense, sparse_average,
+                               index_bin_width=lazy.bin_width)
+
+    def to_arrays(self):
+        """
+        Arrays and scalars describing the engine, for from_arrays.
+
+        Returns:
+            (arrays, scalars): arrays are named matrix_*, index_* and
+            average_*; scalars are plain JSON values
+        """
+        matrix = sparse.csr_matrix(self.matrix) if self.is_dense else self.matrix
+        index_arrays, index_scalars = self.range_index.to_arrays()
+        arrays = {'matrix_data': matrix.data, 'matrix_indices': matrix.indices, 'matrix_indptr': matrix.indptr,
+                  'average_mz': np.asarray(self._average[0]), 'average_intensity': np.asarray(self._average[1])}
+        arrays.update({f'index_{name}': array for name, array in index_arrays.items()})
+        scalars = {'n_bins': int(matrix.shape[1]), 'first_bin': self.first_bin, 'bin_width': self.bin_width,
+                   'sparse_average': self.sparse_average, 'index_bin_width': self.index_bin_width,
+                   'index': index_scalars}
+        return arrays, scalars
+
+    @classmethod
+    def from_arrays(cls, well_ids, arrays, scalars, dense=False):
+        """Engine over arrays saved by to_arrays; memory-mapped arrays are used without copying"""
+        matrix = sparse.csr_matrix((arrays['matrix_data'], arrays['matrix_indices'], arrays['matrix_indptr']),
+                                   shape=(len(well_ids), scalars['n_bins']), copy=False)
+        index = RangeIndex.from_arrays(well_ids, {name[len('index_'):]: array for name, array in arrays.items()
+                                                  if name.startswith('index_')}, scalars['index'])
+        return cls(well_ids, matrix, scalars['first_bin'], index, (arrays['average_mz'], arrays['average_intensity']),
+                   scalars['bin_width'], dense, scalars['sparse_average'], scalars['index_bin_width'])
+
+    @property
+    def is_dense(self):
+        return isinstance(self.matrix, np.ndarray)
+
+    def __len__(self):
+        return len(self.well_ids)
+
+    def set_row_scale(self, scale):
+        """
+        Divide every well by scale[i] in all results (None for raw intensities).
+        The scale is copied and never changed in place, so a reference to
+        row_scale is a snapshot other threads can use.
+        """
+        self.row_scale = None if scale is None else np.array(scale, dtype=np.float64)
+
+    def scale_of(self, well):
+        """Divisor currently applied to one well"""
+        return float(self._scale(self.rows_for([well]))[0]) if self.row_scale is not None else 1.0
+
+    def _scale(self, rows, row_scale=None):
+        row_scale = self.row_scale if row_scale is None else row_scale
+        if row_scale is None:
+            return None
+        scale = row_scale[rows]
+        return np.where(scale > 0, scale, 1.0)
+
+    def rows_for(self, wells):
+        """Row numbers of the given wells, or of every well if wells is None"""
+        return self.range_index.rows_for(wells)
+
+    def columns_for(self, mass_range):
+        """Column slice covering the bins that overlap mass_range"""
+        if mass_range is None:
+            return slice(0, len(self.mz))
+        first = max(int(np.floor(mass_range[0] / self.bin_width)) - self.first_bin, 0)
+        last = min(int(np.floor(mass_range[1] / self.bin_width)) - self.first_bin + 1, len(self.mz))
+        return slice(first, max(first, last))
+
+    def slice(self, mass_range=None, wells=None, dense=True):
+        """
+        Matrix of the given wells over the bins in mass_range.
+
+        Returns:
+            (mz, matrix): bin centres and a wells x bins float32 array
+            (a CSR matrix if dense is False and storage is CSR)
+        """
+        rows = self.rows_for(wells)
+        columns = self.columns_for(mass_range)
+        matrix = self.matrix[rows][:, columns]
+        scale = self._scale(rows)
+        if scale is not None:
+            if self.is_dense:
+                matrix = matrix / scale[:, None].astype(np.float32)
+            else:
+                matrix = sparse.diags((1.0 / scale).astype(np.float32)) @ matrix
+        if dense and not self.is_dense:
+            matrix = matrix.toarray()
+        return self.mz[columns], matrix
+
+    def _index_edges(self, low, high):
+        if self.index_bin_width is None:
+            return low, high
+        # Bins sit at multiples of the width; query half a bin outside them
+        width = self.index_bin_width
+        return (np.floor(np.asarray(low) / width) - 0.5) * width, (np.floor(np.asarray(high) / width) + 0.5) * width
+
+    def range_means(self, mass_range, wells=None, raw=False, row_scale=None):
+        """
+        Mean intensity of each well's points within mass_range, NaN if it has
+        none. With raw set, the row scale is not applied; row_scale applies
+        the given scale instead of the current one, e.g. a snapshot taken on
+        another thread.
+        """
+        rows = self.rows_for(wells)
+        means = self.range_index.range_means(self._index_edges(*mass_range), wells)
+        scale = None if raw else self._scale(rows, row_scale)
+        return means if scale is None else means / scale
+
+    def window_stats(self, lower, upper, wells=None, raw=False):
+        """
+        Summed intensity and point count of each well in many m/z windows at
+        once, lower[i] <= m/z <= upper[i], with the row scale applied to the sums
+
+        Returns:
+            (sums, counts): wells x windows arrays
+        """
+        rows = self.rows_for(wells)
+        sums, counts = self.range_index.window_stats(*self._index_edges(lower, upper), wells)
+        scale = None if raw else self._scale(rows)
+        return (sums if scale is None else sums / scale[:, None]), counts
+
+    def average_spectrum(self):
+        """
+        Mean over wells of the per-bin means, as (mz, intensity), from the
+        streaming accumulator filled while building
+        """
+        if self.row_scale is None:
+            return self._average
+        # Scaled wells: recompute from the matrix columns
+        mz, matrix = self.slice(dense=False)
+        mean = np.asarray(matrix.mean(axis=0)).ravel().astype(np.float32)
+        if self.sparse_average:
+            occupied = mean != 0
+            return mz[occupied], mean[occupied]
+        return mz, mean
@@ -0,0 +1,153 @@
+import numpy as np
+
+
+def bin_spectrum(masses, intens, mz_min, bin_width, n_bins):
+    """Sum a spectrum into n_bins bins of bin_width starting at mz_min, as float32"""
+    masses = np.asarray(masses, dtype=np.float64)
+    bins = np.floor((masses - mz_min) / bin_width).astype(np.int64)
+    keep = (bins >= 0) & (bins < n_bins)
+    return np.bincount(bins[keep], weights=np.asarray(intens, dtype=np.float64)[keep],
+                       minlength=n_bins).astype(np.float32)
+
+
+class ScanSource:
+    """
+    Interface for a data file that can combine a range of scans into one spectrum.
+
+    WatersScanSource wraps the Waters reader; a synthetic implementation only
+    needs these three methods to drive CombinedSpectrumExtractor in tests.
+    """
+
+    def total_scans(self):
+        raise NotImplementedError
+
+    def mass_range(self):
+        """Return (low, high) m/z of the acquisition"""
+        raise NotImplementedError
+
+    def combined_spectrum(self, start_scan, end_scan):
+        """Return (masses, intensities) summed over scans start_scan..end_scan (1-based, inclusive)"""
+        raise NotImplementedError
+
+
+def check_scan_range(start_scan, end_scan, total_scans):
+    """Raise ValueError unless 1 <= start_scan <= end_scan <= total_scans"""
+    if not 1 <= start_scan <= end_scan <= total_scans:
+        raise ValueError(f"Scan range {start_scan}..{end_scan} outside 1..{total_scans}")
+
+
+class WatersScanSource(ScanSource):
+    """
+    ScanSource backed by an open WatersIMGReader handle.
+
+    getCombinedScans(first, last, 0, 0) is taken to use 1-based, inclusive
+    scan numbers. The per-well path has always called it as (1, 1) on a well
+    file holding one combined scan, which only reads that scan under this
+    convention, and well ranges are passed to maldichrom with the same
+    numbering.
+    """
+
+    def __init__(self, reader):
+        self.reader = reader
+        self._total_scans = None
+
+    def total_scans(self):
+        if self._total_scans is None:
+            self._total_scans = self.reader.getTotalScans()
+        return self._total_scans
+
+    def mass_range(self):
+        massRange = self.reader.getMassRange()
+        return massRange[0], massRange[1]
+
+    def combined_spectrum(self, start_scan, end_scan):
+        check_scan_range(start_scan, end_scan, self.total_scans())
+        masses, intens, npoints = self.reader.getCombinedScans(start_scan, end_scan, 0, 0)
+        return np.asarray(masses[:npoints], dtype=np.float64), np.asarray(intens[:npoints], dtype=np.float64)
+
+
+class SyntheticScanSource(ScanSource):
+    """
+    In-memory ScanSource for tests, from a list of (masses, intensities) scans.
+
+    Combining sums the intensities of identical masses, and series() builds
+    the single-scan source maldichrom would write for a list of scans, so the
+    per-well path can be reproduced without the Waters libraries.
+    """
+
+    def __init__(self, scans, mass_range=None):
+        self.scans = [(np.asarray(masses, dtype=np.float64), np.asarray(intens, dtype=np.float64))
+                      for masses, intens in scans]
+        if mass_range is None:
+            masses = np.concatenate([masses for masses, _ in self.scans]) if self.scans else np.zeros(1)
+            mass_range = (float(masses.min()), float(masses.max()))
+        self._mass_range = mass_range
+
+    def total_scans(self):
+        return len(self.scans)
+
+    def mass_range(self):
+        return self._mass_range
+
+    def combined_spectrum(self, start_scan, end_scan):
+        check_scan_range(start_scan, end_scan, self.total_scans())
+        return self._combine(self.scans[start_scan - 1:end_scan])
+
+    def series(self, scan_numbers):
+        """Source holding one scan, the combination of the given 1-based scans"""
+        for scan in scan_numbers:
+            check_scan_range(scan, scan, self.total_scans())
+        return SyntheticScanSource([self._combine([self.scans[scan - 1] for scan in scan_numbers])],
+                                   self._mass_range)
+
+    @staticmethod
+    def _combine(scans):
+        masses = np.concatenate([masses for masses, _ in scans])
+        intens = np.concatenate([intens for _, intens in scans])
+        unique, inverse = np.unique(masses, return_inverse=True)
+        return unique, np.bincount(inverse, weights=intens, minlength=len(unique))
+
+
+class CombinedSpectrumExtractor:
+    """
+    Sum each well's scan range straight from one open source into a binned
+    intensity vector on a shared m/z axis.
+
+    This replaces the maldichrom round trip (write a .raw per well, reopen it,
+    read the combined scan) with a single pass over the original file.
+
+    Args:
+        source: ScanSource to read from
+        bin_width: Width of each m/z bin
+        mass_range: (low, high) m/z to bin over; defaults to the source mass range
+    """
+
+    def __init__(self, source, bin_width=0.01, mass_range=None):
+        self.source = source
+        self.bin_width = float(bin_width)
+        low, high = mass_range if mass_range is not None else source.mass_range()
+        self.mz_min = float(low)
+        self.n_bins = int(np.ceil((float(high) - self.mz_min) / self.bin_width)) + 1
+        # Bin centres are used as the m/z values for the output
+        self.mz_axis = self.mz_min + (np.arange(self.n_bins) + 0.5) * self.bin_width
+
+    def bin_spectrum(self, masses, intens):
+        """Sum a spectrum onto the extractor's m/z axis"""
+        return bin_spectrum(masses, intens, self.mz_min, self.bin_width, self.n_bins)
+
+    def extract(self, start_scan, end_scan):
+        """Binned intensity vector for scans start_scan..end_scan"""
+        masses, intens = self.source.combined_spectrum(start_scan, end_scan)
+        return self.bin_spectrum(masses, intens)
+
+    def extract_wells(self, jobs, is_cancelled=None):
+        """
+        Extract every job's scan range in turn, yielding (job, intensity_vector).
+
+        Jobs only need start and end attributes, so the ExtractionJob list built
+        for maldichrom can be passed straight in.
+        """
+        for job in jobs:
+            if is_cancelled is not None and is_cancelled():
+                return
+            yield job, self.extract(job.start, job.end)
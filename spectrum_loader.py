@@ -0,0 +1,103 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+# Per-well spectra written by the acquisition app, optionally gzipped
+CSV_EXTENSIONS = ('.csv', '.CSV', '.csv.gz', '.CSV.gz')
+
+# Above this average file size, parse in separate processes instead of threads
+PROCESS_POOL_MIN_BYTES = 32 * 1024 * 1024
+
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    CSV_ENGINE = 'c'
+
+
+def default_loader_workers():
+    return max(1, min(8, os.cpu_count() or 1))
+
+
+def well_id_from_filename(file):
+    """
+    Well ID from a per-well CSV name, e.g. "experiment_A01.csv" -> "A01" or
+    "August17_003_Spot_38.csv.gz" -> "Spot_38"
+    """
+    name = file[:-3] if file.endswith('.gz') else file
+    if '_Spot_' in name:
+        well = name.split('_Spot_')[1].replace('.csv', '').replace('.CSV', '')
+        return f"Spot_{well}"
+    return name[-7:-4]
+
+
+def find_spectrum_files(folder):
+    """List (well_id, path) for every per-well CSV in a folder, in directory order"""
+    return [(well_id_from_filename(file), os.path.join(folder, file))
+            for file in os.listdir(folder) if file.endswith(CSV_EXTENSIONS)]
+
+
+def read_spectrum_csv(path):
+    """
+    Read a two-column m/z, intensity CSV and average repeated m/z values.
+
+    Returns:
+        (mz, intensity): float64 arrays sorted by m/z, like
+        groupby('mass_to_charge').mean()
+    """
+    df = pd.read_csv(path, names=["mass_to_charge", "intensity"], engine=CSV_ENGINE,
+                     compression='infer')
+    mz = df['mass_to_charge'].to_numpy(dtype=np.float64)
+    intensity = df['intensity'].to_numpy(dtype=np.float64)
+    unique_mz, inverse, counts = np.unique(mz, return_inverse=True, return_counts=True)
+    if len(unique_mz) == len(mz):
+        # Already unique, only needs sorting
+        return unique_mz, intensity[np.argsort(mz, kind='stable')]
+    return unique_mz, np.bincount(inverse, weights=intensity) / counts
+
+
+def load_spectra(files, max_workers=None, use_processes=None, progress=None, is_cancelled=None,
+                 reader=read_spectrum_csv):
+    """
+    Parse many spectrum CSVs on a worker pool.
+
+    Threads are used for typical files (pandas' parser releases the GIL);
+    very large files go to a process pool.
+
+    Args:
+        files: List of (well_id, path)
+        max_workers: Pool size, defaults to the number of cores (up to 8)
+        use_processes: Force a process (True) or thread (False) pool
+        progress: Called as progress(n_done, n_total, well_id) as files finish
+        is_cancelled: Returns True to stop early
+        reader: Called with a path in the workers; must be a module-level
+            function for the process pool
+
+    Returns:
+        dict: well_id -> reader result, (mz, intensity) by default, in the order of files; wells whose
+        file could not be read are left out
+    """
+    if not files:
+        return {}
+    if use_processes is None:
+        sizes = [os.path.getsize(path) for well, path in files]
+        use_processes = sum(sizes) / len(sizes) >= PROCESS_POOL_MIN_BYTES
+    executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+
+    results = {}
+    with executor_class(max_workers=max_workers or default_loader_workers()) as executor:
+        futures = {executor.submit(reader, path): (well, path) for well, path in files}
+        for n_done, future in enumerate(as_completed(futures), 1):
+            well, path = futures[future]
+            try:
+                results[well] = future.result()
+            except Exception as e:
+                print(f"Error loading {os.path.basename(path)}: {e}")
+            if progress is not None:
+                progress(n_done, len(files), well)
+            if is_cancelled is not None and is_cancelled():
+                for pending in futures:
+                    pending.cancel()
+                break
+    return {well: results[well] for well, path in files if well in results}
@@ -0,0 +1,120 @@
+import numpy as np
+
+# Points per bucket grow by this factor from one level to the next
+LOD_FACTOR = 4
+# Draw raw points once the visible window holds fewer than this many per pixel column
+RAW_POINTS_PER_PIXEL = 2
+
+
+class MinMaxPyramid:
+    """
+    Min/max decimation pyramid over one spectrum.
+
+    Level L splits the points into buckets of LOD_FACTOR ** L and keeps the
+    index of the lowest and highest intensity in each, so peaks are never
+    dropped however far the view is zoomed out. Each level is built from the
+    one below it, and only indices are stored (about 2/3 of the point count
+    over all levels).
+
+    Args:
+        mz: m/z values, sorted (sorted here if not)
+        intensity: Intensities matching mz
+    """
+
+    def __init__(self, mz, intensity):
+        mz = np.asarray(mz, dtype=np.float64)
+        intensity = np.asarray(intensity, dtype=np.float64)
+        if len(mz) > 1 and np.any(np.diff(mz) < 0):
+            order = np.argsort(mz, kind='stable')
+            mz, intensity = mz[order], intensity[order]
+        self.mz = mz
+        self.intensity = intensity
+        # levels[L - 1] is an (n_buckets, 2) array of (argmin, argmax) indices
+        self.levels = []
+        low = high = np.arange(len(mz))
+        while len(low) > 1:
+            low, high = self._coarsen(low, high)
+            self.levels.append(np.stack([low, high], axis=1))
+
+    def _coarsen(self, low, high):
+        # Group LOD_FACTOR buckets, padding the last group with its final bucket
+        pad = -len(low) % LOD_FACTOR
+        if pad:
+            low = np.concatenate([low, np.repeat(low[-1:], pad)])
+            high = np.concatenate([high, np.repeat(high[-1:], pad)])
+        low = low.reshape(-1, LOD_FACTOR)
+        high = high.reshape(-1, LOD_FACTOR)
+        rows = np.arange(len(low))
+        low = low[rows, np.argmin(self.intensity[low], axis=1)]
+        high = high[rows, np.argmax(self.intensity[high], axis=1)]
+        return low, high
+
+    def __len__(self):
+        return len(self.mz)
+
+    def visible(self, xmin, xmax, n_pixels):
+        """
+        Points to draw for the m/z window [xmin, xmax] on n_pixels columns:
+        the raw points when few enough, otherwise the min and max of each
+        bucket at the coarsest level still finer than a pixel. One point
+        either side of the window is kept so the line runs to the edges.
+
+        Returns:
+            (mz, intensity) in m/z order
+        """
+        lo = max(np.searchsorted(self.mz, xmin, side='left') - 1, 0)
+        hi = min(np.searchsorted(self.mz, xmax, side='right') + 1, len(self.mz))
+        n_points = hi - lo
+        n_pixels = max(int(n_pixels), 1)
+        if n_points <= RAW_POINTS_PER_PIXEL * n_pixels or not self.levels:
+            return self.mz[lo:hi], self.intensity[lo:hi]
+
+        # Buckets of at most n_points / n_pixels points, so about one per pixel
+        level = int(np.floor(np.log(n_points / n_pixels) / np.log(LOD_FACTOR)))
+        level = min(max(level, 1), len(self.levels))
+        bucket = LOD_FACTOR ** level
+        indices = self.levels[level - 1][lo // bucket:(hi - 1) // bucket + 1]
+        indices = np.sort(indices, axis=1).ravel()
+        return self.mz[indices], self.intensity[indices]
+
+    def extent(self):
+        """((xmin, xmax), (ymin, ymax)) over the whole spectrum"""
+        if not len(self.mz):
+            return (0.0, 1.0), (0.0, 1.0)
+        return (self.mz[0], self.mz[-1]), (self.intensity.min(), self.intensity.max())
+
+
+class LODLine:
+    """
+    A matplotlib line drawn from a MinMaxPyramid, refreshed with only the
+    visible window at about screen resolution whenever the x limits change
+    (toolbar zoom and pan, or set_xlim).
+
+    Args:
+        ax: Axes to draw on
+        pyramid: MinMaxPyramid of the spectrum
+        scale: Divisor applied to intensities as drawn
+    """
+
+    def __init__(self, ax, pyramid, scale=1.0, **line_kwargs):
+        self.ax = ax
+        self.pyramid = pyramid
+        self.scale = scale
+        self.line, = ax.plot([], [], **line_kwargs)
+        self.reset_view()
+        self._callback = ax.callbacks.connect('xlim_changed', self.refresh)
+
+    def refresh(self, ax=None):
+        xmin, xmax = self.ax.get_xlim()
+        mz, intensity = self.pyramid.visible(xmin, xmax, self.ax.bbox.width)
+        self.line.set_data(mz, intensity / self.scale)
+        self.ax.figure.canvas.draw_idle()
+
+    def reset_view(self):
+        """Show the whole spectrum, with a small vertical margin"""
+        (xmin, xmax), (ymin, ymax) = self.pyramid.extent()
+        ymin, ymax = ymin / self.scale, ymax / self.scale
+        margin = 0.05 * (ymax - ymin) or 1.0
+        self.ax.set_ylim(ymin - margin, ymax + margin)
+        self.ax.set_xlim(xmin, xmax)
+        self.refresh()
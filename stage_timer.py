@@ -0,0 +1,50 @@
+import time
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """
+    Accumulate wall-clock time per processing stage.
+
+    Stages can be entered many times (once per well, or once per poll in live
+    mode); their times are summed.
+
+    Example:
+        timer = StageTimer()
+        with timer.stage('segmentation'):
+            segmentation = segment_wells(Y, scans)
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.totals = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.totals[name] = self.totals.get(name, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def to_dict(self):
+        """Stage totals and overall wall time in seconds, for the processing summary"""
+        timings = {name: round(seconds, 4) for name, seconds in self.totals.items()}
+        timings['total'] = round(self.elapsed(), 4)
+        return timings
+
+
+def format_timings(timings, n_wells=0):
+    """One-line summary of stage timings, e.g. for the progress dialog"""
+    parts = [f"{name.replace('_', ' ')} {seconds:.1f}s" for name, seconds in timings.items() if name != 'total']
+    if 'total' in timings:
+        parts.append(f"total {timings['total']:.1f}s")
+    if n_wells:
+        parts.append(f"{timings.get('total', 0.0) / n_wells:.2f}s/well")
+    return ' | '.join(parts)
@@ -0,0 +1,139 @@
+import csv
+import numpy as np
+import pandas as pd
+
+# Tolerance for targets that don't give one
+DEFAULT_TOLERANCE_PPM = 10
+# Well x target pairs searched in one call
+TARGET_BLOCK_SIZE = 4_000_000
+
+# Accepted header names, lower case
+MZ_COLUMNS = ('mz', 'm/z', 'mass', 'target_mz')
+NAME_COLUMNS = ('name', 'compound', 'target', 'id')
+DELIMITERS = ',\t;'
+
+
+class TargetList:
+    """
+    m/z windows to extract, one per target
+
+    Attributes:
+        names: Column label of each target
+        mz: Target m/z
+        lower, upper: Window edges, mz minus and plus the tolerance
+    """
+
+    def __init__(self, names, mz, lower, upper):
+        self.names = [str(name) for name in names]
+        self.mz = np.asarray(mz, dtype=np.float64)
+        self.lower = np.asarray(lower, dtype=np.float64)
+        self.upper = np.asarray(upper, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.mz)
+
+
+def _column(df, names):
+    for name in names:
+        if name in df.columns:
+            return df[name]
+    return None
+
+
+def _delimiter(path):
+    # Sniff among the accepted delimiters only; an unrestricted sniff splits
+    # a one-column file on a letter of its header
+    with open(path, 'r', newline='') as f:
+        sample = f.read(64 * 1024)
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=DELIMITERS).delimiter
+    except csv.Error:
+        return ','
+
+
+def read_target_list(path, default_ppm=DEFAULT_TOLERANCE_PPM):
+    """
+    Read targets from a delimited text file with a header row (comma, tab or
+    semicolon separated; header names are case-insensitive).
+
+    Columns:
+        mz: Target m/z (required; also "m/z", "mass")
+        name: Label for the target (optional; also "compound", "target", "id")
+        ppm or da: Tolerance either side of mz
+        tolerance and unit: Alternatively, a tolerance with unit "ppm" or "Da"
+    Rows without a tolerance use default_ppm; rows without an m/z are skipped.
+
+    Returns:
+        TargetList
+    """
+    df = pd.read_csv(path, sep=_delimiter(path))
+    df.columns = [str(column).strip().lower() for column in df.columns]
+
+    mz = _column(df, MZ_COLUMNS)
+    if mz is None:
+        raise ValueError(f"No m/z column in {path}, expected one of {', '.join(MZ_COLUMNS)}")
+    mz = pd.to_numeric(mz, errors='coerce').to_numpy(dtype=np.float64)
+
+    # Half-width of each window in Da
+    width = mz * default_ppm * 1e-6
+    if 'tolerance' in df.columns:
+        tolerance = pd.to_numeric(df['tolerance'], errors='coerce').to_numpy(dtype=np.float64)
+        if 'unit' in df.columns:
+            is_da = (df['unit'].astype(str).str.strip().str.lower() == 'da').to_numpy()
+        else:
+            is_da = np.zeros(len(df), dtype=bool)
+        given = np.where(is_da, tolerance, mz * tolerance * 1e-6)
+        width = np.where(np.isfinite(given), given, width)
+    for column, to_da in (('ppm', lambda t: mz * t * 1e-6), ('da', lambda t: t)):
+        if column in df.columns:
+            given = to_da(pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64))
+            width = np.where(np.isfinite(given), given, width)
+
+    names = _column(df, NAME_COLUMNS)
+    names = (names.astype(str).to_numpy() if names is not None
+             else np.array([f"{value:.4f}" for value in mz]))
+
+    valid = np.isfinite(mz)
+    if not valid.all():
+        print(f"Skipped {int((~valid).sum())} targets without an m/z in {path}")
+    width = np.abs(width[valid])
+    return TargetList(names[valid], mz[valid], mz[valid] - width, mz[valid] + width)
+
+
+def extract_targets(engine, targets, wells=None, statistic='mean'):
+    """
+    Wells x targets intensity matrix in one vectorized pass over the engine's
+    prefix-sum index: every window edge of every well is located with a single
+    searchsorted call (in blocks of wells to bound memory), whatever the number
+    of targets.
+
+    Args:
+        engine: SpectrumEngine; its normalization scale is applied
+        targets: TargetList
+        wells: Wells to extract, defaults to all in engine order
+        statistic: 'mean' intensity of the points in each window (as the
+            heatmap), or their 'sum'
+
+    Returns:
+        wells x targets float array, NaN for a mean with no points in the window
+    """
+    if statistic not in ('mean', 'sum'):
+        raise ValueError(f"Unknown statistic: {statistic}")
+    wells = list(engine.well_ids) if wells is None else list(wells)
+    matrix = np.empty((len(wells), len(targets)), dtype=np.float64)
+    step = max(1, TARGET_BLOCK_SIZE // max(len(targets), 1))
+    for start in range(0, len(wells), step):
+        sums, counts = engine.window_stats(targets.lower, targets.upper, wells[start:start + step])
+        if statistic == 'sum':
+            matrix[start:start + step] = sums
+        else:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                matrix[start:start + step] = np.where(counts > 0, sums / counts, np.nan)
+    return matrix
+
+
+def export_target_matrix(path, wells, targets, matrix):
+    """Write the matrix as CSV, one row per well and one column per target"""
+    df = pd.DataFrame(matrix, columns=targets.names)
+    df.insert(0, 'Well', list(wells))
+    df.to_csv(path, index=False)
@@ -0,0 +1,34 @@
+"""
+Stand-in for maldichrom.exe in tests.
+
+Takes the same -d, -p and -w arguments, waits --delay seconds, then creates
+the output .raw folder with a copy of the scan series file it was given, so a
+test can check which scans each job asked for.
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', dest='raw_in', required=True)
+    parser.add_argument('-p', dest='scans', required=True)
+    parser.add_argument('-w', dest='raw_out', required=True)
+    parser.add_argument('--delay', type=float, default=0.2)
+    parser.add_argument('--exit-code', type=int, default=0)
+    args = parser.parse_args()
+
+    time.sleep(args.delay)
+    if args.exit_code:
+        sys.stderr.write("stub failure\n")
+        return args.exit_code
+    os.makedirs(args.raw_out, exist_ok=True)
+    shutil.copy(args.scans, os.path.join(args.raw_out, 'scans.txt'))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
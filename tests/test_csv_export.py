@@ -0,0 +1,66 @@
+import csv
+import gzip
+
+import numpy as np
+import pytest
+
+import csv_export
+from csv_export import write_spectrum_csv
+
+
+def csv_writer_bytes(path, masses, intens):
+    # The original per-row writer
+    with open(path, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        for i in range(len(masses)):
+            writer.writerow([masses[i], intens[i]])
+    return path.read_bytes()
+
+
+def random_spectrum(n=500, dtype=np.float64, seed=0):
+    rng = np.random.default_rng(seed)
+    masses = np.sort(rng.uniform(50.0, 1200.0, n)).astype(dtype)
+    intens = (rng.exponential(1e4, n) * (rng.random(n) > 0.3)).astype(dtype)
+    intens[:3] = [0.0, 1e-12, 12345678.9]
+    return masses, intens
+
+
+@pytest.mark.parametrize('dtype', [np.float64, np.float32])
+def test_default_output_is_identical_to_csv_writer(tmp_path, dtype):
+    masses, intens = random_spectrum(dtype=dtype)
+    expected = csv_writer_bytes(tmp_path / 'expected.csv', masses, intens)
+    path = write_spectrum_csv(str(tmp_path / 'well.csv'), masses, intens)
+    assert path == str(tmp_path / 'well.csv')
+    assert open(path, 'rb').read() == expected
+
+
+def test_lists_blocks_and_empty_spectra_match_csv_writer(tmp_path, monkeypatch):
+    masses, intens = random_spectrum(n=57)
+    monkeypatch.setattr(csv_export, 'ROWS_PER_BLOCK', 10)
+    for m, i in ((masses.tolist(), intens.tolist()), (masses, intens), ([], [])):
+        expected = csv_writer_bytes(tmp_path / 'expected.csv', m, i)
+        path = write_spectrum_csv(str(tmp_path / 'well.csv'), m, i)
+        assert open(path, 'rb').read() == expected
+    assert expected == b''
+
+
+def test_precision_and_drop_zeros(tmp_path):
+    masses = np.array([100.123456, 200.5, 300.0])
+    intens = np.array([1.0 / 3.0, 0.0, 2.0])
+    path = write_spectrum_csv(str(tmp_path / 'well.csv'), masses, intens, precision=3, drop_zeros=True)
+    assert open(path, 'rb').read() == b'100.123,0.333\r\n300.000,2.000\r\n'
+
+    data = np.loadtxt(write_spectrum_csv(str(tmp_path / 'well.csv'), masses, intens, precision=4),
+                      delimiter=',')
+    np.testing.assert_allclose(data, np.column_stack([masses, intens]), atol=5e-5)
+
+
+def test_gzip_output(tmp_path):
+    masses, intens = random_spectrum(n=100, seed=1)
+    expected = csv_writer_bytes(tmp_path / 'expected.csv', masses, intens)
+    path = write_spectrum_csv(str(tmp_path / 'well.csv'), masses, intens, compress=True)
+    assert path == str(tmp_path / 'well.csv.gz')
+    with gzip.open(path, 'rb') as f:
+        assert f.read() == expected
+    # The suffix isn't doubled
+    assert write_spectrum_csv(path, masses, intens, compress=True) == path
@@ -0,0 +1,76 @@
+import json
+
+import numpy as np
+
+import live_watch
+from live_watch import LiveRunWatcher, WELL_PROGRESS_FILE
+from spectrum_extractor import SyntheticScanSource
+
+
+class GrowingReader:
+    """Fake WatersIMGReader over a run that can have scans appended"""
+
+    def __init__(self):
+        self.Y = []
+        self.scans = []
+
+    def append(self, position, n_scans):
+        for _ in range(n_scans):
+            scan = len(self.scans) + 1
+            self.Y.append(float(position))
+            self.scans.append((np.array([100.0 + scan]), np.array([1.0])))
+
+    def getTotalScans(self):
+        return len(self.scans)
+
+    def getMassRange(self):
+        return 99.0, 151.0
+
+    def getXYCoordinates(self):
+        Y = np.array(self.Y)
+        return np.zeros(len(Y)), Y, len(Y)
+
+    def getCombinedScans(self, first, last, *args):
+        masses, intens = SyntheticScanSource(self.scans, (99.0, 151.0)).combined_spectrum(first, last)
+        return masses, intens, len(masses)
+
+
+def write_progress(raw_path, wells, finished=False):
+    progress = {'completed_wells': [{'well_id': well} for well in wells], 'finished': finished}
+    (raw_path / WELL_PROGRESS_FILE).write_text(json.dumps(progress))
+
+
+def test_finish_redoes_wells_logged_before_their_last_scans(tmp_path, monkeypatch):
+    raw_path = tmp_path / 'plate.raw'
+    raw_path.mkdir()
+    reader = GrowingReader()
+    monkeypatch.setattr(live_watch, 'open_reader', lambda path: reader)
+
+    # A1 is logged as complete while only 3 of its 5 scans are in the file
+    reader.append(0, 3)
+    write_progress(raw_path, ['A1'])
+    watcher = LiveRunWatcher(str(raw_path), ['Selected', 'Wells:', 'A1', 'B1'],
+                             settings={'extraction_mode': 'direct', 'output_format': 'csv'},
+                             poll_interval=0, log=lambda message: None)
+
+    def stop_after_first_poll(seconds):
+        watcher.cancelled = True
+    monkeypatch.setattr(live_watch.time, 'sleep', stop_after_first_poll)
+    watcher.run()
+    assert watcher.converter.scan_ranges == {0: (1, 3)}
+
+    # The rest of A1 and all of B1 arrive, then the run ends
+    reader.append(0, 2)
+    reader.append(1, 4)
+    write_progress(raw_path, ['A1', 'B1'], finished=True)
+    summary_file = watcher.finish(reader)
+
+    assert watcher.converter.scan_ranges == {0: (1, 5), 1: (6, 9)}
+    csv_file = tmp_path / 'plate.raw' / 'CSVoutputs' / 'plate_A1.csv'
+    masses = np.loadtxt(csv_file, delimiter=',', ndmin=2)[:, 0]
+    np.testing.assert_allclose(masses, 100.0 + np.arange(1, 6), atol=0.01)
+    with open(summary_file) as f:
+        summary = json.load(f)
+    ranges = {well['well_id']: well['scan_range'] for well in summary['processed_wells']}
+    assert ranges['A1'] == {'start': 1, 'end': 5, 'n_scans': 5}
+    assert ranges['B1'] == {'start': 6, 'end': 9, 'n_scans': 4}
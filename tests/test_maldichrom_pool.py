@@ -0,0 +1,50 @@
+import os
+import sys
+
+from maldichrom_pool import MaldichromPool, ExtractionJob
+
+STUB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stub_maldichrom.py')
+
+
+def stub_command(*extra):
+    return [sys.executable, STUB, '-d', '{raw_in}', '-p', '{scans}', '-w', '{raw_out}', *extra]
+
+
+def make_jobs(tmp_path, ranges):
+    return [ExtractionJob(f"A{i + 1}", start, end, str(tmp_path / 'plate.raw'),
+                          str(tmp_path / f"A{i + 1}.raw"), str(tmp_path / f"scans_A{i + 1}.txt"))
+            for i, (start, end) in enumerate(ranges)]
+
+
+def test_jobs_are_reported_after_the_process_exits(tmp_path):
+    ranges = [(1, 5), (6, 9), (10, 10), (11, 20)]
+    jobs = make_jobs(tmp_path, ranges)
+    pool = MaldichromPool(max_workers=2, command=stub_command())
+
+    finished = []
+    for job in pool.run(jobs):
+        # The stub only writes its output just before exiting
+        assert job.succeeded, job.error
+        assert os.path.isdir(job.raw_out)
+        finished.append(job.well_id)
+    assert sorted(finished) == ['A1', 'A2', 'A3', 'A4']
+
+    for job, (start, end) in zip(jobs, ranges):
+        # Each job read its own scans file, which was removed afterwards
+        with open(os.path.join(job.raw_out, 'scans.txt')) as f:
+            assert f.read() == ''.join(f"1\t{i}\n" for i in range(start, end + 1))
+        assert not os.path.exists(job.scans_file)
+    assert len({job.scans_file for job in jobs}) == len(jobs)
+
+
+def test_failed_and_hung_extractions(tmp_path):
+    failing = MaldichromPool(max_workers=1, command=stub_command('--exit-code', '3'))
+    job, = failing.run(make_jobs(tmp_path, [(1, 2)]))
+    assert job.returncode == 3
+    assert 'code 3' in job.error and 'stub failure' in job.error
+
+    hung = MaldichromPool(max_workers=1, command=stub_command('--delay', '30'), timeout=0.5)
+    job, = hung.run(make_jobs(tmp_path, [(1, 2)]))
+    assert not job.succeeded
+    assert job.error.startswith('Timed out')
+    assert job.elapsed < 10
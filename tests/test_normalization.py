@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import normalization
+from normalization import normalization_scale, INTERNAL_STANDARD_PPM
+from spectrum_engine import SpectrumEngine
+
+BIN_WIDTH = 0.01
+STANDARD_MZ = 200.5
+
+
+def random_engine(seed=0, n_wells=9, dense=False):
+    """Random wells sharing some bins; all but the last carry an internal standard peak"""
+    rng = np.random.default_rng(seed)
+    grid = np.arange(200.0, 201.0, 0.002)
+    spectra = {}
+    for i in range(n_wells):
+        mz = rng.choice(grid[np.abs(grid - STANDARD_MZ) > 0.01], size=int(rng.integers(20, 120)), replace=False)
+        intensity = rng.exponential(50.0, len(mz)) * (i + 1)
+        if i < n_wells - 1:
+            mz = np.append(mz, STANDARD_MZ + rng.uniform(-1e-3, 1e-3))
+            intensity = np.append(intensity, rng.uniform(10.0, 20.0))
+        spectra[f'W{i}'] = (mz, intensity)
+    return spectra, SpectrumEngine.from_spectra(spectra, BIN_WIDTH, dense=dense)
+
+
+def expected_pqn(matrix, tic):
+    # Median over wells of the nonzero TIC-normalized values, on bins in at least half the wells
+    frame = pd.DataFrame(matrix / tic[:, None])
+    frame = frame.loc[:, (matrix != 0).sum(axis=0) * 2 >= len(matrix)].replace(0.0, np.nan)
+    quotients = (frame / frame.median(axis=0)).median(axis=1).to_numpy()
+    return np.where(np.isfinite(quotients) & (quotients > 0), quotients, 1.0)
+
+
+@pytest.mark.parametrize('dense', [False, True])
+def test_scales_match_direct_formulas(dense):
+    spectra, engine = random_engine(dense=dense)
+    matrix = engine.slice()[1].astype(np.float64)
+    tic = np.array([intensity.sum() for _, intensity in spectra.values()])
+
+    assert normalization_scale(engine, 'none') is None
+    np.testing.assert_allclose(normalization_scale(engine, 'tic'), tic, rtol=1e-9)
+    nonzero = (matrix != 0).sum(axis=1)
+    np.testing.assert_allclose(normalization_scale(engine, 'rms'),
+                               np.sqrt((matrix ** 2).sum(axis=1) / nonzero), rtol=1e-6)
+    np.testing.assert_allclose(normalization_scale(engine, 'max_peak'), matrix.max(axis=1), rtol=1e-6)
+    np.testing.assert_allclose(normalization_scale(engine, 'median_fold_change'),
+                               tic * expected_pqn(matrix, tic), rtol=1e-5)
+
+
+def test_internal_standard_is_the_mean_in_the_ppm_window():
+    spectra, engine = random_engine(1)
+    width = STANDARD_MZ * INTERNAL_STANDARD_PPM * 1e-6
+    expected = np.array([pd.Series(intensity)[(mz >= STANDARD_MZ - width) & (mz <= STANDARD_MZ + width)].mean()
+                         for mz, intensity in spectra.values()])
+    assert np.isnan(expected[-1]) and np.isfinite(expected[:-1]).all()
+
+    scale = normalization_scale(engine, 'internal_standard', standard_mz=STANDARD_MZ)
+    np.testing.assert_allclose(scale, expected, rtol=1e-9)
+
+    # Wells without the standard are left unscaled
+    engine.set_row_scale(scale)
+    raw = engine.range_means((200.0, 201.0), raw=True)
+    divisor = np.where(scale > 0, scale, 1.0)
+    np.testing.assert_allclose(engine.range_means((200.0, 201.0)), raw / divisor, rtol=1e-12)
+    assert engine.scale_of('W8') == 1.0
+
+    with pytest.raises(ValueError):
+        normalization_scale(engine, 'internal_standard')
+
+
+def test_median_fold_change_is_the_same_in_small_blocks(monkeypatch):
+    _, engine = random_engine(2, n_wells=15)
+    expected = normalization_scale(engine, 'median_fold_change')
+    monkeypatch.setattr(normalization, 'MEDIAN_BLOCK_ELEMENTS', 40)
+    np.testing.assert_allclose(normalization_scale(engine, 'median_fold_change'), expected, rtol=1e-12)
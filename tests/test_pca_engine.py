@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from scipy import sparse
+
+from pca_engine import randomized_pca, column_stats, PCACancelled
+
+
+def random_matrix(seed=0, n_wells=40, n_bins=300, density=0.1):
+    """Sparse wells x bins intensities with a few strong directions, plus constant and empty columns"""
+    rng = np.random.default_rng(seed)
+    loadings = rng.standard_normal((3, n_bins)) * [[8.0], [4.0], [2.0]]
+    X = np.abs(rng.standard_normal((n_wells, 3)) @ loadings + rng.standard_normal((n_wells, n_bins)))
+    X *= rng.random((n_wells, n_bins)) < density * 5
+    X[:, 0] = 3.0
+    X[:, 1] = 0.0
+    return X.astype(np.float32)
+
+
+def full_pca(X, standardize):
+    X = np.asarray(X, dtype=np.float64)
+    std = X.std(axis=0)
+    A = (X - X.mean(axis=0)) / (np.where(std > 0, std, 1.0) if standardize else 1.0)
+    U, s, Vt = np.linalg.svd(A, full_matrices=False)
+    n = len(X)
+    return U * s, s ** 2 / (n - 1), (s ** 2) / np.sum(s ** 2)
+
+
+@pytest.mark.parametrize('standardize', [True, False])
+@pytest.mark.parametrize('as_sparse', [False, True])
+def test_scores_match_full_svd_up_to_sign(standardize, as_sparse):
+    X = random_matrix()
+    scores, variance, ratio = full_pca(X, standardize)
+    result = randomized_pca(sparse.csr_matrix(X) if as_sparse else X, n_components=3,
+                            standardize=standardize, wells=range(len(X)))
+
+    assert result.scores.shape == (len(X), 3)
+    assert result.wells == list(range(len(X)))
+    for component in range(3):
+        sign = np.sign(np.dot(result.scores[:, component], scores[:, component]))
+        np.testing.assert_allclose(result.scores[:, component] * sign, scores[:, component],
+                                   rtol=1e-4, atol=1e-4 * np.abs(scores[:, component]).max())
+    np.testing.assert_allclose(result.explained_variance, variance[:3], rtol=1e-5)
+    np.testing.assert_allclose(result.explained_variance_ratio, ratio[:3], rtol=1e-5)
+
+
+def test_column_stats_match_numpy():
+    X = random_matrix(1)
+    for matrix in (X, sparse.csr_matrix(X)):
+        mean, std = column_stats(matrix)
+        np.testing.assert_allclose(mean, X.astype(np.float64).mean(axis=0), rtol=1e-6, atol=1e-9)
+        np.testing.assert_allclose(std, X.astype(np.float64).std(axis=0), rtol=1e-4, atol=1e-6)
+
+
+def test_components_are_capped_and_cancel_stops():
+    X = random_matrix(2, n_wells=4, n_bins=10)
+    assert randomized_pca(X, n_components=8).n_components == 4
+    with pytest.raises(PCACancelled):
+        randomized_pca(X, is_cancelled=lambda: True)
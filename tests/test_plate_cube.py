@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+import plate_cube
+from plate_cube import PlateCubeWriter, PlateCubeRows, load_plate_cube, load_plate_cube_header, WELLS_PER_CHUNK
+from spectrum_extractor import bin_spectrum
+
+MASS_RANGE = (100.0, 110.0)
+BIN_WIDTH = 0.01
+
+
+def write_cube(path, n_wells, seed=0):
+    """Write a cube of random wells, returning {well: binned row}"""
+    rng = np.random.default_rng(seed)
+    writer = PlateCubeWriter(MASS_RANGE, BIN_WIDTH, metadata={'run_name': 'plate'})
+    rows = {}
+    for i in range(n_wells):
+        masses = rng.uniform(*MASS_RANGE, size=int(rng.integers(0, 40)))
+        intens = rng.exponential(10.0, len(masses))
+        well = f'W{i:03d}'
+        writer.add_well(well, masses, intens)
+        rows[well] = bin_spectrum(masses, intens, writer.mz_min, BIN_WIDTH, writer.n_bins)
+    writer.save(str(path))
+    return writer, rows
+
+
+@pytest.mark.parametrize('n_wells', [1, WELLS_PER_CHUNK, 2 * WELLS_PER_CHUNK + 5])
+def test_save_and_load_round_trip(tmp_path, n_wells):
+    path = tmp_path / 'plate_plate_cube.npz'
+    writer, rows = write_cube(path, n_wells)
+    cube = load_plate_cube(str(path))
+
+    assert cube.well_ids == list(rows)
+    assert cube.intensity.dtype == np.float32
+    assert cube.intensity.shape == (n_wells, writer.n_bins)
+    np.testing.assert_array_equal(cube.mz, writer.mz)
+    np.testing.assert_array_equal(cube.intensity, np.vstack(list(rows.values())))
+    assert cube.metadata['run_name'] == 'plate'
+    assert cube.metadata['n_wells'] == n_wells
+    assert cube.metadata['bin_width'] == BIN_WIDTH
+
+    last = list(rows)[-1]
+    mz, intensity = cube.spectrum(last)
+    nonzero = np.flatnonzero(rows[last])
+    np.testing.assert_array_equal(mz, writer.mz[nonzero])
+    np.testing.assert_array_equal(intensity, rows[last][nonzero])
+
+    mz, well_ids, metadata = load_plate_cube_header(str(path))
+    assert well_ids == list(rows) and metadata == cube.metadata
+
+
+def test_rows_read_through_chunk_cache(tmp_path, monkeypatch):
+    path = tmp_path / 'plate_plate_cube.npz'
+    n_wells = 3 * WELLS_PER_CHUNK + 7  # last chunk only partly filled
+    _, rows = write_cube(path, n_wells, seed=1)
+    expected = np.vstack(list(rows.values()))
+    reader = PlateCubeRows(str(path), cached_chunks=2)
+
+    loads = []
+    real_load = np.load
+    monkeypatch.setattr(plate_cube.np, 'load', lambda *args, **kwargs: loads.append(args[0]) or real_load(*args, **kwargs))
+    for row in range(n_wells):
+        np.testing.assert_array_equal(reader.row(row), expected[row])
+    # Rows in order inflate each chunk once
+    assert len(loads) == 4
+    assert len(reader._chunks) == 2
+
+    # The partial last chunk is still cached; the first has been evicted
+    reader.row(n_wells - 1)
+    assert len(loads) == 4
+    np.testing.assert_array_equal(reader.row(0), expected[0])
+    assert len(loads) == 5
+
+
+
+def test_adding_a_well_again_replaces_it(tmp_path):
+    writer = PlateCubeWriter(MASS_RANGE, BIN_WIDTH)
+    writer.add_well('A1', [101.0], [1.0])
+    writer.add_well('A2', [102.0], [2.0])
+    writer.add_well('A1', [101.0, 103.0], [5.0, 6.0])
+    path = writer.save(str(tmp_path / 'plate_plate_cube.npz'))
+
+    cube = load_plate_cube(path)
+    assert cube.well_ids == ['A1', 'A2']
+    mz, intensity = cube.spectrum('A1')
+    np.testing.assert_allclose(mz, [101.005, 103.005])
+    np.testing.assert_array_equal(intensity, [5.0, 6.0])
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+from range_index import RangeIndex
+
+
+def random_spectra(seed=0, n_wells=12):
+    """Per-well DataFrames as the viewer loads them: unique, unsorted m/z values"""
+    rng = np.random.default_rng(seed)
+    spectra = {}
+    for i in range(n_wells):
+        n_points = int(rng.integers(0, 60)) if i else 0  # the first well is empty
+        mz = rng.choice(np.arange(100.0, 110.0, 0.001), size=n_points, replace=False)
+        spectra[f'W{i:02d}'] = pd.DataFrame({'mass_to_charge': mz, 'intensity': rng.exponential(100.0, n_points)})
+    return spectra
+
+
+def masked_means(spectra, mass_range):
+    # The viewer's original per-well mask and mean
+    return np.array([df.loc[(df['mass_to_charge'] >= mass_range[0]) &
+                            (df['mass_to_charge'] <= mass_range[1]), 'intensity'].mean()
+                     for df in spectra.values()])
+
+
+def build_index(spectra):
+    return RangeIndex(list(spectra), [(df['mass_to_charge'].to_numpy(), df['intensity'].to_numpy())
+                                      for df in spectra.values()])
+
+
+def test_range_means_match_masked_mean():
+    spectra = random_spectra()
+    index = build_index(spectra)
+    rng = np.random.default_rng(1)
+    ranges = [tuple(sorted(rng.uniform(99.0, 111.0, 2))) for _ in range(50)]
+    # Ranges outside the data, empty, and with edges exactly on a point
+    df = spectra['W03']
+    edge = float(df['mass_to_charge'].iloc[0])
+    ranges += [(90.0, 95.0), (120.0, 130.0), (105.0, 105.0), (edge, edge), (edge, 110.0), (100.0, edge)]
+
+    for mass_range in ranges:
+        expected = masked_means(spectra, mass_range)
+        means = index.range_means(mass_range)
+        np.testing.assert_array_equal(np.isnan(means), np.isnan(expected))
+        np.testing.assert_allclose(means, expected, rtol=1e-9)
+
+    # A zero-width range still finds the point on it
+    means = index.range_means((edge, edge), wells=['W03'])
+    np.testing.assert_allclose(means, [df['intensity'].iloc[0]], rtol=1e-9)
+    assert np.isnan(index.range_means((100.0, 110.0), wells=['W00'])).all()
+
+
+def test_window_stats_match_masked_sums_and_counts():
+    spectra = random_spectra(2)
+    index = build_index(spectra)
+    rng = np.random.default_rng(3)
+    lower = rng.uniform(99.0, 110.0, 20)
+    upper = lower + rng.uniform(0.0, 2.0, 20)
+    wells = ['W05', 'W01', 'W07']
+
+    sums, counts = index.window_stats(lower, upper, wells)
+    assert sums.shape == counts.shape == (len(wells), len(lower))
+    for row, well in enumerate(wells):
+        mz = spectra[well]['mass_to_charge'].to_numpy()
+        intensity = spectra[well]['intensity'].to_numpy()
+        for column, (low, high) in enumerate(zip(lower, upper)):
+            mask = (mz >= low) & (mz <= high)
+            assert counts[row, column] == mask.sum()
+            np.testing.assert_allclose(sums[row, column], intensity[mask].sum(), rtol=1e-9, atol=1e-9)
+
+
+def test_weighted_points_and_round_trip():
+    rng = np.random.default_rng(4)
+    mz = [np.sort(rng.uniform(100.0, 101.0, n)) for n in (5, 0, 9)]
+    sums = [rng.uniform(1.0, 10.0, len(m)) for m in mz]
+    counts = [rng.integers(1, 5, len(m)).astype(np.float64) for m in mz]
+    index = RangeIndex(['A1', 'A2', 'A3'], list(zip(mz, sums, counts)))
+
+    # Bins carrying several raw points: the mean is total intensity over total points
+    expected = [s.sum() / c.sum() if len(s) else np.nan for s, c in zip(sums, counts)]
+    np.testing.assert_allclose(index.range_means((100.0, 101.0)), expected, rtol=1e-12)
+    np.testing.assert_array_equal(index.range_counts((100.0, 101.0)), [c.sum() for c in counts])
+
+    restored = RangeIndex.from_arrays(index.well_ids, *index.to_arrays())
+    np.testing.assert_array_equal(restored.range_means((100.2, 100.7)), index.range_means((100.2, 100.7)))
+    points = restored.well_points('A3')
+    np.testing.assert_allclose(points[0], mz[2], atol=1e-9)
+    np.testing.assert_allclose(points[1], sums[2], rtol=1e-12)
+    np.testing.assert_array_equal(points[2], counts[2])
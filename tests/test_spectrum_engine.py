@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from spectrum_engine import SpectrumEngine
+
+BIN_WIDTH = 0.01
+
+
+def random_spectra(seed=0, n_wells=10):
+    """(mz, intensity) per well with unique m/z values, several points per bin"""
+    rng = np.random.default_rng(seed)
+    spectra = {}
+    for i in range(n_wells):
+        n_points = int(rng.integers(1, 80))
+        mz = rng.choice(np.arange(200.0, 201.0, 0.0005), size=n_points, replace=False)
+        spectra[f'W{i:02d}'] = (mz, rng.exponential(50.0, n_points))
+    return spectra
+
+
+def binned_frame(spectra):
+    """The per-well DataFrame path: mean intensity per m/z bin, wells x bins, absent bins as 0"""
+    rows = {}
+    for well, (mz, intensity) in spectra.items():
+        df = pd.DataFrame({'bin': np.floor(mz / BIN_WIDTH).astype(np.int64), 'intensity': intensity})
+        rows[well] = df.groupby('bin')['intensity'].mean()
+    return pd.DataFrame(rows).T.sort_index(axis=1).fillna(0.0)
+
+
+def masked_means(spectra, mass_range):
+    return np.array([pd.Series(intensity)[(mz >= mass_range[0]) & (mz <= mass_range[1])].mean()
+                     for mz, intensity in spectra.values()])
+
+
+@pytest.mark.parametrize('dense', [False, True])
+def test_matrix_and_average_match_per_well_frames(dense):
+    spectra = random_spectra()
+    engine = SpectrumEngine.from_spectra(spectra, BIN_WIDTH, dense=dense)
+    expected = binned_frame(spectra)
+
+    mz, matrix = engine.slice()
+    columns = (engine.first_bin + np.arange(matrix.shape[1]))
+    frame = expected.reindex(columns=columns, fill_value=0.0)
+    np.testing.assert_allclose(matrix, frame.to_numpy(), rtol=1e-6)
+    np.testing.assert_allclose(mz, (columns + 0.5) * BIN_WIDTH)
+    np.testing.assert_allclose(engine.tic, [intensity.sum() for _, intensity in spectra.values()], rtol=1e-9)
+
+    avg_mz, average = engine.average_spectrum()
+    np.testing.assert_allclose(avg_mz, mz)
+    np.testing.assert_allclose(average, frame.mean(axis=0).to_numpy(), rtol=1e-5)
+
+    sparse_engine = SpectrumEngine.from_spectra(spectra, BIN_WIDTH, dense=dense, sparse_average=True)
+    avg_mz, average = sparse_engine.average_spectrum()
+    np.testing.assert_allclose(avg_mz, (expected.columns.to_numpy() + 0.5) * BIN_WIDTH)
+    np.testing.assert_allclose(average, expected.mean(axis=0).to_numpy(), rtol=1e-5)
+
+
+def test_range_means_match_masked_mean():
+    spectra = random_spectra(1)
+    engine = SpectrumEngine.from_spectra(spectra, BIN_WIDTH)
+    rng = np.random.default_rng(2)
+    for mass_range in [tuple(sorted(rng.uniform(199.9, 201.1, 2))) for _ in range(30)] + [(300.0, 301.0)]:
+        expected = masked_means(spectra, mass_range)
+        means = engine.range_means(mass_range)
+        np.testing.assert_array_equal(np.isnan(means), np.isnan(expected))
+        np.testing.assert_allclose(means, expected, rtol=1e-9)
+
+
+def test_row_scale_divides_every_result():
+    spectra = random_spectra(3)
+    engine = SpectrumEngine.from_spectra(spectra, BIN_WIDTH)
+    raw_means = engine.range_means((200.2, 200.8))
+    _, raw_matrix = engine.slice()
+    scale = np.linspace(0.5, 5.0, len(spectra))
+    scale[2] = 0.0  # left unscaled
+
+    snapshot = scale.copy()
+    engine.set_row_scale(scale)
+    scale[:] = 1.0  # the engine keeps its own copy
+    divisor = np.where(snapshot > 0, snapshot, 1.0)
+    np.testing.assert_allclose(engine.range_means((200.2, 200.8)), raw_means / divisor, rtol=1e-9)
+    np.testing.assert_allclose(engine.range_means((200.2, 200.8), raw=True), raw_means, rtol=1e-12)
+    _, matrix = engine.slice()
+    np.testing.assert_allclose(matrix, raw_matrix / divisor[:, None], rtol=1e-6)
+    np.testing.assert_allclose(engine.average_spectrum()[1], (raw_matrix / divisor[:, None]).mean(axis=0),
+                               rtol=1e-5)
+
+    # A snapshot passed in is used instead of the current scale
+    np.testing.assert_allclose(engine.range_means((200.2, 200.8), row_scale=np.ones(len(spectra))), raw_means)
+
+
+def test_from_arrays_round_trip():
+    spectra = random_spectra(4)
+    engine = SpectrumEngine.from_spectra(spectra, BIN_WIDTH)
+    arrays, scalars = engine.to_arrays()
+    restored = SpectrumEngine.from_arrays(engine.well_ids, arrays, scalars)
+
+    np.testing.assert_array_equal(restored.slice()[1], engine.slice()[1])
+    np.testing.assert_array_equal(restored.range_means((200.1, 200.6)), engine.range_means((200.1, 200.6)))
+    np.testing.assert_array_equal(restored.average_spectrum()[1], engine.average_spectrum()[1])
+    np.testing.assert_array_equal(restored.tic, engine.tic)
+    # Arrays are used in place
+    assert np.shares_memory(restored.matrix.data, arrays['matrix_data'])
+    assert np.shares_memory(restored.range_index.keys, arrays['index_keys'])
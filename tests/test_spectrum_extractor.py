@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from maldichrom_pool import write_series_file
+from spectrum_extractor import CombinedSpectrumExtractor, SyntheticScanSource
+from well_segmentation import segment_wells
+
+
+def synthetic_plate():
+    """Three wells of uneven length; scan i has a marker peak at 100 + i plus a shared peak"""
+    Y = np.repeat([10.0, 20.0, 30.0], [4, 1, 5])
+    scans = [(np.array([100.0 + i, 150.0]), np.array([float(i), 1.0])) for i in range(1, len(Y) + 1)]
+    return Y, SyntheticScanSource(scans, mass_range=(99.0, 151.0))
+
+
+def per_well_spectrum(source, start, end, tmp_path):
+    # Old path: scan series file -> maldichrom well file -> getCombinedScans(1, 1)
+    series_file = tmp_path / 'scans.txt'
+    write_series_file(series_file, start, end)
+    scan_numbers = [int(line.split('\t')[1]) for line in series_file.read_text().splitlines()]
+    return source.series(scan_numbers).combined_spectrum(1, 1)
+
+
+def test_direct_extraction_matches_per_well_path(tmp_path):
+    Y, source = synthetic_plate()
+    segmentation = segment_wells(Y, source.total_scans())
+    extractor = CombinedSpectrumExtractor(source, bin_width=0.01)
+
+    seen = []
+    for start, end in zip(segmentation.start_scans.tolist(), segmentation.end_scans.tolist()):
+        expected = extractor.bin_spectrum(*per_well_spectrum(source, start, end, tmp_path))
+        np.testing.assert_array_equal(extractor.extract(start, end), expected)
+
+        # Marker peaks are exactly the well's own scans, so no scan leaks across a boundary
+        masses, intens = source.combined_spectrum(start, end)
+        markers = masses[masses < 150] - 100
+        assert markers.tolist() == list(range(start, end + 1))
+        assert intens[masses == 150.0].tolist() == [end - start + 1]
+        seen.extend(markers.astype(int).tolist())
+    assert seen == list(range(1, len(Y) + 1))
+
+
+def test_scan_ranges_are_one_based_and_inclusive():
+    _, source = synthetic_plate()
+    masses, _ = source.combined_spectrum(1, 1)
+    assert masses.tolist() == [101.0, 150.0]
+    masses, _ = source.combined_spectrum(10, 10)
+    assert masses.tolist() == [110.0, 150.0]
+    for start, end in ((0, 1), (3, 2), (1, 11)):
+        with pytest.raises(ValueError):
+            source.combined_spectrum(start, end)
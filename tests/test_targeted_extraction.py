@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import targeted_extraction
+from spectrum_engine import SpectrumEngine
+from targeted_extraction import read_target_list, extract_targets, export_target_matrix, TargetList
+
+
+def random_spectra(seed=0, n_wells=11):
+    rng = np.random.default_rng(seed)
+    spectra = {}
+    for i in range(n_wells):
+        mz = rng.choice(np.arange(300.0, 302.0, 0.0005), size=int(rng.integers(0, 150)), replace=False)
+        spectra[f'W{i:02d}'] = (mz, rng.exponential(30.0, len(mz)))
+    return spectra
+
+
+def brute_force(spectra, wells, targets, statistic):
+    matrix = np.empty((len(wells), len(targets)))
+    for row, well in enumerate(wells):
+        mz, intensity = spectra[well]
+        for column, (low, high) in enumerate(zip(targets.lower, targets.upper)):
+            values = pd.Series(intensity[(mz >= low) & (mz <= high)])
+            matrix[row, column] = values.mean() if statistic == 'mean' else values.sum()
+    return matrix
+
+
+@pytest.mark.parametrize('statistic', ['mean', 'sum'])
+def test_extraction_matches_masked_windows(statistic, monkeypatch):
+    spectra = random_spectra()
+    engine = SpectrumEngine.from_spectra(spectra)
+    rng = np.random.default_rng(1)
+    mz = np.append(rng.uniform(299.9, 302.1, 25), 400.0)  # the last target is never hit
+    width = rng.uniform(0.0, 0.05, len(mz))
+    targets = TargetList([f'T{i}' for i in range(len(mz))], mz, mz - width, mz + width)
+    wells = ['W03', 'W00', 'W10', 'W07']
+
+    expected = brute_force(spectra, wells, targets, statistic)
+    matrix = extract_targets(engine, targets, wells, statistic)
+    np.testing.assert_array_equal(np.isnan(matrix), np.isnan(expected))
+    np.testing.assert_allclose(matrix, expected, rtol=1e-9, atol=1e-9)
+
+    # Same result when the wells are split into many blocks
+    monkeypatch.setattr(targeted_extraction, 'TARGET_BLOCK_SIZE', len(targets))
+    np.testing.assert_allclose(extract_targets(engine, targets, wells, statistic), expected, rtol=1e-9, atol=1e-9)
+
+    # The normalization scale is applied to the intensities
+    scale = np.arange(1.0, len(spectra) + 1)
+    engine.set_row_scale(scale)
+    divisor = scale[engine.rows_for(wells)][:, None]
+    np.testing.assert_allclose(extract_targets(engine, targets, wells, statistic), expected / divisor,
+                               rtol=1e-9, atol=1e-9)
+
+
+def test_read_target_list_tolerances(tmp_path):
+    path = tmp_path / 'targets.csv'
+    path.write_text('Name,m/z,Tolerance,Unit,ppm\n'
+                    'ppm target,500.0,5,ppm,\n'
+                    'da target,600.0,0.02,Da,\n'
+                    'column ppm,700.0,,,2\n'
+                    'default,800.0,,,\n'
+                    'no mz,,,,\n')
+    targets = read_target_list(str(path), default_ppm=10)
+
+    assert targets.names == ['ppm target', 'da target', 'column ppm', 'default']
+    np.testing.assert_allclose(targets.mz, [500.0, 600.0, 700.0, 800.0])
+    np.testing.assert_allclose(targets.upper - targets.mz, [500e-6 * 5, 0.02, 700e-6 * 2, 800e-6 * 10])
+    np.testing.assert_allclose(targets.mz - targets.lower, targets.upper - targets.mz)
+
+
+def test_read_target_list_without_names(tmp_path):
+    path = tmp_path / 'targets.tsv'
+    path.write_text('mass\n123.45678\n')
+    targets = read_target_list(str(path))
+    assert targets.names == ['123.4568']
+
+    path.write_text('name\nA\n')
+    with pytest.raises(ValueError):
+        read_target_list(str(path))
+
+
+def test_export_target_matrix(tmp_path):
+    targets = TargetList(['a', 'b'], [1.0, 2.0], [0.9, 1.9], [1.1, 2.1])
+    path = tmp_path / 'matrix.csv'
+    export_target_matrix(str(path), ['A1', 'A2'], targets, np.array([[1.0, np.nan], [3.0, 4.0]]))
+    frame = pd.read_csv(path)
+    assert list(frame.columns) == ['Well', 'a', 'b']
+    assert frame['Well'].tolist() == ['A1', 'A2']
+    assert np.isnan(frame['b'][0]) and frame['b'][1] == 4.0
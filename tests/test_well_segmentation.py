@@ -0,0 +1,21 @@
+import numpy as np
+
+from well_segmentation import segment_wells, extend_segmentation
+
+
+def test_extending_matches_segmenting_the_whole_run():
+    rng = np.random.default_rng(0)
+    # A stage path that revisits positions, split into polls at arbitrary points
+    Y = np.repeat(rng.integers(1, 12, size=60).astype(np.float64), rng.integers(1, 8, size=60))
+    cuts = [0, 1, 7, 7, 40, 41, 120, len(Y)]
+
+    segmentation = None
+    for start, end in zip(cuts[:-1], cuts[1:]):
+        segmentation = extend_segmentation(segmentation, Y[start:end])
+    expected = segment_wells(Y)
+
+    assert segmentation.total_scans == expected.total_scans == len(Y)
+    np.testing.assert_array_equal(segmentation.positions, expected.positions)
+    np.testing.assert_array_equal(segmentation.start_scans, expected.start_scans)
+    np.testing.assert_array_equal(segmentation.end_scans, expected.end_scans)
+    np.testing.assert_array_equal(segmentation.n_scans, expected.n_scans)
@@ -0,0 +1,126 @@
+import os
+import json
+import numpy as np
+from spectrum_engine import SpectrumEngine
+
+VIEWER_CACHE_DIR = '.viewer_cache'
+VIEWER_CACHE_VERSION = 3
+SPECTRUM_ARRAYS = ('mz', 'intensity', 'offsets')
+
+
+def viewer_cache_dir(folder):
+    return os.path.join(folder, VIEWER_CACHE_DIR)
+
+
+def source_signature(paths):
+    """Size and mtime of every source file, keyed by file name"""
+    signature = {}
+    for path in paths:
+        stat = os.stat(path)
+        signature[os.path.basename(path)] = [stat.st_size, stat.st_mtime_ns]
+    return signature
+
+
+class ViewerCache:
+    """
+    All spectra of a data folder in a few flat arrays, with the SpectrumEngine
+    built from them.
+
+    Well i's spectrum is mz[offsets[i]:offsets[i+1]] and the matching slice
+    of intensity. Arrays are memory-mapped, so opening the cache costs almost
+    nothing until a spectrum is used, and the engine is reopened over its
+    saved matrix and index instead of being rebuilt.
+    """
+
+    def __init__(self, well_ids, mz, intensity, offsets, engine_arrays, engine_scalars):
+        self.well_ids = list(well_ids)
+        self.mz = mz
+        self.intensity = intensity
+        self.offsets = offsets
+        self.engine_arrays = engine_arrays
+        self.engine_scalars = engine_scalars
+        self._rows = {well: i for i, well in enumerate(self.well_ids)}
+
+    def spectrum(self, well_id):
+        """Return (mz, intensity) views for one well"""
+        i = self._rows[well_id]
+        window = slice(int(self.offsets[i]), int(self.offsets[i + 1]))
+        return self.mz[window], self.intensity[window]
+
+    def spectra(self):
+        """Dictionary of well ID to (mz, intensity) views, in display order"""
+        return {well: self.spectrum(well) for well in self.well_ids}
+
+    def engine(self, dense=False):
+        """SpectrumEngine over the saved arrays"""
+        return SpectrumEngine.from_arrays(self.well_ids, self.engine_arrays, self.engine_scalars, dense)
+
+
+def save_viewer_cache(folder, spectra, engine, sources):
+    """
+    Write the consolidated cache for a folder.
+
+    Args:
+        spectra: Dictionary of well ID to (mz, intensity), in display order
+        engine: SpectrumEngine built from spectra
+        sources: Files the spectra were read from, used to invalidate the cache
+    """
+    cache_dir = viewer_cache_dir(folder)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Drop the old meta first, so half-rewritten arrays are never used
+        meta_file = os.path.join(cache_dir, 'meta.json')
+        if os.path.exists(meta_file):
+            os.remove(meta_file)
+        well_ids = list(spectra)
+        lengths = [len(spectra[well][0]) for well in well_ids]
+        arrays = {
+            'mz': np.concatenate([np.asarray(spectra[well][0], dtype=np.float64) for well in well_ids]),
+            'intensity': np.concatenate([np.asarray(spectra[well][1], dtype=np.float64) for well in well_ids]),
+            'offsets': np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        }
+        engine_arrays, engine_scalars = engine.to_arrays()
+        arrays.update({f'engine_{name}': array for name, array in engine_arrays.items()})
+        for name, array in arrays.items():
+            np.save(os.path.join(cache_dir, f'{name}.npy'), array)
+
+        # Meta is written last, so a cache interrupted mid-write never validates
+        meta = {'version': VIEWER_CACHE_VERSION, 'well_ids': well_ids,
+                'sources': source_signature(sources),
+                'engine_arrays': list(engine_arrays), 'engine': engine_scalars}
+        tmp_path = os.path.join(cache_dir, 'meta.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_path, meta_file)
+    except Exception as e:
+        print(f"Error saving viewer cache: {e}")
+
+
+def load_viewer_cache(folder, sources, bin_width=None, sparse_average=None):
+    """
+    Open the cache for a folder, or return None if it is missing, any source
+    file has been added, removed or changed since it was written, or its
+    engine was built with a different bin_width or sparse_average.
+    """
+    cache_dir = viewer_cache_dir(folder)
+    meta_file = os.path.join(cache_dir, 'meta.json')
+    if not os.path.exists(meta_file):
+        return None
+    try:
+        with open(meta_file, 'r') as f:
+            meta = json.load(f)
+        if meta.get('version') != VIEWER_CACHE_VERSION or meta.get('sources') != source_signature(sources):
+            return None
+        engine = meta['engine']
+        if ((bin_width is not None and engine['bin_width'] != bin_width)
+                or (sparse_average is not None and engine['sparse_average'] != sparse_average)):
+            return None
+
+        def load(name):
+            return np.load(os.path.join(cache_dir, f'{name}.npy'), mmap_mode='r')
+        arrays = {name: load(name) for name in SPECTRUM_ARRAYS}
+        engine_arrays = {name: load(f'engine_{name}') for name in meta['engine_arrays']}
+        return ViewerCache(meta['well_ids'], engine_arrays=engine_arrays, engine_scalars=engine, **arrays)
+    except Exception as e:
+        print(f"Error loading viewer cache: {e}")
+        return None
@@ -0,0 +1,141 @@
+import numpy as np
+from matplotlib.colors import to_rgba
+from label_layer import IndexLabelLocator, index_label_formatter
+
+# Colors sampled from a colormap for the heatmap
+LUT_SIZE = 256
+# Last LUT entry, used for wells without a value
+MISSING_COLOR = '#D3D3D3'
+
+
+def colormap_lut(colormap, n=LUT_SIZE):
+    """(n + 1) x 4 RGBA: n colors spread evenly over colormap, then MISSING_COLOR"""
+    return np.vstack([colormap(np.linspace(0, 1, n)), to_rgba(MISSING_COLOR)])
+
+
+def lut_indices(values, n=LUT_SIZE):
+    """
+    Position of each value in an n-color LUT, scaled between the smallest
+    and largest finite value as Normalize and a colormap would; n for NaN
+    """
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    indices = np.full(len(values), n, dtype=np.int64)
+    if finite.any():
+        low, high = values[finite].min(), values[finite].max()
+        scaled = (values[finite] - low) / (high - low) if high > low else np.zeros(finite.sum())
+        indices[finite] = np.minimum((scaled * n).astype(np.int64), n - 1)
+    return indices
+
+
+class WellBarChart:
+    """
+    Horizontal bar chart of one value per well that stays on the figure.
+
+    The axes, ticks and legend are built once per set of wells, with only as
+    many well labels as fit on the axis at the current zoom. Each update
+    only changes the bar widths and colors and moves the mean and +/-1 std
+    lines, then blits them over a saved background. A full redraw happens
+    only when the values no longer fit the x limits, or use less than half of
+    them.
+
+    Args:
+        figure: Matplotlib figure to draw on
+        canvas: Its canvas
+    """
+
+    def __init__(self, figure, canvas):
+        self.figure = figure
+        self.canvas = canvas
+        self.ax = None
+        self.wells = None
+        self.bars = []
+        self.lines = []
+        self.background = None
+        canvas.mpl_connect('draw_event', self._on_draw)
+
+    def _font_size(self):
+        # More bars = smaller font
+        num_wells = len(self.wells)
+        if num_wells <= 20:
+            return 8
+        elif num_wells <= 40:
+            return 6
+        elif num_wells <= 60:
+            return 4
+        return 3
+
+    def _build(self, wells):
+        self.wells = list(wells)
+        self.figure.clear()
+        self.figure.patch.set_facecolor('#f0f0f0')
+        self.ax = self.figure.add_subplot(111)
+        self.ax.set_facecolor('white')
+
+        y_pos = np.arange(len(self.wells))
+        self.bars = list(self.ax.barh(y_pos, np.zeros(len(self.wells)), align='center',
+                                      edgecolor='dimgrey', linewidth=1, animated=True))
+        # Only the well labels that fit are ticked, re-picked on zoom
+        self.ax.yaxis.set_major_locator(IndexLabelLocator(len(self.wells), self._font_size()))
+        self.ax.yaxis.set_major_formatter(index_label_formatter(self.wells))
+        self.ax.tick_params(axis='y', labelsize=self._font_size())
+        self.ax.invert_yaxis()
+        self.ax.set_xlabel('Intensity', fontsize=10)
+        self.ax.set_title('Intensity by Well', fontsize=12)
+
+        # Mean and std dev lines
+        self.lines = [
+            self.ax.axvline(0, color='blue', linestyle=':', label='Mean', zorder=3, animated=True),
+            self.ax.axvline(0, color='red', linestyle=':', label='+1 Std Dev', zorder=3, animated=True),
+            self.ax.axvline(0, color='red', linestyle=':', label='-1 Std Dev', zorder=3, animated=True),
+        ]
+        self.ax.legend(fontsize='x-small')
+        self.figure.tight_layout()
+
+    def _on_draw(self, event):
+        # A full draw leaves out animated artists; save it as the blit background, then add them
+        if self.ax is None:
+            return
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_animated()
+
+    def _draw_animated(self):
+        for artist in self.bars + self.lines:
+            self.ax.draw_artist(artist)
+
+    def _limits_ok(self, low, high):
+        x_min, x_max = self.ax.get_xlim()
+        return low >= x_min and high <= x_max and (high - low) >= 0.5 * (x_max - x_min)
+
+    def update(self, wells, values, colors):
+        """
+        Show values (NaN drawn as empty bars) colored with one RGBA row per well.
+        Wells are drawn top to bottom in the order given.
+        """
+        if self.wells != list(wells) or self.ax is None:
+            self._build(wells)
+            self.background = None
+        values = np.asarray(values, dtype=np.float64)
+        for bar, value, color in zip(self.bars, values, colors):
+            bar.set_width(value if np.isfinite(value) else 0.0)
+            bar.set_facecolor(color)
+
+        finite = values[np.isfinite(values)]
+        mean_value = np.mean(finite) if len(finite) else 0.0
+        std_dev = np.std(finite) if len(finite) else 0.0
+        for line, x in zip(self.lines, (mean_value, mean_value + std_dev, mean_value - std_dev)):
+            line.set_xdata([x, x])
+
+        low = min(0.0, mean_value - std_dev, finite.min() if len(finite) else 0.0)
+        high = max(mean_value + std_dev, finite.max() if len(finite) else 0.0)
+        if high <= low:
+            high = low + 1.0
+        if self.background is None or not self._limits_ok(low, high):
+            margin = 0.05 * (high - low)
+            self.ax.set_xlim(low - margin if low < 0 else 0.0, high + margin)
+            self.canvas.draw()
+            return
+
+        self.canvas.restore_region(self.background)
+        self._draw_animated()
+        self.canvas.blit(self.figure.bbox)
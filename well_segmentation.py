@@ -0,0 +1,237 @@
+import os
+import json
+import numpy as np
+
+WELL_INDEX_FILE = 'well_index.json'
+SCAN_COORDINATES_FILE = 'scan_coordinates.npy'
+
+
+def pad_y_coordinates(Y, total_scans):
+    """
+    Pad the Y coordinate array with its last value so there is one entry per scan.
+
+    The reader can return fewer coordinates than scans when the run is stopped
+    mid-line, in which case the trailing scans belong to the last well.
+    """
+    Ynp = np.asarray(Y)
+    if total_scans is not None and len(Ynp) < total_scans:
+        padding = np.full(total_scans - len(Ynp), Ynp[-1])
+        Ynp = np.concatenate([Ynp, padding])
+    return Ynp
+
+
+class WellSegmentation:
+    """
+    Scan ranges for every Y position (well) in a run.
+
+    Scan numbers are 1-based to match the scan series files given to maldichrom.
+    """
+
+    def __init__(self, positions, start_scans, end_scans, n_scans, total_scans):
+        self.positions = np.asarray(positions)
+        self.start_scans = np.asarray(start_scans, dtype=np.int64)
+        self.end_scans = np.asarray(end_scans, dtype=np.int64)
+        self.n_scans = np.asarray(n_scans, dtype=np.int64)
+        self.total_scans = int(total_scans)
+        self._lookup = {self._key(p): i for i, p in enumerate(self.positions.tolist())}
+
+    @staticmethod
+    def _key(position):
+        # Y positions come back as floats from the DLL but are whole numbers
+        return round(float(position), 6)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def get(self, position):
+        """
+        Return (start_scan, end_scan, n_scans) for a Y position, or None if
+        the position was never visited.
+        """
+        i = self._lookup.get(self._key(position))
+        if i is None:
+            return None
+        return int(self.start_scans[i]), int(self.end_scans[i]), int(self.n_scans[i])
+
+    def to_dict(self):
+        return {
+            'total_scans': self.total_scans,
+            'wells': [
+                {'position': p, 'start_scan': int(s), 'end_scan': int(e), 'n_scans': int(n)}
+                for p, s, e, n in zip(self.positions.tolist(), self.start_scans,
+                                      self.end_scans, self.n_scans)
+            ]
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        wells = data['wells']
+        return cls([w['position'] for w in wells],
+                   [w['start_scan'] for w in wells],
+                   [w['end_scan'] for w in wells],
+                   [w['n_scans'] for w in wells],
+                   data['total_scans'])
+
+
+def segment_wells(Y, total_scans=None):
+    """
+    Split a run into wells in a single pass over the Y coordinates.
+
+    Change points in Y mark run boundaries; runs that share a Y value are then
+    merged so a well keeps its first and last scan even if it was revisited.
+
+    Args:
+        Y: Y coordinate per scan, as returned by getXYCoordinates()
+        total_scans: Total scans in the file; Y is padded to this length
+
+    Returns:
+        WellSegmentation ordered by Y position
+    """
+    Ynp = pad_y_coordinates(Y, total_scans)
+    if total_scans is None:
+        total_scans = len(Ynp)
+    if len(Ynp) == 0:
+        return WellSegmentation([], [], [], [], total_scans)
+
+    change_points = np.flatnonzero(Ynp[1:] != Ynp[:-1]) + 1
+    run_starts = np.concatenate(([0], change_points))
+    run_ends = np.concatenate((change_points, [len(Ynp)])) - 1
+    run_values = Ynp[run_starts]
+
+    positions, run_well = np.unique(run_values, return_inverse=True)
+    start_scans = np.full(len(positions), len(Ynp), dtype=np.int64)
+    end_scans = np.zeros(len(positions), dtype=np.int64)
+    np.minimum.at(start_scans, run_well, run_starts)
+    np.maximum.at(end_scans, run_well, run_ends)
+    n_scans = np.bincount(run_well, weights=run_ends - run_starts + 1,
+                          minlength=len(positions)).astype(np.int64)
+
+    # Convert 0-based indices to 1-based scan numbers
+    return WellSegmentation(positions, start_scans + 1, end_scans + 1, n_scans, total_scans)
+
+
+def extend_segmentation(segmentation, Y_new):
+    """
+    Segmentation of a run that has grown by the scans in Y_new, without going
+    over the earlier scans again: the new scans are segmented on their own
+    and merged by position with the existing ranges, as segment_wells merges
+    revisited positions.
+
+    Args:
+        segmentation: WellSegmentation of the first segmentation.total_scans
+            scans, or None for an empty run
+        Y_new: Y coordinates of the scans that follow
+
+    Returns:
+        WellSegmentation ordered by Y position
+    """
+    tail = segment_wells(Y_new)
+    if segmentation is None:
+        return tail
+    if not len(tail):
+        return segmentation
+    offset = segmentation.total_scans
+    positions, well = np.unique(np.concatenate([segmentation.positions, tail.positions]), return_inverse=True)
+    start_scans = np.full(len(positions), offset + tail.total_scans, dtype=np.int64)
+    end_scans = np.zeros(len(positions), dtype=np.int64)
+    np.minimum.at(start_scans, well, np.concatenate([segmentation.start_scans, tail.start_scans + offset]))
+    np.maximum.at(end_scans, well, np.concatenate([segmentation.end_scans, tail.end_scans + offset]))
+    n_scans = np.bincount(well, weights=np.concatenate([segmentation.n_scans, tail.n_scans]),
+                          minlength=len(positions)).astype(np.int64)
+    return WellSegmentation(positions, start_scans, end_scans, n_scans, offset + tail.total_scans)
+
+
+def well_index_path(raw_path):
+    """Location of the segmentation index stored alongside a .raw folder"""
+    return os.path.join(raw_path, WELL_INDEX_FILE)
+
+
+def raw_signature(raw_path):
+    """
+    Total size and latest modification time of the instrument's own files in
+    a .raw folder (_FUNC001.DAT, _HEADER.TXT...), so files written by the
+    processing apps don't invalidate the cache.
+    """
+    size = 0
+    mtime_ns = 0
+    for entry in os.scandir(raw_path):
+        if entry.is_file() and entry.name.startswith('_'):
+            stat = entry.stat()
+            size += stat.st_size
+            mtime_ns = max(mtime_ns, stat.st_mtime_ns)
+    return {'size': size, 'mtime_ns': mtime_ns}
+
+
+class ScanIndex:
+    """
+    Cached scan coordinates and well segmentation for a run.
+
+    Attributes:
+        coordinates: (n_scans, 3) array of scan number, X and Y, memory-mapped
+            when loaded from the cache
+        segmentation: WellSegmentation built from Y
+    """
+
+    def __init__(self, coordinates, segmentation):
+        self.coordinates = coordinates
+        self.segmentation = segmentation
+
+    @property
+    def scans(self):
+        return self.coordinates[:, 0]
+
+    @property
+    def X(self):
+        return self.coordinates[:, 1]
+
+    @property
+    def Y(self):
+        return self.coordinates[:, 2]
+
+    @property
+    def total_scans(self):
+        return self.segmentation.total_scans
+
+
+def save_scan_index(raw_path, X, Y, segmentation):
+    """
+    Store the coordinates and segmentation next to the raw data, keyed by the
+    raw files' size and mtime, so the DLL coordinate call can be skipped next time.
+    """
+    try:
+        Ynp = pad_y_coordinates(Y, segmentation.total_scans)
+        Xnp = pad_y_coordinates(X, len(Ynp))[:len(Ynp)]
+        coordinates = np.column_stack((np.arange(1, len(Ynp) + 1), Xnp, Ynp)).astype(np.float64)
+        tmp_path = os.path.join(raw_path, SCAN_COORDINATES_FILE + '.tmp.npy')
+        np.save(tmp_path, coordinates)
+        os.replace(tmp_path, os.path.join(raw_path, SCAN_COORDINATES_FILE))
+
+        data = segmentation.to_dict()
+        data['raw_signature'] = raw_signature(raw_path)
+        data['coordinates_file'] = SCAN_COORDINATES_FILE
+        with open(well_index_path(raw_path), 'w') as f:
+            json.dump(data, f, indent=2)
+    except Exception as e:
+        print(f"Error saving scan index: {e}")
+
+
+def load_scan_index(raw_path):
+    """
+    Load the cached coordinates and segmentation.
+
+    Returns None if there is no cache or the raw files have changed since it
+    was written (e.g. the run was still acquiring).
+    """
+    index_file = well_index_path(raw_path)
+    if not os.path.exists(index_file):
+        return None
+    try:
+        with open(index_file, 'r') as f:
+            data = json.load(f)
+        if data.get('raw_signature') != raw_signature(raw_path):
+            return None
+        coordinates = np.load(os.path.join(raw_path, data['coordinates_file']), mmap_mode='r')
+        return ScanIndex(coordinates, WellSegmentation.from_dict(data))
+    except Exception as e:
+        print(f"Error loading scan index: {e}")
+        return None